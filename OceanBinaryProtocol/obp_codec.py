@@ -0,0 +1,159 @@
+#!/usr/bin/python
+
+"""Precompiled layout of the Ocean Binary Protocol frame and a cache of serialized request frames.
+The header and trailer of an OBP frame never change shape, so their struct.Struct objects are built once here
+rather than every time a message is packed or unpacked.
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import hashlib
+import struct
+
+# byte offsets of the fields in the fixed 44 byte header of an OBP frame
+HEADER_OFFSET = 0
+PROTOCOL_VERSION_OFFSET = 2
+FLAGS_OFFSET = 4
+ERROR_NUMBER_OFFSET = 6
+MESSAGE_TYPE_OFFSET = 8
+REGARDING_OFFSET = 12
+RESERVED_OFFSET = 16
+CHECKSUM_TYPE_OFFSET = 22
+IMMEDIATE_DATA_LENGTH_OFFSET = 23
+IMMEDIATE_DATA_OFFSET = 24
+BYTES_REMAINING_OFFSET = 40
+PAYLOAD_OFFSET = 44
+
+HEADER_SIZE = 44        # everything up to the payload
+FOOTER_SIZE = 20        # 16 byte checksum and 4 byte footer follow the payload
+MINIMUM_FRAME_SIZE = HEADER_SIZE + FOOTER_SIZE
+
+OBP_HEADER = 0xC0C1
+OBP_FOOTER = 0xC2C3C4C5
+DEFAULT_PROTOCOL_VERSION = 0x1100
+DEFAULT_FLAGS = 0x0004                  # reply requested
+
+# header, protocol_version, flags, error_number, message_type, regarding, reserved, checksum_type,
+#  immediate_data_length, immediate_data, bytes_remaining
+HEADER_STRUCT = struct.Struct('<HHHHII6sBB16sI')
+# checksum, footer
+TRAILER_STRUCT = struct.Struct('<16sI')
+UINT8_STRUCT = struct.Struct('<B')
+UINT16_STRUCT = struct.Struct('<H')
+UINT32_STRUCT = struct.Struct('<I')
+
+# an empty message with the default header values
+EMPTY_FRAME = HEADER_STRUCT.pack(OBP_HEADER, DEFAULT_PROTOCOL_VERSION, DEFAULT_FLAGS, 0x0000, 0x00000000, 0x00000000,
+                                 bytes(6), 0x00, 0x00, bytes(16), FOOTER_SIZE) + \
+              TRAILER_STRUCT.pack(bytes(16), OBP_FOOTER)
+
+# requests that carry a varying argument, e.g. an integration time, would otherwise grow the cache without bound
+REQUEST_FRAME_CACHE_LIMIT = 1024
+
+_request_frames = {}
+
+
+def error_number_get(frame):
+    return UINT16_STRUCT.unpack_from(frame, ERROR_NUMBER_OFFSET)[0]
+
+
+def bytes_remaining_get(frame):
+    return UINT32_STRUCT.unpack_from(frame, BYTES_REMAINING_OFFSET)[0]
+
+
+def checksum_type_get(frame):
+    return frame[CHECKSUM_TYPE_OFFSET]
+
+
+# the md5 of everything ahead of the checksum. The frame is hashed where it lies, nothing is copied.
+def checksum_compute(frame):
+    frame = memoryview(frame).cast('B')
+    return hashlib.md5(frame[0:len(frame) - FOOTER_SIZE]).digest()
+
+
+# raise a ValueError if the frame asks for an md5 checksum and does not match it. Returns the frame.
+def checksum_verify(frame):
+    if checksum_type_get(frame) == 0x01:
+        offset = len(frame) - FOOTER_SIZE
+        if checksum_compute(frame) != bytes(memoryview(frame).cast('B')[offset:offset + 16]):
+            raise ValueError('The checksum was incorrect. The message is likely corrupt or malformed.')
+    return frame
+
+
+def pack_frame(message_type, immediate_data=b'', checksum_type=0x00, payload=b'', regarding=0x00000000,
+               flags=DEFAULT_FLAGS):
+    if len(immediate_data) > 16:
+        raise ValueError('Immediate data is at most 16 bytes long.')
+    frame = bytearray(HEADER_SIZE + len(payload) + FOOTER_SIZE)
+    HEADER_STRUCT.pack_into(frame, HEADER_OFFSET, OBP_HEADER, DEFAULT_PROTOCOL_VERSION, flags, 0x0000, message_type,
+                            regarding, bytes(6), checksum_type, len(immediate_data), bytes(immediate_data),
+                            len(payload) + FOOTER_SIZE)
+    frame[PAYLOAD_OFFSET:PAYLOAD_OFFSET + len(payload)] = payload
+    UINT32_STRUCT.pack_into(frame, len(frame) - 4, OBP_FOOTER)
+    if checksum_type == 0x01:
+        frame[len(frame) - FOOTER_SIZE:len(frame) - 4] = checksum_compute(frame)
+    return bytes(frame)
+
+
+def request_frame(message_type, immediate_data=b'', checksum_type=0x00):
+    """Return the serialized request for a message type. Requests are immutable bytes and are built only once, so
+    repeating a command costs a dictionary lookup. immediate_data must be hashable, i.e. bytes rather than a list.
+    """
+    key = (message_type, immediate_data, checksum_type)
+    frame = _request_frames.get(key)
+    if frame is None:
+        frame = pack_frame(message_type, immediate_data, checksum_type)
+        if len(_request_frames) < REQUEST_FRAME_CACHE_LIMIT:
+            _request_frames[key] = frame
+    return frame
+
+
+def request_frame_cache_clear():
+    _request_frames.clear()
+
+
+class ChecksumVerifier:
+    """Verifies the checksums of received frames on a worker thread, so that hashing a large reply overlaps with
+    reading the next one. hashlib releases the GIL while it hashes, so the work really is done in parallel.
+
+    A failed verification is reported by the future that submit() returns and, for callers that do not keep the
+    futures, by the next call to check(). The frame must not change until its verification is done.
+    """
+
+    def __init__(self, max_workers=1):
+        # concurrent.futures is imported here rather than with the module, it is most of the codec's import time
+        from concurrent import futures
+        self.__executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ChecksumVerifier')
+        self.__pending = []
+
+    def submit(self, frame):
+        a_future = self.__executor.submit(checksum_verify, frame)
+        self.__pending.append(a_future)
+        return a_future
+
+    # raise the first failure among the verifications that are done. Each failure is raised only once.
+    def check(self):
+        done = [a_future for a_future in self.__pending if a_future.done()]
+        if done:
+            self.__pending = [a_future for a_future in self.__pending if not a_future.done()]
+            for a_future in done:
+                if a_future.exception() is not None:
+                    raise a_future.exception()
+
+    # wait for every submitted frame and then check()
+    def drain(self):
+        from concurrent import futures
+        futures.wait(self.__pending)
+        self.check()
+
+    def shutdown(self, wait=True):
+        self.__executor.shutdown(wait=wait)
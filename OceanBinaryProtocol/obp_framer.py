@@ -0,0 +1,160 @@
+#!/usr/bin/python
+
+"""Splits a stream of bytes into OBP frames. Bytes may arrive in chunks of any size, and a frame is handed out as
+soon as its last byte is in. Garbage in the stream is skipped by scanning for the next header, so a corrupt or
+partial frame costs only itself rather than the connection.
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+from OceanBinaryProtocol.obp_codec import *
+
+# the header and footer as they appear on the wire
+HEADER_BYTES = UINT16_STRUCT.pack(OBP_HEADER)
+FOOTER_BYTES = UINT32_STRUCT.pack(OBP_FOOTER)
+
+# larger than any spectrum, so that a corrupt bytes_remaining does not make the framer wait for gigabytes
+DEFAULT_MAXIMUM_FRAME_SIZE = 0x1000000
+
+
+class ObpFramer:
+    """Incremental OBP framing, e.g.
+
+        framer = ObpFramer()
+        for chunk in chunks:
+            framer.feed(chunk)
+            for frame in framer.frames():
+                ...
+
+    A frame is a memoryview into the framer's buffer, nothing is copied. It is only valid until the next feed() or
+    buffer_reserve(). A receiver can fill the buffer directly with buffer_reserve() and buffer_commit(), e.g. by
+    socket.recv_into().
+
+    A frame is accepted when it starts with the header, has a plausible bytes_remaining, ends with the footer and,
+    if verify_checksum is set, has a correct checksum. Anything else is skipped up to the next header.
+    """
+
+    def __init__(self, buffer_size=65536, maximum_frame_size=DEFAULT_MAXIMUM_FRAME_SIZE, verify_checksum=False):
+        self.__buffer = bytearray(max(buffer_size, MINIMUM_FRAME_SIZE))
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0            # the first byte that is not yet part of a frame
+        self.__end = 0              # one past the last byte received
+        self.__maximum_frame_size = maximum_frame_size
+        self.__verify_checksum = verify_checksum
+        self.__frame_count = 0
+        self.__discarded_byte_count = 0
+        self.__resynchronization_count = 0
+
+    def frame_count_get(self):
+        return self.__frame_count
+
+    # bytes that were skipped because they were not part of a valid frame
+    def discarded_byte_count_get(self):
+        return self.__discarded_byte_count
+
+    # how many times the stream was out of sync
+    def resynchronization_count_get(self):
+        return self.__resynchronization_count
+
+    # bytes received that are not yet part of a frame
+    def pending_byte_count_get(self):
+        return self.__end - self.__start
+
+    # a writable view of at least size bytes following the data already received. Frames handed out before are
+    #  no longer valid.
+    def buffer_reserve(self, size):
+        pending = self.__end - self.__start
+        if self.__end + size > len(self.__buffer):
+            if pending + size > len(self.__buffer):
+                # a new buffer rather than a resize, a view that is still held would prevent resizing
+                self.__buffer = bytearray(max(2 * len(self.__buffer), pending + size))
+                self.__buffer[0:pending] = self.__view[self.__start:self.__end]
+                self.__view = memoryview(self.__buffer)
+            elif pending > 0:
+                self.__view[0:pending] = bytes(self.__view[self.__start:self.__end])
+            self.__start = 0
+            self.__end = pending
+        return self.__view[self.__end:len(self.__buffer)]
+
+    # count bytes have been written into the view returned by buffer_reserve()
+    def buffer_commit(self, count):
+        self.__end += count
+
+    def feed(self, data):
+        count = len(data)
+        self.buffer_reserve(count)[0:count] = data
+        self.__end += count
+
+    def __discard(self, count):
+        self.__start += count
+        self.__discarded_byte_count += count
+
+    # skip the byte at start and everything up to the next header
+    def __resynchronize(self):
+        self.__resynchronization_count += 1
+        next_header = self.__buffer.find(HEADER_BYTES, self.__start + 1, self.__end)
+        if next_header < 0:
+            # the last byte may be the first half of a header
+            next_header = self.__end - 1 if self.__buffer[self.__end - 1] == HEADER_BYTES[0] else self.__end
+        self.__discard(next_header - self.__start)
+
+    # give up on the frame at the start of the pending bytes, which is still waiting for more, and skip to the next
+    #  header. A corrupt bytes_remaining below the maximum frame size holds back every frame behind it until then.
+    #  Returns False if no frame is waiting.
+    def frame_abandon(self):
+        start = self.__start
+        if (self.__end - start < 2) or (self.__buffer[start:start + 2] != HEADER_BYTES):
+            return False
+        self.__resynchronize()
+        return True
+
+    # the next complete frame, or None if more bytes are needed
+    def frame_next(self):
+        while True:
+            start = self.__start
+            available = self.__end - start
+            if available < 2:
+                return None
+            if self.__buffer[start] != HEADER_BYTES[0] or self.__buffer[start + 1] != HEADER_BYTES[1]:
+                self.__resynchronize()
+                continue
+            if available < HEADER_SIZE:
+                return None
+            frame_size = HEADER_SIZE + UINT32_STRUCT.unpack_from(self.__buffer, start + BYTES_REMAINING_OFFSET)[0]
+            if (frame_size < MINIMUM_FRAME_SIZE) or (frame_size > self.__maximum_frame_size):
+                self.__resynchronize()
+                continue
+            if available < frame_size:
+                return None
+            end = start + frame_size
+            if self.__buffer[end - 4:end] != FOOTER_BYTES:
+                self.__resynchronize()
+                continue
+            frame = self.__view[start:end]
+            if self.__verify_checksum:
+                try:
+                    checksum_verify(frame)
+                except ValueError:
+                    # header and footer are intact, so the whole frame can be skipped
+                    self.__resynchronization_count += 1
+                    self.__discard(frame_size)
+                    continue
+            self.__start = end
+            self.__frame_count += 1
+            return frame
+
+    # every complete frame received so far
+    def frames(self):
+        frame = self.frame_next()
+        while frame is not None:
+            yield frame
+            frame = self.frame_next()
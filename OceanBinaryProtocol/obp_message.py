@@ -17,106 +17,121 @@ __status__ = "Development"
 __pkg_name__ = "zephyr"
 
 import hashlib
-import struct
+from OceanBinaryProtocol.obp_codec import *
+
+
+def _element_bytes(value):
+    # bytes() checks the range of every element in C rather than in a python loop
+    try:
+        return bytes(value)
+    except ValueError:
+        raise ValueError('Element values should be between 0x00 and 0xFF inclusive.')
 
 
 class OceanBinaryProtocolMessage:
+    """A message held as a single contiguous frame. The fields are read and written in place at their fixed offsets,
+    so a received frame is never unpacked into python objects until a field is asked for.
+    """
+
+    __slots__ = ('__frame',)
 
     def __init__(self):
-        self.__header = 0xC0C1               # used to identify the start of the message (little endian)
-        self.__protocol_version = 0x1100     # version of obp being used. This hasn't been kept relevant (little endian)
-        self.__flags = 0x0004                # indicates status of the message, reply requested  (little endian)
-        self.__error_number = 0x0000         # indicates success or the cause of an error  (little endian)
-        self.__message_type = 0x00000000     # action to be taken by the device  (little endian)
-        self.__regarding = 0x00000000        # allows messages to be linked  (little endian)
-        self.__reserved = [0x00] * 6           # six bytes of data for future use  (little endian)
-        self.__checksum_type = 0x00          # 0x00 is no check sum, 0x01 is a 16 byte md5
-        self.__immediate_data_length = 0x00  # number immediate data bytes that are being used
-        self.__immediate_data = [0x00] * 16
-        self.__bytes_remaining = 0x00000014  # the number of bytes that follow, payload length + 20 (little endian)
-        self.__payload = []
-        self.__checksum = [0x00] * 16
-        self.__footer = 0xC2C3C4C5           # identifies the end of the message (little endian)
+        # header              0xC0C1, used to identify the start of the message (little endian)
+        # protocol_version    0x1100, version of obp being used. This hasn't been kept relevant (little endian)
+        # flags               0x0004, indicates status of the message, reply requested  (little endian)
+        # error_number        indicates success or the cause of an error  (little endian)
+        # message_type        action to be taken by the device  (little endian)
+        # regarding           allows messages to be linked  (little endian)
+        # reserved            six bytes of data for future use  (little endian)
+        # checksum_type       0x00 is no check sum, 0x01 is a 16 byte md5
+        # immediate_data_len  number immediate data bytes that are being used
+        # immediate_data      16 bytes
+        # bytes_remaining     the number of bytes that follow, payload length + 20 (little endian)
+        # payload             extended data, e.g. a spectrum
+        # checksum            16 bytes
+        # footer              0xC2C3C4C5, identifies the end of the message (little endian)
+        self.__frame = memoryview(bytearray(EMPTY_FRAME))
 
     def initialize(self):
         self.__init__()
 
+    # a frame adopted by deserialize() may be read only (e.g. bytes). It is only copied once something is written.
+    def __writable_frame(self):
+        if self.__frame.readonly:
+            self.__frame = memoryview(bytearray(self.__frame))
+        return self.__frame
+
+    def __payload_length(self):
+        return len(self.__frame) - MINIMUM_FRAME_SIZE
+
     @property
     def protocol_version(self):
-        return self.__protocol_version
+        return UINT16_STRUCT.unpack_from(self.__frame, PROTOCOL_VERSION_OFFSET)[0]
 
     @protocol_version.setter
     def protocol_version(self, value):
         if(value >= 0x0000) and (value <= 0xFFFF):
-            self.__protocol_version = value
+            UINT16_STRUCT.pack_into(self.__writable_frame(), PROTOCOL_VERSION_OFFSET, value)
         else:
             raise ValueError('The value was out of range. 0x0000 to 0xFFFF inclusive.')
 
     @property
     def flags(self):
-        return self.__flags
+        return UINT16_STRUCT.unpack_from(self.__frame, FLAGS_OFFSET)[0]
 
     @flags.setter
     def flags(self, value):
         if(value >= 0x0000) and (value <= 0xFFFF):
-            self.__flags = value
+            UINT16_STRUCT.pack_into(self.__writable_frame(), FLAGS_OFFSET, value)
         else:
             raise ValueError('The value was out of range. 0x0000 to 0xFFFF inclusive.')
 
     @property
     def error_number(self):
-        return self.__error_number
+        return UINT16_STRUCT.unpack_from(self.__frame, ERROR_NUMBER_OFFSET)[0]
 
     @error_number.setter
     def error_number(self, value):
         if(value >= 0x0000) and (value <= 0xFFFF):
-            self.__error_number = value
+            UINT16_STRUCT.pack_into(self.__writable_frame(), ERROR_NUMBER_OFFSET, value)
         else:
             raise ValueError('The value was out of range. 0x0000 to 0xFFFF inclusive.')
 
     @property
     def message_type(self):
-        return self.__message_type
+        return UINT32_STRUCT.unpack_from(self.__frame, MESSAGE_TYPE_OFFSET)[0]
 
     @message_type.setter
     def message_type(self, value):
         if(value >= 0x00000000) and (value <= 0xFFFFFFFF):
-            self.__message_type = value
+            UINT32_STRUCT.pack_into(self.__writable_frame(), MESSAGE_TYPE_OFFSET, value)
         else:
             raise ValueError('The value was out of range. 0x00000000 to 0xFFFFFFFF inclusive.')
 
     @property
     def regarding(self):
-        return self.__regarding
+        return UINT32_STRUCT.unpack_from(self.__frame, REGARDING_OFFSET)[0]
 
     @regarding.setter
     def regarding(self, value):
         if (value >= 0x00000000) and (value <= 0xFFFFFFFF):
-            self.__regarding = value
+            UINT32_STRUCT.pack_into(self.__writable_frame(), REGARDING_OFFSET, value)
         else:
             raise ValueError('The value was out of range. 0x00000000 to 0xFFFFFFFF inclusive.')
 
     def reserved_retrieve(self):
-        return list(self.__reserved)
+        return list(self.__frame[RESERVED_OFFSET:RESERVED_OFFSET + 6])
 
     def reserved_assign(self, value):
         if len(value) == 6:
-            in_bounds = True
-            for index in range(0,5):
-                if (value[index] < 0) or (value[index] > 255):
-                    in_bounds = False
-                    break
-            if in_bounds:
-                self.__reserved = value
-            else:
-                raise ValueError('Element values should be between 0x00 and 0xFF inclusive.')
+            self.__writable_frame()[RESERVED_OFFSET:RESERVED_OFFSET + 6] = _element_bytes(value)
         else:
             raise TypeError('The value should be a 6 element array of bytes.')
 
     def reserved_set(self, index, value):
         if (index >= 0) and (index <= 5):
             if(value >= 0) and (value <=255):
-                self.__reserved[index] = value
+                self.__writable_frame()[RESERVED_OFFSET + index] = value
             else:
                 raise ValueError('The value should be between 0x00 and 0xFF inclusive.')
         else:
@@ -124,53 +139,49 @@ class OceanBinaryProtocolMessage:
 
     def reserved_get(self, index):
         if (index >= 0) and (index <= 5):
-            return self.__reserved[index]
+            return self.__frame[RESERVED_OFFSET + index]
         else:
             raise IndexError('The index should be between 0 and 5 inclusive.')
 
     @property
     def checksum_type(self):
-        return self.__checksum_type
+        return self.__frame[CHECKSUM_TYPE_OFFSET]
 
     @checksum_type.setter
     def checksum_type(self, value):
         if (value >= 0x00) and (value <= 0xFF):
-            self.__checksum_type = value
+            self.__writable_frame()[CHECKSUM_TYPE_OFFSET] = value
         else:
             raise ValueError('The value was out of range. 0x00 to 0xFF inclusive.')
 
     @property
     def immediate_data_length(self):
-        return self.__immediate_data_length
+        return self.__frame[IMMEDIATE_DATA_LENGTH_OFFSET]
 
     @immediate_data_length.setter
     def immediate_data_length(self, value):
         if (value >= 0x00) and (value <= 0xFF):
-            self.__immediate_data_length = value
+            self.__writable_frame()[IMMEDIATE_DATA_LENGTH_OFFSET] = value
         else:
             raise ValueError('The value was out of range. 0x00 to 0xFF inclusive.')
 
     def immediate_data_retrieve(self):
-        return list(self.__immediate_data)
+        return list(self.__frame[IMMEDIATE_DATA_OFFSET:IMMEDIATE_DATA_OFFSET + 16])
+
+    # the 16 bytes of immediate data as a view into the frame. Nothing is copied.
+    def immediate_data_view(self):
+        return self.__frame[IMMEDIATE_DATA_OFFSET:IMMEDIATE_DATA_OFFSET + 16]
 
     def immediate_data_assign(self, value):
         if len(value) == 16:
-            in_bounds = True
-            for index in range(0,15):
-                if (value[index] < 0x00) or (value[index] > 0xFF):
-                    in_bounds = False
-                    break
-            if in_bounds:
-                self.__immediate_data = value
-            else:
-                raise ValueError('Element values should be between 0x00 and 0xFF inclusive.')
+            self.__writable_frame()[IMMEDIATE_DATA_OFFSET:IMMEDIATE_DATA_OFFSET + 16] = _element_bytes(value)
         else:
             raise TypeError('The value should be a 16 element array of bytes.')
 
     def immediate_data_set(self, index, value):
         if(index >= 0) and (index <= 15):
             if (value >= 0x00) and (value <= 0xFF):
-                self.__immediate_data[index] = value
+                self.__writable_frame()[IMMEDIATE_DATA_OFFSET + index] = value
             else:
                 raise ValueError('The value should be between 0x00 and 0xFF inclusive.')
         else:
@@ -178,72 +189,75 @@ class OceanBinaryProtocolMessage:
 
     def immediate_data_get(self, index):
         if(index >= 0) and (index <= 15):
-            return self.__immediate_data[index]
+            return self.__frame[IMMEDIATE_DATA_OFFSET + index]
         else:
             raise IndexError('The index should be between 0 and 15 inclusive.')
 
     @property
     def bytes_remaining(self):
-        return self.__bytes_remaining
+        return UINT32_STRUCT.unpack_from(self.__frame, BYTES_REMAINING_OFFSET)[0]
 
     @bytes_remaining.setter
     def bytes_remaining(self, value):
         if(value >= 0x00000000) and (value <= 0xFFFFFFFF):
-            self.__bytes_remaining = value
+            UINT32_STRUCT.pack_into(self.__writable_frame(), BYTES_REMAINING_OFFSET, value)
         else:
             raise ValueError('The value was out of range. 0x00000000 to 0xFFFFFFFF inclusive.')
 
     def payload_retrieve(self):
-        return self.__payload
+        return list(self.payload_view())
+
+    # the payload as a view into the frame. Nothing is copied, so the view is only valid until the next
+    #  payload_assign() or deserialize()
+    def payload_view(self):
+        return self.__frame[PAYLOAD_OFFSET:PAYLOAD_OFFSET + self.__payload_length()]
 
     def payload_assign(self, value):
-        in_bounds = True
-        for index in range(0,len(value)):
-            if (value[index] < 0) or (value[index] > 255):
-                in_bounds = False
-                break
-        if in_bounds:
-            self.__payload = value
-            self.__bytes_remaining = len(value) + 20
-        else:
-            raise ValueError('Element values should be between 0x00 and 0xFF inclusive.')
+        payload = _element_bytes(value)
+        payload_length = len(payload)
+        # the frame changes size, so a new one is built rather than resizing a buffer that may have views exported
+        frame = bytearray(MINIMUM_FRAME_SIZE + payload_length)
+        frame[0:PAYLOAD_OFFSET] = self.__frame[0:PAYLOAD_OFFSET]
+        frame[PAYLOAD_OFFSET:PAYLOAD_OFFSET + payload_length] = payload
+        frame[PAYLOAD_OFFSET + payload_length:] = self.__frame[-FOOTER_SIZE:]
+        UINT32_STRUCT.pack_into(frame, BYTES_REMAINING_OFFSET, payload_length + 20)
+        self.__frame = memoryview(frame)
 
     def payload_set(self, index, value):
-        if(index >= 0) and (index <= len(self.__payload)):
+        payload_length = self.__payload_length()
+        if(index >= 0) and (index < payload_length):
             if (value >= 0x00) and (value <= 0xFF):
-                self.__payload[index] = value
+                self.__writable_frame()[PAYLOAD_OFFSET + index] = value
             else:
                 raise ValueError('The value should be between 0x00 and 0xFF inclusive.')
         else:
-            raise IndexError('The index should be between 0 and {0:d} inclusive.'.format(len(self.__payload)))
+            raise IndexError('The index should be between 0 and {0:d} inclusive.'.format(payload_length))
 
     def payload_get(self, index):
-        if (index >= 0) and (index <= len(self.__payload)):
-            return self.__payload[index]
+        payload_length = self.__payload_length()
+        if (index >= 0) and (index < payload_length):
+            return self.__frame[PAYLOAD_OFFSET + index]
         else:
-            raise IndexError('The index should be between 0 and {0:d} inclusive.'.format(len(self.__payload)))
+            raise IndexError('The index should be between 0 and {0:d} inclusive.'.format(payload_length))
+
+    def __checksum_offset(self):
+        return len(self.__frame) - FOOTER_SIZE
 
     def checksum_retrieve(self):
-        return self.__checksum
+        offset = self.__checksum_offset()
+        return list(self.__frame[offset:offset + 16])
 
     def checksum_assign(self, value):
         if len(value) == 16:
-            in_bounds = True
-            for index in range(0,15):
-                if (value[index] < 0) or (value[index] > 255):
-                    in_bounds = False
-                    break
-            if in_bounds:
-                self.__checksum = value
-            else:
-                raise ValueError('Element values should be between 0x00 and 0xFF inclusive.')
+            offset = self.__checksum_offset()
+            self.__writable_frame()[offset:offset + 16] = _element_bytes(value)
         else:
             raise TypeError('The value should be a 16 element array of bytes.')
 
     def checksum_set(self, index, value):
         if(index >= 0) and (index <= 15):
             if (value >= 0x00) and (value <= 0xFF):
-                self.__checksum[index] = value
+                self.__writable_frame()[self.__checksum_offset() + index] = value
             else:
                 raise ValueError('The value should be between 0x00 and 0xFF inclusive.')
         else:
@@ -251,60 +265,53 @@ class OceanBinaryProtocolMessage:
 
     def checksum_get(self, index):
         if (index >= 0) and (index <= 15):
-            return self.__checksum[index]
+            return self.__frame[self.__checksum_offset() + index]
         else:
             raise IndexError('The index should be between 0 and 15 inclusive.')
 
+    # the whole frame, header through footer, as a view. Nothing is copied.
+    def frame_view(self):
+        return self.__frame
+
     def pack_obp(self):
-        format_string = '<HHHHII6sBB16sI{0:d}s'.format(len(self.__payload))
-        packed_obp = struct.pack(format_string, self.__header, self.__protocol_version, self.__flags, self.__error_number,
-                          self.__message_type, self.__regarding, bytes(self.__reserved), self.__checksum_type,
-                          self.__immediate_data_length, bytes(self.__immediate_data), self.__bytes_remaining,
-                          bytes(self.__payload))
-        return packed_obp
+        return bytes(self.__frame[0:self.__checksum_offset()])
 
     def unpack_obp(self, obp_message):
-        payload_size = struct.unpack_from('I', obp_message, 40)
+        payload_size = UINT32_STRUCT.unpack_from(obp_message, BYTES_REMAINING_OFFSET)
 
-    def compute_checksum_md5(self, packed_obp):
+    def compute_checksum_md5(self, packed_obp=None):
         md5 = hashlib.md5()
-        md5.update(packed_obp)
-        self.__checksum = list(md5.digest())
+        md5.update(packed_obp if packed_obp is not None else self.__frame[0:self.__checksum_offset()])
+        offset = self.__checksum_offset()
+        self.__writable_frame()[offset:offset + 16] = md5.digest()
 
     def serialize(self):
         if self.checksum_type == 0x01:
-            my_message = self.pack_obp()
-            self.compute_checksum_md5(my_message)
-        else:
-            my_message = self.pack_obp()
-
-        return struct.pack('<{0:d}s16sI'.format(len(my_message)), my_message, bytes(self.__checksum), self.__footer)
-
-    def deserialize(self, obp_message):
-        payload_length = struct.unpack_from('<I', obp_message, 40)[0] - 20
-        my_message = struct.unpack('<HHHHII6sBB16sI{0:d}s16sI'.format(payload_length), obp_message)
-        if (self.__header != my_message[0]) or (self.__footer != my_message[13]):
+            # the frame is hashed in place rather than packed again
+            self.compute_checksum_md5()
+
+        return bytes(self.__frame)
+
+    # the message becomes a view over obp_message rather than a copy of it. A frame that is read only is copied
+    #  the first time a field is written. verify_checksum can be turned off when the checksum is verified
+    #  elsewhere, e.g. by a ChecksumVerifier.
+    def deserialize(self, obp_message, verify_checksum=True):
+        frame = memoryview(obp_message).cast('B')
+        if len(frame) < MINIMUM_FRAME_SIZE:
+            raise ValueError('An OBP message is at least {0:d} bytes long.'.format(MINIMUM_FRAME_SIZE))
+        frame_length = HEADER_SIZE + UINT32_STRUCT.unpack_from(frame, BYTES_REMAINING_OFFSET)[0]
+        if (frame_length < MINIMUM_FRAME_SIZE) or (len(frame) < frame_length):
+            raise ValueError('The OBP bytes_remaining did not match the message length. Communications is out of sync.')
+        frame = frame[0:frame_length]
+        if (UINT16_STRUCT.unpack_from(frame, HEADER_OFFSET)[0] != OBP_HEADER) or \
+                (UINT32_STRUCT.unpack_from(frame, frame_length - 4)[0] != OBP_FOOTER):
             raise ValueError('An OBP header or footer had the wrong value. Communications is out of sync.')
         else:
-            # put all of the values into the appropriate variables
-            self.__protocol_version = my_message[1]
-            self.__flags = my_message[2]
-            self.__error_number = my_message[3]
-            self.__message_type = my_message[4]
-            self.__regarding = my_message[5]
-            self.__reserved = list(my_message[6])
-            self.__checksum_type = my_message[7]
-            self.__immediate_data_length = my_message[8]
-            self.__immediate_data = list(my_message[9])
-            self.__bytes_remaining = my_message[10]
-            self.__payload = list(my_message[11])
+            self.__frame = frame
 
             # confirm that the checksum, if any is correct
-            if self.__checksum_type == 0x01:
-                my_checksum = list(my_message[12])
-                self.compute_checksum_md5(self.pack_obp())
-                if my_checksum != self.__checksum:
-                    raise ValueError('The checksum was incorrect. The message is likely corrupt or malformed.')
+            if verify_checksum:
+                checksum_verify(frame)
 
     def error_code_description(self, error_code):
         if error_code == 0:
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+
+"""
+Micro-benchmarks of the OBP codec, framing, spectrum decoding, processing and correction and reply parsing, e.g.
+
+    python -m benchmarks.bench_codec --threshold 20
+    python -m benchmarks.bench_codec --update-baseline
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import os
+import sys
+import numpy as np
+from benchmarks import benchmark_runner
+from ocean_optics_device import device_introspection
+from ocean_optics_device import spectrum_decode
+from ocean_optics_device.common import device_identity
+from ocean_optics_device.spectrum_correction import SpectrumCorrection
+from ocean_optics_device.spectrum_processing import SpectrumAccumulator, boxcar_smooth
+from OceanBinaryProtocol import obp_codec
+from OceanBinaryProtocol import obp_message
+from OceanBinaryProtocol.obp_framer import ObpFramer
+
+PAYLOAD_SIZES = (0, 64, 1024, 4096, 16384, 65536)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_codec.json')
+
+
+def codec_benchmarks():
+    benchmarks = {}
+    for payload_size in PAYLOAD_SIZES:
+        for checksum_type, checksum_name in ((0x00, 'no_checksum'), (0x01, 'md5')):
+            message = obp_message.OceanBinaryProtocolMessage()
+            message.message_type = 0x00101000
+            message.checksum_type = checksum_type
+            message.payload_assign(bytes(range(256)) * (payload_size // 256) + bytes(payload_size % 256))
+            frame = message.serialize()
+            benchmarks['serialize_{0}_{1:d}'.format(checksum_name, payload_size)] = message.serialize
+            received = obp_message.OceanBinaryProtocolMessage()
+            benchmarks['deserialize_{0}_{1:d}'.format(checksum_name, payload_size)] = \
+                lambda received=received, frame=frame: received.deserialize(frame)
+
+    benchmarks['request_frame_cached'] = lambda: obp_codec.request_frame(0x00101000)
+    return benchmarks
+
+
+def decode_benchmarks():
+    benchmarks = {}
+    pixels = (np.arange(2048, dtype=np.uint16) * 13) & 0x3FFF
+
+    little_endian = pixels.astype('<u2').tobytes() + b'\x69'
+    little_endian_format = device_identity.get_pixel_format(0x101E)
+    benchmarks['decode_spectrum_le16_2048'] = \
+        lambda: spectrum_decode.decode_spectrum(little_endian, little_endian_format)
+
+    packets = np.empty((32, 2, 64), dtype=np.uint8)
+    packets[:, 0, :] = (pixels & 0xFF).reshape(-1, 64)
+    packets[:, 1, :] = (pixels >> 8).reshape(-1, 64)
+    lsb_msb = packets.tobytes() + b'\x69'
+    lsb_msb_format = device_identity.get_pixel_format(0x1002)
+    benchmarks['decode_spectrum_lsb_msb_2048'] = lambda: spectrum_decode.decode_spectrum(lsb_msb, lsb_msb_format)
+
+    obp_reply = obp_codec.pack_frame(0x00101000, payload=pixels.astype('<u2').tobytes())
+    benchmarks['decode_obp_spectrum_2048'] = lambda: spectrum_decode.decode_obp_spectrum(obp_reply)
+
+    buffered = np.zeros(100, dtype=spectrum_decode.buffered_spectrum_dtype(2048))
+    buffered['pixels'] = pixels
+    buffered_reply = obp_codec.pack_frame(0x00100928, payload=buffered.tobytes())
+    benchmarks['decode_obp_buffered_100x2048'] = \
+        lambda: spectrum_decode.decode_obp_buffered_spectra(buffered_reply, 2048)
+
+    accumulator = SpectrumAccumulator(2048)
+    benchmarks['accumulate_spectrum_2048'] = lambda: accumulator.add(pixels)
+    benchmarks['boxcar_smooth_2048'] = lambda: boxcar_smooth(pixels, 5)
+
+    correction = SpectrumCorrection((0.9, 3.0e-6, -2.0e-11, 1.0e-16))
+    correction.dark_set(1000, np.full(2048, 900.0))
+    stack = np.tile(pixels, (100, 1))
+    benchmarks['correct_spectrum_2048'] = lambda: correction.correct(pixels, 1000)
+    benchmarks['correct_stack_100x2048'] = lambda: correction.correct(stack, 1000)
+    return benchmarks
+
+
+# each operation frames one MiB, so operations per second is also MiB per second
+def framer_benchmarks():
+    benchmarks = {}
+    spectrum_frame = obp_codec.pack_frame(0x00101000, payload=bytes(4272))
+    frames = spectrum_frame * (0x100000 // len(spectrum_frame))
+    garbage = bytes(range(0x40, 0xC0)) * (0x100000 // 0x80)
+    for name, data in (('framer_spectra_1mib', frames), ('framer_garbage_1mib', garbage)):
+        chunks = [memoryview(data)[start:start + 65536] for start in range(0, len(data), 65536)]
+        framer = ObpFramer(buffer_size=0x20000)
+
+        def frame_all(framer=framer, chunks=chunks):
+            for chunk in chunks:
+                framer.feed(chunk)
+                for frame in framer.frames():
+                    pass
+        benchmarks[name] = frame_all
+    return benchmarks
+
+
+def introspection_benchmarks():
+    serial_number_reply = obp_codec.pack_frame(0x00000100, b'OFX0000000012345')
+    revision_reply = obp_codec.pack_frame(0x00000090, b'\x34\x12')
+    return {
+        'parse_serial_number': lambda: device_introspection.obp_serial_number_parse(serial_number_reply),
+        'parse_firmware_revision': lambda: device_introspection.obp_firmware_revision_parse(revision_reply),
+        'parse_hardware_revision': lambda: device_introspection.obp_hardware_revision_parse(revision_reply),
+        'parse_serial_number_length': lambda: device_introspection.obp_serial_number_length_parse(revision_reply),
+    }
+
+
+def benchmarks():
+    all_benchmarks = {}
+    all_benchmarks.update(codec_benchmarks())
+    all_benchmarks.update(decode_benchmarks())
+    all_benchmarks.update(framer_benchmarks())
+    all_benchmarks.update(introspection_benchmarks())
+    return all_benchmarks
+
+
+if __name__ == '__main__':
+    sys.exit(benchmark_runner.main(benchmarks(), 'OBP codec micro-benchmarks', BASELINE))
@@ -0,0 +1,67 @@
+#!/usr/bin/python
+
+"""
+Import times of the packages, each measured in a fresh interpreter with -X importtime, e.g.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --update-baseline
+
+Results are imports per second, so that a slower import is a drop like any other benchmark.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import os
+import subprocess
+import sys
+from benchmarks import benchmark_runner
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_import.json')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ('OceanBinaryProtocol.obp_codec', 'OceanBinaryProtocol.obp_message', 'OceanBinaryProtocol.obp_framer',
+           'ocean_optics_device.spectrum_decode', 'ocean_optics_device.spectrum_acquisition',
+           'ocean_optics_device.oo_device')
+
+
+def _interpreter_run(arguments):
+    return subprocess.run([sys.executable] + arguments, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+# the cumulative import time of module in microseconds, in a fresh interpreter
+def import_time_us(module):
+    stderr = _interpreter_run(['-X', 'importtime', '-c', 'import ' + module]).stderr
+    for line in reversed(stderr.splitlines()):
+        fields = line.split('|')
+        if (len(fields) == 3) and (fields[2].strip() == module):
+            return int(fields[1])
+    raise RuntimeError('No import time was reported for {0}.'.format(module))
+
+
+# the names of the modules that importing module loads, e.g. to check that it does not load pyusb
+def modules_loaded(module):
+    stdout = _interpreter_run(['-c', 'import sys; import {0}; print("\\n".join(sys.modules))'.format(module)]).stdout
+    return set(stdout.split())
+
+
+# imports per second for each of repeat imports
+def imports_per_second(module, repeat=7):
+    return [1e6 / import_time_us(module) for _ in range(repeat)]
+
+
+def benchmarks():
+    return {'import_' + module.split('.')[-1]: module for module in MODULES}
+
+
+if __name__ == '__main__':
+    sys.exit(benchmark_runner.main(benchmarks(), 'Import times', BASELINE, measure=imports_per_second))
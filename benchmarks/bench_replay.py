@@ -0,0 +1,72 @@
+#!/usr/bin/python
+
+"""
+Benchmarks the library on captured traffic, with no instrument attached, e.g.
+
+    python -m benchmarks.bench_replay field.capture
+    python -m benchmarks.bench_replay field.capture --update-baseline
+
+Every request in the capture is sent again through OceanOpticsDevice.device_message() to a ReplayUsbDevice that
+answers as fast as possible, and every spectrum among the replies is decoded. The baseline is kept next to the
+capture.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import sys
+from benchmarks import benchmark_runner
+from ocean_optics_device import spectrum_decode
+from ocean_optics_device import traffic_capture
+from ocean_optics_device.common import ProtocolType
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from OceanBinaryProtocol import obp_codec
+
+
+# the requests of a capture with the size of the first read that answered each, 0 if none did
+def requests_get(records):
+    requests = []
+    for timestamp_ns, direction, endpoint, data in records:
+        if direction == traffic_capture.DIRECTION_OUT:
+            requests.append([bytes(data), 0])
+        elif (direction == traffic_capture.DIRECTION_IN) and requests and (requests[-1][1] == 0):
+            requests[-1][1] = len(data)
+    return requests
+
+
+def session_replay(a_device, replay, requests):
+    replay.rewind()
+    acquisition = a_device.spectrum_acquisition_get()
+    obp = a_device.ocean_optics_protocol_get() == ProtocolType.OBP
+    spectrum_size = spectrum_decode.spectrum_byte_count(acquisition.pixel_format_get())
+    for request, reply_size in requests:
+        reply = a_device.device_message(request, reply_size)
+        if obp and (a_device.message_type_get(request) == 0x00101000):
+            spectrum_decode.decode_obp_spectrum(reply)
+        elif (not obp) and (request[0] == 0x09) and (len(reply) == spectrum_size):
+            spectrum_decode.decode_spectrum(reply, acquisition.pixel_format_get())
+
+
+def benchmarks(path):
+    vendor_id, product_id, records = traffic_capture.capture_read(path)
+    requests = requests_get(records)
+    replay = traffic_capture.ReplayUsbDevice(path, strict=False)
+    a_device = OceanOpticsDevice(usb_device=replay)
+    return {'replay_session_{0:d}_requests'.format(len(requests)): lambda: session_replay(a_device, replay, requests)}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: python -m benchmarks.bench_replay capture_file [benchmark_runner options]', file=sys.stderr)
+        sys.exit(2)
+    capture_path = sys.argv[1]
+    sys.exit(benchmark_runner.main(benchmarks(capture_path), 'Replay of captured traffic',
+                                   capture_path + '.baseline.json', sys.argv[2:]))
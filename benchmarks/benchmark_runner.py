@@ -0,0 +1,117 @@
+#!/usr/bin/python
+
+"""
+Runs micro-benchmarks, writes their results as JSON and compares them with a stored baseline.
+Each benchmark is timed several times. Its result is the median of the timings, and the spread of the timings is
+stored with it, as percent of the median. A benchmark whose operations per second drop by more than the threshold
+plus the spread of the baseline and of this run counts as a regression and makes the run exit with a non zero
+status, so that a benchmark that is noisy on the machine does not report regressions that are not there.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+
+
+# operations per second for each of repeat timings. Each timing runs for at least 0.2 seconds.
+def operations_per_second(function, repeat=7):
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    return [number / elapsed for elapsed in timer.repeat(repeat, number)]
+
+
+# the median of the samples of a benchmark, and their spread as percent of the median
+def summarize(samples):
+    median = statistics.median(samples)
+    return median, 100.0 * (max(samples) - min(samples)) / median
+
+
+# measure turns a benchmark into samples of operations per second, by default by timing it as a function. Returns
+#  the median operations per second and the spread of each benchmark.
+def run(benchmarks, name_filter=None, repeat=7, measure=operations_per_second):
+    results = {}
+    spreads = {}
+    for name, function in benchmarks.items():
+        if (name_filter is None) or (name_filter in name):
+            results[name], spreads[name] = summarize(measure(function, repeat))
+    return results, spreads
+
+
+# the names of the benchmarks that are slower than the baseline by more than threshold_percent and the spreads of
+#  the baseline and of the results
+def regressions(results, baseline, threshold_percent, spreads=None, baseline_spreads=None):
+    spreads = spreads or {}
+    baseline_spreads = baseline_spreads or {}
+    slower = {}
+    for name, ops in results.items():
+        if name in baseline:
+            change = 100.0 * (ops - baseline[name]) / baseline[name]
+            if change < -(threshold_percent + spreads.get(name, 0.0) + baseline_spreads.get(name, 0.0)):
+                slower[name] = change
+    return slower
+
+
+def main(benchmarks, description, default_baseline, argv=None, measure=operations_per_second):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--output', help='write the results as JSON to this file instead of stdout')
+    parser.add_argument('--baseline', default=default_baseline, help='the JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=25.0,
+                        help='percent drop in operations per second that counts as a regression')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=7, help='how many timings to take the median of')
+    arguments = parser.parse_args(argv)
+
+    results, spreads = run(benchmarks, arguments.filter, arguments.repeat, measure)
+    document = {'python': platform.python_version(), 'machine': platform.machine(),
+                'unit': 'operations_per_second', 'results': results, 'spread_percent': spreads}
+
+    if arguments.output is None:
+        print(json.dumps(document, indent=2, sort_keys=True))
+    else:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(document, output_file, indent=2, sort_keys=True)
+
+    try:
+        with open(arguments.baseline) as baseline_file:
+            baseline_document = json.load(baseline_file)
+    except FileNotFoundError:
+        baseline_document = None
+
+    if arguments.update_baseline:
+        # benchmarks that were not run, e.g. because of --filter, keep their baseline
+        if baseline_document is not None:
+            baseline_document['results'].update(results)
+            baseline_document.setdefault('spread_percent', {}).update(spreads)
+            baseline_document.update(python=document['python'], machine=document['machine'])
+            document = baseline_document
+        with open(arguments.baseline, 'w') as baseline_file:
+            json.dump(document, baseline_file, indent=2, sort_keys=True)
+        return 0
+
+    if baseline_document is None:
+        print('No baseline at {0}, nothing to compare with.'.format(arguments.baseline), file=sys.stderr)
+        return 0
+    baseline = baseline_document['results']
+    baseline_spreads = baseline_document.get('spread_percent', {})
+
+    slower = regressions(results, baseline, arguments.threshold, spreads, baseline_spreads)
+    for name, change in sorted(slower.items()):
+        print('REGRESSION {0}: {1:.1f}% ({2:.0f} -> {3:.0f} operations per second, spread {4:.1f}% -> {5:.1f}%)'
+              .format(name, change, baseline[name], results[name], baseline_spreads.get(name, 0.0), spreads[name]),
+              file=sys.stderr)
+    return 1 if slower else 0
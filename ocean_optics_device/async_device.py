@@ -0,0 +1,131 @@
+#!/usr/bin/python
+
+"""
+asyncio interface to ocean optics devices. Each device gets a dedicated I/O thread, so a device that is slow to
+reply only delays its own futures and one event loop can drive many spectrometers.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DeviceWorker:
+    """A single I/O thread that owns all communication with one device. Calls are run in the order they were
+    submitted, which also keeps request/reply pairs from different callers from interleaving.
+    """
+
+    def __init__(self, name='DeviceWorker'):
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    # returns a concurrent.futures.Future
+    def submit(self, function, *args, **kwargs):
+        return self.__executor.submit(function, *args, **kwargs)
+
+    async def run(self, function, *args, **kwargs):
+        return await asyncio.wrap_future(self.__executor.submit(function, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        self.__executor.shutdown(wait=wait)
+
+
+class AsyncOceanOpticsDevice:
+    """Awaitable versions of the OceanOpticsDevice, DeviceIntrospection and SpectrumAcquisition methods, e.g.
+
+        device = await AsyncOceanOpticsDevice.open('OFX00123', interface_type=InterfaceType.USB)
+        spectrum = await device.spectrum_get(as_array=True)
+
+    The synchronous device is still available through device_get().
+    """
+
+    def __init__(self, a_device, worker=None):
+        self.__device = a_device
+        self.__worker = worker if worker is not None else DeviceWorker()
+        self.__introspection = a_device.introspection_get()
+        self.__spectrum_acquisition = a_device.spectrum_acquisition_get()
+
+    # opening a device blocks on discovery, so it is done on the device's own I/O thread
+    @staticmethod
+    async def open(*args, **kwargs):
+        from ocean_optics_device.oo_device import OceanOpticsDevice
+        worker = DeviceWorker()
+        try:
+            a_device = await worker.run(OceanOpticsDevice, *args, **kwargs)
+        except BaseException:
+            worker.shutdown(wait=False)
+            raise
+        return AsyncOceanOpticsDevice(a_device, worker)
+
+    def device_get(self):
+        return self.__device
+
+    def worker_get(self):
+        return self.__worker
+
+    async def close(self):
+        await self.__worker.run(self.__device.release)
+        self.__worker.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+    async def device_message(self, data, expected_reply_size=64, usb_read_endpoint=None, usb_write_endpoint=None):
+        return await self.__worker.run(self.__device.device_message, data, expected_reply_size,
+                                       usb_read_endpoint, usb_write_endpoint)
+
+    async def reset(self):
+        return await self.__worker.run(self.__introspection.reset)
+
+    async def factory_reset(self):
+        return await self.__worker.run(self.__introspection.factory_reset)
+
+    async def hardware_revision_get(self):
+        return await self.__worker.run(self.__introspection.hardware_revision_get)
+
+    async def supported_commands_get(self):
+        return await self.__worker.run(self.__introspection.supported_commands_get)
+
+    async def firmware_revision_get(self):
+        return await self.__worker.run(self.__introspection.firmware_revision_get)
+
+    async def secondary_firmware_revision_get(self):
+        return await self.__worker.run(self.__introspection.secondary_firmware_revision_get)
+
+    async def firmware_subrevision_get(self):
+        return await self.__worker.run(self.__introspection.firmware_subrevision_get)
+
+    async def serial_number_get(self):
+        return await self.__worker.run(self.__introspection.serial_number_get)
+
+    async def serial_number_length_get(self):
+        return await self.__worker.run(self.__introspection.serial_number_length_get)
+
+    async def spectrum_get(self, data_length=0, as_array=False):
+        return await self.__worker.run(self.__spectrum_acquisition.spectrum_get, data_length, as_array)
+
+    async def spectrum_average(self, scans_to_average, boxcar=0, data_length=0):
+        return await self.__worker.run(self.__spectrum_acquisition.spectrum_average, scans_to_average, boxcar,
+                                       data_length)
+
+    async def wavelengths(self):
+        return await self.__worker.run(self.__spectrum_acquisition.wavelengths)
+
+    async def integration_time_ms_set(self, integration_time_ms=1000):
+        return await self.__worker.run(self.__spectrum_acquisition.integration_time_ms_set, integration_time_ms)
+
+    async def integration_time_us_set(self, integration_time_us=1000):
+        return await self.__worker.run(self.__spectrum_acquisition.integration_time_us_set, integration_time_us)
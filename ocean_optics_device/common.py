@@ -36,39 +36,72 @@ class ReadOrWrite(Enum):
     WRITE = 1
 
 
+# how the 16 bit pixel values of a spectrum are laid out by the device
+class PixelPacking(Enum):
+    LITTLE_ENDIAN_16 = 0        # two bytes per pixel, LSB first
+    LSB_MSB_64 = 1              # 64 byte packets of LSBs alternating with 64 byte packets of MSBs (USB2000, HR2000)
+
+
+# (protocol, device name, write endpoints, read endpoints) by usb product id
+_USB_DEVICES = \
+    {
+        0x1002: (ProtocolType.BINARY, 'USB2000', (0x02, 0x07), (0x82, 0x87)),
+        0x1009: (ProtocolType.BINARY, 'HR2000_host', (0x02, 0x07), (0x82, 0x87)),
+        0x100A: (ProtocolType.BINARY, 'HR2000_eeprom', (0x02, 0x07), (0x82, 0x87)),
+        0x1011: (ProtocolType.BINARY, 'HR4000_host', (0x01,), (0x81, 0x82, 0x86)),
+        0x1012: (ProtocolType.BINARY, 'HR4000_eeprom', (0x01,), (0x81, 0x82, 0x86)),
+        0x1016: (ProtocolType.BINARY, 'HR2000+', (0x01,), (0x81, 0x82, 0x86)),
+        0x1018: (ProtocolType.BINARY, 'QE65000', (0x01,), (0x81, 0x82, 0x86)),
+        0x101E: (ProtocolType.BINARY, 'USB2000+', (0x01,), (0x81, 0x82, 0x86)),
+        0x1022: (ProtocolType.BINARY, 'USB4000', (0x01,), (0x81, 0x82, 0x86)),
+        0x1026: (ProtocolType.BINARY, 'NIRQuest512', (0x01,), (0x81, 0x82, 0x86)),
+        0x1028: (ProtocolType.BINARY, 'NIRQuest256', (0x01,), (0x81, 0x82, 0x86)),
+        0x102A: (ProtocolType.BINARY, 'Maya2000Pro', (0x01,), (0x81, 0x82, 0x86)),
+        0x102C: (ProtocolType.BINARY, 'Maya2000', (0x01,), (0x81, 0x82, 0x86)),
+        0x1044: (ProtocolType.BINARY, 'Apex', (0x01,), (0x81, 0x82)),
+        0x1046: (ProtocolType.BINARY, 'MayaLSL', (0x01,), (0x81, 0x82, 0x86)),
+        0x104B: (ProtocolType.BINARY, 'FlameNIR', (0x01,), (0x81, 0x82, 0x86)),
+        0x2000: (ProtocolType.BINARY, 'Jaz', (0x01,), (0x81, 0x82)),
+        0x2001: (ProtocolType.OBP, 'OceanFX', (0x01,), (0x81,)),
+        0x4000: (ProtocolType.OBP, 'STS', (0x01, 0x02), (0x81, 0x82, 0x83)),
+        0x4200: (ProtocolType.OBP, 'Spark', (0x01, 0x02), (0x81, 0x82))
+    }
+
+# (pixel count, pixel packing, trailing sync byte or None, mask xor'd into each pixel value)
+_USB_PIXEL_FORMATS = \
+    {
+        0x1002: (2048, PixelPacking.LSB_MSB_64, 0x69, 0x0000),
+        0x1009: (2048, PixelPacking.LSB_MSB_64, 0x69, 0x0000),
+        0x100A: (2048, PixelPacking.LSB_MSB_64, 0x69, 0x0000),
+        0x1011: (3840, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x2000),
+        0x1012: (3840, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x2000),
+        0x1016: (2048, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x1018: (1044, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x101E: (2048, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x1022: (3840, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x1026: (512, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x1028: (256, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x102A: (2068, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x102C: (2068, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x1044: (2068, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x1046: (2068, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x104B: (128, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x2000: (2048, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000),
+        0x2001: (2136, PixelPacking.LITTLE_ENDIAN_16, None, 0x0000),
+        0x4000: (1024, PixelPacking.LITTLE_ENDIAN_16, None, 0x0000),
+        0x4200: (1024, PixelPacking.LITTLE_ENDIAN_16, None, 0x0000)
+    }
+
+
+# the tables are module constants, so that device_identity costs nothing to build at import
 class DeviceIdentity:
-    def __init__(self):
-        self.__usb_oo_protocol_type_device_name = \
-            {
-                0x1002: (ProtocolType.BINARY, 'USB2000', (0x02, 0x07), (0x82, 0x87)),
-                0x1009: (ProtocolType.BINARY, 'HR2000_host', (0x02, 0x07), (0x82, 0x87)),
-                0x100A: (ProtocolType.BINARY, 'HR2000_eeprom', (0x02, 0x07), (0x82, 0x87)),
-                0x1011: (ProtocolType.BINARY, 'HR4000_host', (0x01,), (0x81, 0x82, 0x86)),
-                0x1012: (ProtocolType.BINARY, 'HR4000_eeprom', (0x01,), (0x81, 0x82, 0x86)),
-                0x1016: (ProtocolType.BINARY, 'HR2000+', (0x01,), (0x81, 0x82, 0x86)),
-                0x1018: (ProtocolType.BINARY, 'QE65000', (0x01,), (0x81, 0x82, 0x86)),
-                0x101E: (ProtocolType.BINARY, 'USB2000+', (0x01,), (0x81, 0x82, 0x86)),
-                0x1022: (ProtocolType.BINARY, 'USB4000', (0x01,), (0x81, 0x82, 0x86)),
-                0x1026: (ProtocolType.BINARY, 'NIRQuest512', (0x01,), (0x81, 0x82, 0x86)),
-                0x1028: (ProtocolType.BINARY, 'NIRQuest256', (0x01,), (0x81, 0x82, 0x86)),
-                0x102A: (ProtocolType.BINARY, 'Maya2000Pro', (0x01,), (0x81, 0x82, 0x86)),
-                0x102C: (ProtocolType.BINARY, 'Maya2000', (0x01,), (0x81, 0x82, 0x86)),
-                0x1044: (ProtocolType.BINARY, 'Apex', (0x01,), (0x81, 0x82)),
-                0x1046: (ProtocolType.BINARY, 'MayaLSL', (0x01,), (0x81, 0x82, 0x86)),
-                0x104B: (ProtocolType.BINARY, 'FlameNIR', (0x01,), (0x81, 0x82, 0x86)),
-                0x2000: (ProtocolType.BINARY, 'Jaz', (0x01,), (0x81, 0x82)),
-                0x2001: (ProtocolType.OBP, 'OceanFX', (0x01,), (0x81,)),
-                0x4000: (ProtocolType.OBP, 'STS', (0x01, 0x02), (0x81, 0x82, 0x83)),
-                0x4200: (ProtocolType.OBP, 'Spark', (0x01, 0x02), (0x81, 0x82))
-            }
-
     def get_usb_endpoints(self, product_id, read_or_write):
         endpoints = None
         if product_id is not None:
             if read_or_write == ReadOrWrite.READ:
-                endpoints = self.__usb_oo_protocol_type_device_name.get(product_id)[3]
+                endpoints = _USB_DEVICES.get(product_id)[3]
             else:
-                endpoints = self.__usb_oo_protocol_type_device_name.get(product_id)[2]
+                endpoints = _USB_DEVICES.get(product_id)[2]
         return endpoints
 
     def get_protocol(self, serial_number, interface_type):
@@ -88,14 +121,17 @@ class DeviceIdentity:
         return oo_protocol
 
     def get_product_id_from_unique_name(self, name):
-        for device_info in self.__usb_oo_protocol_type_device_name:
-            if device_info[1][1] == name:
-                return device_info[1][0]
+        for product_id, device_info in _USB_DEVICES.items():
+            if device_info[1] == name:
+                return product_id
 
     def get_ocean_optics_device_protocol(self, productID):
-        return self.__usb_oo_protocol_type_device_name.get(productID)[0]
+        return _USB_DEVICES.get(productID)[0]
 
     def get_ocean_optics_device_name(self, productID):
-        return self.__usb_oo_protocol_type_device_name.get(productID)[1]
+        return _USB_DEVICES.get(productID)[1]
+
+    def get_pixel_format(self, product_id):
+        return _USB_PIXEL_FORMATS.get(product_id)
 
 device_identity = DeviceIdentity()
@@ -0,0 +1,146 @@
+#!/usr/bin/python
+
+"""
+Instrumentation of device messages. OceanOpticsDevice.device_message() reports every message to the hook set with
+instrumentation_set(), split into its write, first read and extended read phases, e.g.
+
+    statistics = DeviceStatistics()
+    a_device.instrumentation_set(statistics)
+    ...
+    print(statistics.snapshot())
+
+Any object with the methods of DeviceStatistics.message_record() and decode_record() can be the hook. With no hook
+set the cost of instrumentation is a test for None per phase. A request written with obp_request_write(), e.g. by a
+pipeline or a stream, is reported when its reply is read.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import threading
+
+PHASES = ('write', 'first_read', 'extended_read', 'decode')
+
+# latencies from 1 us to about 1 minute, in powers of 2
+HISTOGRAM_BUCKET_COUNT = 27
+
+
+class LatencyHistogram:
+    """Counts latencies in buckets that double in width. Bucket n holds latencies below 2 ** n microseconds, so
+    recording one is a bit_length() and an increment.
+    """
+
+    def __init__(self):
+        self.__buckets = [0] * HISTOGRAM_BUCKET_COUNT
+        self.__count = 0
+        self.__total_ns = 0
+        self.__maximum_ns = 0
+
+    def record(self, latency_ns):
+        self.__buckets[min((latency_ns // 1000).bit_length(), HISTOGRAM_BUCKET_COUNT - 1)] += 1
+        self.__count += 1
+        self.__total_ns += latency_ns
+        if latency_ns > self.__maximum_ns:
+            self.__maximum_ns = latency_ns
+
+    def count_get(self):
+        return self.__count
+
+    def mean_ns_get(self):
+        return self.__total_ns / self.__count if self.__count > 0 else 0.0
+
+    def maximum_ns_get(self):
+        return self.__maximum_ns
+
+    def buckets_get(self):
+        return list(self.__buckets)
+
+    # an upper bound of the latency below which fraction of the latencies fall, e.g. 0.99
+    def percentile_ns_get(self, fraction):
+        threshold = fraction * self.__count
+        count = 0
+        for bucket, bucket_count in enumerate(self.__buckets):
+            count += bucket_count
+            if (count >= threshold) and (count > 0):
+                return min((1 << bucket) * 1000, self.__maximum_ns)
+        return 0
+
+    def snapshot(self):
+        return {'count': self.__count, 'mean_ns': self.mean_ns_get(), 'maximum_ns': self.__maximum_ns,
+                'p50_ns': self.percentile_ns_get(0.5), 'p99_ns': self.percentile_ns_get(0.99),
+                'buckets': self.buckets_get()}
+
+
+class MessageStatistics:
+    def __init__(self):
+        self.count = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.errors = {}
+        self.latencies = {phase: LatencyHistogram() for phase in PHASES}
+
+    def snapshot(self):
+        return {'count': self.count, 'bytes_out': self.bytes_out, 'bytes_in': self.bytes_in,
+                'errors': dict(self.errors),
+                'latency': {phase: histogram.snapshot() for phase, histogram in self.latencies.items()
+                            if histogram.count_get() > 0}}
+
+
+class DeviceStatistics:
+    """Counters, byte counts, errors and latency histograms per message type. The message type is the OBP message
+    type, or the command byte of a BINARY message. Errors are counted by OBP error number, or by the name of the
+    exception when a transfer failed.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__messages = {}
+
+    def __statistics_get(self, message_type):
+        statistics = self.__messages.get(message_type)
+        if statistics is None:
+            statistics = self.__messages[message_type] = MessageStatistics()
+        return statistics
+
+    # phase_ns holds the write, first read and extended read latencies, None for a phase that did not happen
+    def message_record(self, message_type, phase_ns, bytes_out, bytes_in, error=None):
+        with self.__lock:
+            statistics = self.__statistics_get(message_type)
+            statistics.count += 1
+            statistics.bytes_out += bytes_out
+            statistics.bytes_in += bytes_in
+            for phase, latency_ns in zip(PHASES, phase_ns):
+                if latency_ns is not None:
+                    statistics.latencies[phase].record(latency_ns)
+            if error is not None:
+                statistics.errors[error] = statistics.errors.get(error, 0) + 1
+
+    def decode_record(self, message_type, decode_ns):
+        with self.__lock:
+            self.__statistics_get(message_type).latencies['decode'].record(decode_ns)
+
+    def message_types_get(self):
+        with self.__lock:
+            return list(self.__messages)
+
+    def message_statistics_get(self, message_type):
+        with self.__lock:
+            return self.__messages.get(message_type)
+
+    # everything recorded, as plain dictionaries keyed by message type, e.g. for json.dumps()
+    def snapshot(self):
+        with self.__lock:
+            return {'0x{0:08X}'.format(message_type): statistics.snapshot()
+                    for message_type, statistics in self.__messages.items()}
+
+    def reset(self):
+        with self.__lock:
+            self.__messages.clear()
@@ -16,143 +16,299 @@ __pkg_name__ = 'zephyr'
 
 
 from ocean_optics_device.common import *
-from OceanBinaryProtocol import obp_message
+from OceanBinaryProtocol import obp_codec
 import struct
 
 
+# decoding of the OBP replies, shared by DeviceIntrospection and ObpPipeline
+def obp_hardware_revision_parse(reply):
+    bcd_revision_number = struct.unpack_from('B', reply, 24)[0]
+    return '{0:d}.{1:d}'.format(bcd_revision_number & 0xF0, bcd_revision_number & 0x0F)
+
+
+def obp_firmware_revision_parse(reply):
+    bcd_revision_number = struct.unpack_from('<H', reply, 24)[0]
+    return '{0:d}.{1:d}.{2:d}.{3:d}'.format((bcd_revision_number & 0xF000)>>12,
+                                            (bcd_revision_number & 0x0F00)>>8,
+                                            (bcd_revision_number & 0x00F0)>>4,
+                                            bcd_revision_number & 0x000F)
+
+
+def obp_serial_number_parse(reply):
+    return struct.unpack_from(
+        '{0:d}s'.format(struct.unpack_from('B', reply, 23)[0]), reply, 24)[0].decode('UTF-8')
+
+
+def obp_serial_number_length_parse(reply):
+    return struct.unpack_from('B', reply, 24)[0]
+
+
+def obp_nonlinearity_coefficient_count_parse(reply):
+    return struct.unpack_from('B', reply, 24)[0]
+
+
+def obp_nonlinearity_coefficient_parse(reply):
+    return struct.unpack_from('<f', reply, 24)[0]
+
+
+def obp_wavelength_coefficient_count_parse(reply):
+    return struct.unpack_from('B', reply, 24)[0]
+
+
+def obp_wavelength_coefficient_parse(reply):
+    return struct.unpack_from('<f', reply, 24)[0]
+
+
+# a BINARY (FX2) EEPROM slot holds a null terminated ASCII string after the 2 byte echo of the query
+def binary_eeprom_string_parse(reply):
+    value = bytes(reply[2:17])
+    return value[0:value.find(b'\x00') if b'\x00' in value else len(value)].decode('ascii').strip()
+
+
+class IntrospectionCache:
+    """Facts about a device that cannot change while it is connected, e.g. its serial number and firmware revision,
+    kept so that asking again does not cost a round trip. The device empties it on reset and reconnect.
+    """
+
+    def __init__(self):
+        self.__values = {}
+        self.__hit_count = 0
+        self.__miss_count = 0
+
+    # the cached value of key, or the value returned by read(), which is then cached unless it is None
+    def get(self, key, read):
+        if key in self.__values:
+            self.__hit_count += 1
+            return self.__values[key]
+        self.__miss_count += 1
+        value = read()
+        if value is not None:
+            self.__values[key] = value
+        return value
+
+    def invalidate(self):
+        self.__values.clear()
+
+    # forget one value, e.g. after it was written to the device
+    def discard(self, key):
+        self.__values.pop(key, None)
+
+    def hit_count_get(self):
+        return self.__hit_count
+
+    def miss_count_get(self):
+        return self.__miss_count
+
+
 class DeviceIntrospection:
+    """Introspection of a device. The commands of the device's protocol are bound by protocol_bind() when the
+    device learns its protocol, so a call goes straight to them without testing the protocol.
+    """
+
     def __init__(self, a_device):
         self.__device = a_device
+        self.__commands = _UnboundIntrospection(a_device, self)
 
-    def reset(self):
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000000
-            reply = self.__device.device_message(message.serialize(), 0)
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            message = [0x01]
-            reply = self.__device.device_message(message, 0)[2::]
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            message = ['Q']
-            reply = self.__device.device_message(message, 0)
-
-    def factory_reset(self):
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000001
-            reply = self.__device.device_message(message.serialize(), 0)
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            raise RuntimeError("factory_reset() is not available for the BINARY command format.")
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            raise RuntimeError("factory_reset() is not available for the LETTER command format.")
+    def protocol_bind(self, ocean_optics_protocol):
+        if ocean_optics_protocol in _INTROSPECTION_COMMANDS:
+            self.__commands = _INTROSPECTION_COMMANDS[ocean_optics_protocol](self.__device)
+        else:
+            self.__commands = _UnboundIntrospection(self.__device, self)
+        return self.__commands
 
+    # the values read from the device are cached per device, see IntrospectionCache
     def hardware_revision_get(self):
-        hardware_revision = None
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000080
-            reply = self.__device.device_message(message.serialize())
-            bcd_revision_number = struct.unpack_from('B', reply, 24)[0]
-            hardware_revision = '{0:d}.{1:d}'.format(bcd_revision_number & 0xF0, bcd_revision_number & 0x0F)
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            RuntimeError("suppored_commands_get() is not available for the BINARY command format.")
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            raise RuntimeError("suppored_commands_get() is not available for the LETTER command format.")
-        return hardware_revision
-
-    # Not sure if this command is actually supported by Ocean FX
-    def supported_commands_get(self):
-        supported_commands = None
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000082
-            reply = self.__device.device_message(message.serialize())
-            supported_commmands = struct.unpack_from(
-                '{0:d}s'.format(struct.unpack_from('B', reply, 23)[0]), reply, 24)[0].decode('UTF-8')
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            RuntimeError("suppored_commands_get() is not available for the BINARY command format.")
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            raise RuntimeError("suppored_commands_get() is not available for the LETTER command format.")
-        return supported_commands
+        return self.__device.introspection_cache_get().get('hardware_revision',
+                                                           self.__commands.hardware_revision_read)
 
     def firmware_revision_get(self):
-        firmware_revision = None
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000090
-            reply = self.__device.device_message(message.serialize())
-            bcd_revision_number = struct.unpack_from('<H', reply, 24)[0]
-            firmware_revision = '{0:d}.{1:d}.{2:d}.{3:d}'.format((bcd_revision_number & 0xF000)>>12,
-                                                                 (bcd_revision_number & 0x0F00)>>8,
-                                                                 (bcd_revision_number & 0x00F0)>>4,
-                                                                 bcd_revision_number & 0x000F)
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            RuntimeError("firmware_revision_get() is not available for the BINARY command format.")
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            raise RuntimeError("firmware_revision_get() is not available for the LETTER command format.")
-        return firmware_revision
+        return self.__device.introspection_cache_get().get('firmware_revision',
+                                                           self.__commands.firmware_revision_read)
 
     def secondary_firmware_revision_get(self):
-        secondary_firmware_revision = None
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000091
-            reply = self.__device.device_message(message.serialize())
-            bcd_revision_number = struct.unpack_from('<H', reply, 24)[0]
-            secondary_firmware_revision = '{0:d}.{1:d}.{2:d}.{3:d}'.format((bcd_revision_number & 0xF000)>>12,
-                                                                 (bcd_revision_number & 0x0F00)>>8,
-                                                                 (bcd_revision_number & 0x00F0)>>4,
-                                                                 bcd_revision_number & 0x000F)
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            message = [0x6A, 0x04]
-            reply = self.__device.device_message(message, 4)[2:4]
-            serial_number = reply[0:next((i for i, j in enumerate(reply) if j == 0), 14):].decode('UTF-8')
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            raise RuntimeError("secondary_firmware_revision_get() is not available for the LETTER command format.")
-        return secondary_firmware_revision
+        return self.__device.introspection_cache_get().get('secondary_firmware_revision',
+                                                           self.__commands.secondary_firmware_revision_read)
 
     def firmware_subrevision_get(self):
-        firmware_subrevision = None
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000092
-            reply = self.__device.device_message(message.serialize())
-            bcd_revision_number = struct.unpack_from('<H', reply, 24)[0]
-            firmware_subrevision = '{0:d}.{1:d}.{2:d}.{3:d}'.format((bcd_revision_number & 0xF000)>>12,
-                                                                 (bcd_revision_number & 0x0F00)>>8,
-                                                                 (bcd_revision_number & 0x00F0)>>4,
-                                                                 bcd_revision_number & 0x000F)
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            RuntimeError("firmware_subrevision_get() is not available for the BINARY command format.")
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            raise RuntimeError("firmware_subrevision_get() is not available for the LETTER command format.")
-        return firmware_subrevision
+        return self.__device.introspection_cache_get().get('firmware_subrevision',
+                                                           self.__commands.firmware_subrevision_read)
 
     def serial_number_get(self):
-        serial_number = None
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000100
-            reply = self.__device.device_message(message.serialize())
-            serial_number = struct.unpack_from(
-                '{0:d}s'.format(struct.unpack_from('B', reply, 23)[0]), reply, 24)[0].decode('UTF-8')
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            message = [0x05, 0x00]
-            reply = self.__device.device_message(message, 17)[2::]
-            serial_number = reply[0:next((i for i, j in enumerate(reply) if j == 0), 14):].decode('UTF-8')
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            raise RuntimeError("serial_number_get() is not available for the LETTER command format.")
-        return serial_number
+        return self.__device.introspection_cache_get().get('serial_number', self.__commands.serial_number_read)
 
     def serial_number_length_get(self):
-        serial_number_length = None
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00000101
-            reply = self.__device.device_message(message.serialize())
-            serial_number_length = struct.unpack_from('B', reply, 24)[0]
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            serial_number_length = 15  # by definition of the protocol query data are 15 bytes long
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            raise RuntimeError("serial_number_get() is not available for the LETTER command format.")
-        return serial_number_length
+        return self.__device.introspection_cache_get().get('serial_number_length',
+                                                           self.__commands.serial_number_length_read)
+
+    # the coefficients of the nonlinearity correction polynomial, lowest order first, as a tuple of floats
+    def nonlinearity_coefficients_get(self):
+        return self.__device.introspection_cache_get().get('nonlinearity_coefficients',
+                                                           self.__commands.nonlinearity_coefficients_read)
+
+    # the coefficients of the wavelength calibration polynomial in pixel number, lowest order first
+    def wavelength_coefficients_get(self):
+        return self.__device.introspection_cache_get().get('wavelength_coefficients',
+                                                           self.__commands.wavelength_coefficients_read)
+
+    # write a new wavelength calibration to the device
+    def wavelength_coefficients_set(self, wavelength_coefficients):
+        self.__device.introspection_cache_get().discard('wavelength_coefficients')
+        self.__commands.wavelength_coefficients_write(wavelength_coefficients)
+
+    # Not sure if this command is actually supported by Ocean FX
+    def supported_commands_get(self):
+        return self.__commands.supported_commands_read()
+
+    def reset(self):
+        self.__device.introspection_cache_get().invalidate()
+        self.__commands.reset()
+
+    def factory_reset(self):
+        self.__device.introspection_cache_get().invalidate()
+        self.__commands.factory_reset()
+
+
+# the commands of each protocol. A command that a protocol does not have raises RuntimeError. Until a protocol is
+#  bound, e.g. for an introspection made apart from its device, the first command binds the protocol the device has
+#  by then.
+class _UnboundIntrospection:
+    def __init__(self, a_device, introspection):
+        self.__device = a_device
+        self.__introspection = introspection
+
+    def __getattr__(self, name):
+        ocean_optics_protocol = self.__device.ocean_optics_protocol_get()
+        if ocean_optics_protocol not in _INTROSPECTION_COMMANDS:
+            raise RuntimeError('The command format of the device is not known yet.')
+        return getattr(self.__introspection.protocol_bind(ocean_optics_protocol), name)
+
+
+class _ObpIntrospection:
+    def __init__(self, a_device):
+        self.__device = a_device
+
+    def hardware_revision_read(self):
+        return obp_hardware_revision_parse(self.__device.device_message(obp_codec.request_frame(0x00000080)))
+
+    def firmware_revision_read(self):
+        return obp_firmware_revision_parse(self.__device.device_message(obp_codec.request_frame(0x00000090)))
+
+    def secondary_firmware_revision_read(self):
+        return obp_firmware_revision_parse(self.__device.device_message(obp_codec.request_frame(0x00000091)))
+
+    def firmware_subrevision_read(self):
+        return obp_firmware_revision_parse(self.__device.device_message(obp_codec.request_frame(0x00000092)))
+
+    def serial_number_read(self):
+        return obp_serial_number_parse(self.__device.device_message(obp_codec.request_frame(0x00000100)))
+
+    def serial_number_length_read(self):
+        return obp_serial_number_length_parse(self.__device.device_message(obp_codec.request_frame(0x00000101)))
+
+    def nonlinearity_coefficients_read(self):
+        reply = self.__device.device_message(obp_codec.request_frame(0x00181100))
+        coefficient_count = obp_nonlinearity_coefficient_count_parse(reply)
+        return tuple(
+            obp_nonlinearity_coefficient_parse(
+                self.__device.device_message(obp_codec.request_frame(0x00181101, bytes([index]))))
+            for index in range(coefficient_count))
+
+    def wavelength_coefficients_read(self):
+        reply = self.__device.device_message(obp_codec.request_frame(0x00180100))
+        coefficient_count = obp_wavelength_coefficient_count_parse(reply)
+        return tuple(
+            obp_wavelength_coefficient_parse(
+                self.__device.device_message(obp_codec.request_frame(0x00180101, bytes([index]))))
+            for index in range(coefficient_count))
+
+    def wavelength_coefficients_write(self, wavelength_coefficients):
+        for index, coefficient in enumerate(wavelength_coefficients):
+            self.__device.device_message(obp_codec.request_frame(0x00180111, struct.pack('<Bf', index, coefficient)))
+
+    def supported_commands_read(self):
+        reply = self.__device.device_message(obp_codec.request_frame(0x00000082))
+        return struct.unpack_from(
+            '{0:d}s'.format(struct.unpack_from('B', reply, 23)[0]), reply, 24)[0].decode('UTF-8')
+
+    def reset(self):
+        self.__device.device_message(obp_codec.request_frame(0x00000000), 0)
+
+    def factory_reset(self):
+        self.__device.device_message(obp_codec.request_frame(0x00000001), 0)
+
+
+class _BinaryIntrospection:
+    def __init__(self, a_device):
+        self.__device = a_device
+
+    def hardware_revision_read(self):
+        return None
+
+    def firmware_revision_read(self):
+        return None
+
+    def secondary_firmware_revision_read(self):
+        message = [0x6A, 0x04]
+        self.__device.device_message(message, 4)
+        return None
+
+    def firmware_subrevision_read(self):
+        return None
+
+    def serial_number_read(self):
+        message = [0x05, 0x00]
+        reply = self.__device.device_message(message, 17)[2::]
+        return reply[0:next((i for i, j in enumerate(reply) if j == 0), 14):].decode('UTF-8')
+
+    def serial_number_length_read(self):
+        return 15  # by definition of the protocol query data are 15 bytes long
+
+    def nonlinearity_coefficients_read(self):
+        # EEPROM slot 14 holds the order of the polynomial and slots 6 to 13 the coefficients
+        order = int(binary_eeprom_string_parse(self.__device.device_message([0x05, 14], 17)))
+        if (order < 0) or (order > 7):
+            raise ValueError('The nonlinearity polynomial order, {0:d}, is out of range.'.format(order))
+        return tuple(float(binary_eeprom_string_parse(self.__device.device_message([0x05, 6 + index], 17)))
+                     for index in range(order + 1))
+
+    def wavelength_coefficients_read(self):
+        # EEPROM slots 1 to 4 hold the intercept and the first, second and third order coefficients
+        return tuple(float(binary_eeprom_string_parse(self.__device.device_message([0x05, 1 + index], 17)))
+                     for index in range(4))
+
+    def wavelength_coefficients_write(self, wavelength_coefficients):
+        if len(wavelength_coefficients) != 4:
+            raise ValueError('A BINARY device holds exactly 4 wavelength coefficients.')
+        for index, coefficient in enumerate(wavelength_coefficients):
+            value = '{0:.7e}'.format(coefficient).encode('ascii')[0:15].ljust(15, b'\x00')
+            self.__device.device_message(bytes([0x06, 1 + index]) + value, 0)
+
+    def supported_commands_read(self):
+        return None
+
+    def reset(self):
+        message = [0x01]
+        self.__device.device_message(message, 0)
+
+    def factory_reset(self):
+        raise RuntimeError("factory_reset() is not available for the BINARY command format.")
+
+
+class _LetterIntrospection:
+    def __init__(self, a_device):
+        self.__device = a_device
+
+    def __getattr__(self, name):
+        def unavailable(*arguments):
+            raise RuntimeError("{0}() is not available for the LETTER command format.".format(
+                name.replace('_read', '_get').replace('_write', '_set')))
+        return unavailable
+
+    def reset(self):
+        message = ['Q']
+        self.__device.device_message(message, 0)
+
+
+_INTROSPECTION_COMMANDS = {ProtocolType.OBP: _ObpIntrospection,
+                           ProtocolType.BINARY: _BinaryIntrospection,
+                           ProtocolType.LETTER: _LetterIntrospection}
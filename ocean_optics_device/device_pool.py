@@ -0,0 +1,83 @@
+#!/usr/bin/python
+
+"""
+Drives several ocean optics devices together. Every device has its own I/O thread, so an operation on the pool
+runs on all of the devices at the same time.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+from concurrent import futures
+from ocean_optics_device.async_device import DeviceWorker
+
+
+class DevicePool:
+    """A set of opened devices, e.g.
+
+        with DevicePool.open_usb() as pool:
+            pool.integration_time_ms_set_all(10)
+            spectra = pool.acquire_all(as_array=True)
+
+    Results are returned in the order of devices_get().
+    """
+
+    def __init__(self, devices):
+        self.__devices = list(devices)
+        self.__workers = [DeviceWorker('DevicePool') for a_device in self.__devices]
+
+    # open every ocean optics device on the usb bus. The devices are identified in parallel, see
+    #  oo_device.open_all_usb_devices().
+    @staticmethod
+    def open_usb():
+        from ocean_optics_device import oo_device
+        return DevicePool(oo_device.open_all_usb_devices())
+
+    def devices_get(self):
+        return list(self.__devices)
+
+    def serial_numbers_get(self):
+        return [a_device.serial_number_get() for a_device in self.__devices]
+
+    def __len__(self):
+        return len(self.__devices)
+
+    # call function(device, *args) for every device at once. Every call is finished before this returns. If any of
+    #  them failed the first error is raised.
+    def map(self, function, *args, **kwargs):
+        pending = [worker.submit(function, a_device, *args, **kwargs)
+                   for worker, a_device in zip(self.__workers, self.__devices)]
+        futures.wait(pending)
+        return [a_future.result() for a_future in pending]
+
+    # one spectrum from every device, acquired concurrently
+    def acquire_all(self, data_length=0, as_array=False):
+        return self.map(lambda a_device: a_device.spectrum_acquisition_get().spectrum_get(data_length, as_array))
+
+    def integration_time_ms_set_all(self, integration_time_ms=1000):
+        self.map(lambda a_device: a_device.spectrum_acquisition_get().integration_time_ms_set(integration_time_ms))
+
+    def integration_time_us_set_all(self, integration_time_us=1000):
+        self.map(lambda a_device: a_device.spectrum_acquisition_get().integration_time_us_set(integration_time_us))
+
+    def close(self):
+        try:
+            self.map(lambda a_device: a_device.release())
+        finally:
+            for worker in self.__workers:
+                worker.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
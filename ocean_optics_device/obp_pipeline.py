@@ -0,0 +1,131 @@
+#!/usr/bin/python
+
+"""
+Pipelined OBP commands. Every request carries its own regarding number, which the device returns in its reply,
+so a batch of requests can be written back to back and the replies matched to their requests afterwards.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import itertools
+import threading
+from concurrent.futures import Future
+from ocean_optics_device import device_introspection
+from ocean_optics_device import spectrum_decode
+from OceanBinaryProtocol import obp_codec
+
+# regarding numbers are shared by all pipelines, so they are unique per device too. 0 is left for unlinked messages.
+_regarding_counter = itertools.count(1)
+_regarding_lock = threading.Lock()
+
+
+# the next regarding number, 1 to 0xFFFFFFFF and then 1 again
+def _regarding_next():
+    with _regarding_lock:
+        return (next(_regarding_counter) - 1) % 0xFFFFFFFF + 1
+
+
+class ObpPipeline:
+    """Collects requests and sends them together, e.g.
+
+        with a_device.pipeline() as pipeline:
+            serial_number = pipeline.serial_number_get()
+            firmware_revision = pipeline.firmware_revision_get()
+            pipeline.integration_time_us_set(10000)
+        print(serial_number.result(), firmware_revision.result())
+
+    Every request returns a concurrent.futures.Future that is resolved by flush(), which leaving the with block
+    calls, or that is cancelled if the with block raises. A reply with an error number sets a RuntimeError on its
+    future. The device must not be used by another thread while a flush is in progress. Pipelined messages are
+    reported to the instrumentation of the device like any other.
+    """
+
+    def __init__(self, a_device):
+        self.__device = a_device
+        self.__requests = []
+        self.__pending = {}
+
+    # queue a request. reply_parser, if given, turns the reply frame into the result of the future.
+    def submit(self, message_type, immediate_data=b'', reply_parser=None):
+        regarding = _regarding_next()
+        a_future = Future()
+        self.__requests.append(obp_codec.pack_frame(message_type, immediate_data, regarding=regarding))
+        self.__pending[regarding] = (a_future, reply_parser)
+        return a_future
+
+    def flush(self):
+        requests, self.__requests = self.__requests, []
+        pending, self.__pending = self.__pending, {}
+        try:
+            for request in requests:
+                self.__device.obp_request_write(request)
+            for index in range(len(requests)):
+                reply = self.__device.obp_reply_read()
+                regarding = obp_codec.UINT32_STRUCT.unpack_from(reply, obp_codec.REGARDING_OFFSET)[0]
+                if regarding not in pending:
+                    raise RuntimeError('A reply regarding 0x{0:08X} matched no request. '
+                                       'Communications is out of sync.'.format(regarding))
+                a_future, reply_parser = pending.pop(regarding)
+                error_code = obp_codec.error_number_get(reply)
+                if error_code != 0:
+                    a_future.set_exception(RuntimeError('obp_error_code={0:d}'.format(error_code)))
+                else:
+                    try:
+                        a_future.set_result(reply if reply_parser is None else reply_parser(reply))
+                    except Exception as an_error:
+                        a_future.set_exception(an_error)
+        except Exception as an_error:
+            for a_future, reply_parser in pending.values():
+                a_future.set_exception(an_error)
+            raise
+
+    # drop the requests that have not been sent. Their futures are cancelled.
+    def cancel(self):
+        pending, self.__pending = self.__pending, {}
+        self.__requests = []
+        for a_future, reply_parser in pending.values():
+            a_future.cancel()
+
+    def __enter__(self):
+        return self
+
+    # an error in the with block cancels the requests rather than sending them, so no future is left unresolved
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.cancel()
+        return False
+
+    def hardware_revision_get(self):
+        return self.submit(0x00000080, reply_parser=device_introspection.obp_hardware_revision_parse)
+
+    def firmware_revision_get(self):
+        return self.submit(0x00000090, reply_parser=device_introspection.obp_firmware_revision_parse)
+
+    def secondary_firmware_revision_get(self):
+        return self.submit(0x00000091, reply_parser=device_introspection.obp_firmware_revision_parse)
+
+    def firmware_subrevision_get(self):
+        return self.submit(0x00000092, reply_parser=device_introspection.obp_firmware_revision_parse)
+
+    def serial_number_get(self):
+        return self.submit(0x00000100, reply_parser=device_introspection.obp_serial_number_parse)
+
+    def serial_number_length_get(self):
+        return self.submit(0x00000101, reply_parser=device_introspection.obp_serial_number_length_parse)
+
+    def spectrum_get(self):
+        return self.submit(0x00101000, reply_parser=spectrum_decode.decode_obp_spectrum)
+
+    def integration_time_us_set(self, integration_time_us=1000):
+        return self.submit(0x00110010, obp_codec.UINT32_STRUCT.pack(integration_time_us))
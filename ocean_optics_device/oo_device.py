@@ -16,56 +16,149 @@ __status__ = 'Development'
 __pkg_name__ = 'zephyr'
 
 
-from ocean_optics_device.device_introspection import *
-from ocean_optics_device.spectrum_acquisition import *
-
+import array
+import collections
 import sys
-from usb import core
-from usb import util
+import threading
+import time
 from ocean_optics_device.common import *
+from ocean_optics_device.device_introspection import DeviceIntrospection, IntrospectionCache
+from ocean_optics_device.spectrum_acquisition import SpectrumAcquisition
+from ocean_optics_device.spectrum_stream import SpectrumStream, Backpressure
+from ocean_optics_device import traffic_capture
+from OceanBinaryProtocol import obp_codec
+
+# pyusb, the tcp transport, usb discovery and pipelines are imported on first use, so that a program that only
+#  decodes spectra or uses one transport does not pay for the others at import
+
+
+def _usb_core():
+    from usb import core
+    return core
+
+
+# the pyusb errors, or none if pyusb is not installed, so that simulated and replayed devices work without it
+def _usb_errors():
+    try:
+        return _usb_core().USBError
+    except ImportError:
+        return ()
+
 
-# ToDo: just written. currently untested
+# returns the pyusb handles of every ocean optics device on the bus
 def find_all_usb_devices():
+    core = _usb_core()
     device_list = list()
     try:
         all_devices = core.find(find_all=True, idVendor=0x2457)
         for a_usb_device in all_devices:
-            try:
-                a_usb_device.set_configuration()
-            except core.USBError:
-                raise core.USBError("Could not configure the usb device in OceanOpticsDevice.find_usb_device()")
-
-            oo_protocol = device_identity.get_ocean_optics_device_protocol(a_usb_device.idProduct)
-            oo_device_name = device_identity.get_ocean_optics_device_name(a_usb_device.idProduct)
-            oo_device = OceanOpticsDevice(interface_type=InterfaceType.USB, product_id=a_usb_device.idProduct,
-                                          ocean_optics_protocol=oo_protocol,
-                                          ocean_optics_device_name = oo_device_name)
             device_list.append(a_usb_device)
     except core.NoBackendError:
         raise RuntimeError("Error: libusb is probably not installed on the host machine.\n{0}", sys.exc_info()[0])
     return device_list
 
 
+# returns an opened OceanOpticsDevice for every ocean optics device on the bus. The devices are identified in parallel.
+#  If any of them cannot be opened the others are released and the first error is raised.
+def open_all_usb_devices():
+    from ocean_optics_device import usb_discovery
+    results = usb_discovery.usb_serial_numbers_probe(find_all_usb_devices(), _usb_device_open)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        for result in results:
+            if not isinstance(result, Exception):
+                result.release()
+        raise errors[0]
+    return results
+
+
+# an opened OceanOpticsDevice, or the error that prevented opening it
+def _usb_device_open(a_usb_device):
+    try:
+        return OceanOpticsDevice(usb_device=a_usb_device)
+    except Exception as an_error:
+        return an_error
+
+
+# the serial number of a usb device, or None if it could not be read, e.g. because another program has it open
+def _usb_serial_number_probe(a_usb_device):
+    try:
+        return OceanOpticsDevice(usb_device=a_usb_device).serial_number_get()
+    except Exception:
+        return None
+
+
+class _MessageTiming:
+    __slots__ = ('write_ns', 'first_read_ns', 'extended_read_ns', 'error', '__last_ns')
+
+    def __init__(self):
+        self.write_ns = None
+        self.first_read_ns = None
+        self.extended_read_ns = None
+        self.error = None
+        self.__last_ns = time.perf_counter_ns()
+
+    # the time since the last mark
+    def mark(self):
+        now_ns = time.perf_counter_ns()
+        elapsed_ns, self.__last_ns = now_ns - self.__last_ns, now_ns
+        return elapsed_ns
+
+
+class _ReplyBuffers(threading.local):
+    """The buffers a thread reads usb replies into. pyusb reads into a whole array.array, so there is an array for
+    each read size, and a reply that takes two reads is put together in a frame buffer of its size. Replies of a
+    device come in a few sizes, so after the first of each size a steady stream of replies allocates nothing.
+    """
+
+    def __init__(self):
+        self.reads = {}
+        self.frames = {}
+
+
+# make a buffer of size bytes and keep it in buffers. Buffers of sizes no longer used are dropped.
+def _reply_buffer_add(buffers, size, make):
+    if len(buffers) >= 16:
+        buffers.clear()
+    buffer = buffers[size] = make(size)
+    return buffer
+
+
+def _read_array_make(size):
+    return array.array('B', bytes(size))
+
+
 class OceanOpticsDevice:
 
     def __init__(self, serial_number=None, interface_type=None, ocean_optics_protocol=None,
-                 product_id=None, tcp_port=57357, ocean_optics_device_name=None):
+                 product_id=None, tcp_port=57357, ocean_optics_device_name=None, usb_device=None, tcp_host=None):
+
+        self.__ocean_optics_protocol = None
 
         # bring in all of the message types. These are done in smaller classes to make things easier to read
         self.__introspection_methods = DeviceIntrospection(self)
+        self.__introspection_cache = IntrospectionCache()
         self.__spectrum_acquisition_methods = SpectrumAcquisition(self)
 
         self.__endpoints_write = (0x01,)
         self.__endpoints_read = (0x81,)
 
+        self.__tcp_host = tcp_host
         self.__tcp_port = tcp_port
         self.__interface_type = interface_type
         self.__serial_number = serial_number
         self.__device_name = ocean_optics_device_name
+        self.__product_id = product_id
         self.__usb_device = None
-        self.__tcp_socket = None
-
-        if product_id is not None:
+        self.__tcp_transport = None
+        self.__checksum_verifier = None
+        self.__instrumentation = None
+        self.__requests_in_flight = {}
+        self.__reply_buffers = _ReplyBuffers()
+
+        if usb_device is not None:
+            self.usb_device_attach(usb_device)
+        elif product_id is not None:
             self.__product_id = product_id
             self.set_product_id_and_usb_endpoints(product_id)
             self.__introspection_methods.serial_number_get()
@@ -73,10 +166,9 @@ class OceanOpticsDevice:
         if (serial_number is not None) and (interface_type is not None):
 
             if ocean_optics_protocol is None:
-                self.__ocean_optics_protocol = \
-                    device_identity.get_protocol(serial_number, interface_type)
+                self.__protocol_bind(device_identity.get_protocol(serial_number, interface_type))
             else:
-                self.__ocean_optics_protocol = ocean_optics_protocol
+                self.__protocol_bind(ocean_optics_protocol)
 
             if self.__interface_type == InterfaceType.USB:
                 if not self.find_usb_device(serial_number):
@@ -126,12 +218,27 @@ class OceanOpticsDevice:
     def usb_3rd_write_endpoint_get(self):
         return self.__endpoints_write[2]
 
+    def introspection_get(self):
+        return self.__introspection_methods
+
+    def introspection_cache_get(self):
+        return self.__introspection_cache
+
+    def spectrum_acquisition_get(self):
+        return self.__spectrum_acquisition_methods
+
     def product_id_get(self):
         return self.__product_id
 
     def ocean_optics_protocol_get(self):
         return self.__ocean_optics_protocol
 
+    # the commands of the protocol are chosen here, once, rather than on every call
+    def __protocol_bind(self, ocean_optics_protocol):
+        self.__ocean_optics_protocol = ocean_optics_protocol
+        self.__introspection_methods.protocol_bind(ocean_optics_protocol)
+        self.__spectrum_acquisition_methods.protocol_bind(ocean_optics_protocol)
+
     def interface_type_get(self):
         return self.__interface_type
 
@@ -139,30 +246,113 @@ class OceanOpticsDevice:
         return self.__serial_number
 
     def device_message(self, data, expected_reply_size=64, usb_read_endpoint=None, usb_write_endpoint=None):
-        reply = None
+        reply = self.__message(data, expected_reply_size, usb_read_endpoint, usb_write_endpoint)
+        if reply is None:
+            return bytes()
+        reply = bytes(reply)
+        if self.__ocean_optics_protocol == ProtocolType.OBP:
+            self.__obp_checksum_verify(reply)
+        return reply
+
+    # the reply as a read only memoryview of a buffer that is reused, so no copy of the reply is made. It is only
+    #  valid until the next message on the same thread; decode or copy it before then. Checksums are verified in
+    #  line, a ChecksumVerifier could not finish before the buffer is reused.
+    def device_message_view(self, data, expected_reply_size=64, usb_read_endpoint=None, usb_write_endpoint=None):
+        reply = self.__message(data, expected_reply_size, usb_read_endpoint, usb_write_endpoint)
+        if reply is None:
+            return memoryview(b'')
+        if self.__ocean_optics_protocol == ProtocolType.OBP:
+            obp_codec.checksum_verify(reply)
+        return reply.toreadonly()
+
+    def __message(self, data, expected_reply_size, usb_read_endpoint, usb_write_endpoint):
         # if no endpoints are given use the primary endpoints
         if usb_read_endpoint is None:
             usb_read_endpoint = self.__endpoints_read[0]
         if usb_write_endpoint is None:
             usb_write_endpoint = self.__endpoints_write[0]
 
+        if self.__instrumentation is None:
+            return self.__message_transfer(data, expected_reply_size, usb_read_endpoint, usb_write_endpoint)
+        timing = _MessageTiming()
+        reply = None
+        try:
+            reply = self.__message_transfer(data, expected_reply_size, usb_read_endpoint, usb_write_endpoint, timing)
+        except Exception as an_error:
+            if timing.error is None:
+                timing.error = type(an_error).__name__
+            raise
+        finally:
+            self.__instrumentation.message_record(
+                self.message_type_get(data), (timing.write_ns, timing.first_read_ns, timing.extended_read_ns),
+                len(data), 0 if reply is None else len(reply), timing.error)
+        return reply
+
+    # read a reply of first_size bytes into the reply buffers. With obp_frame the rest of an OBP frame, as told by
+    #  its bytes_remaining, is read as well, unless the reply carries an error. Returns a view of the reply.
+    def __usb_reply_read(self, first_size, usb_read_endpoint, obp_frame, timing=None):
+        reads = self.__reply_buffers.reads
+        first_read = reads.get(first_size)
+        if first_read is None:
+            first_read = _reply_buffer_add(reads, first_size, _read_array_make)
+        count = self.__usb_device.read(usb_read_endpoint, first_read, timeout=1000)
+        if count < first_size:
+            first_read = memoryview(first_read)[0:count]
+        if timing is not None:
+            timing.first_read_ns = timing.mark()
+        if (not obp_frame) or (obp_codec.error_number_get(first_read) != 0):
+            return memoryview(first_read)
+        extended_size = obp_codec.bytes_remaining_get(first_read) - obp_codec.FOOTER_SIZE
+        if extended_size <= 0:
+            return memoryview(first_read)
+        extended_read = reads.get(extended_size)
+        if extended_read is None:
+            extended_read = _reply_buffer_add(reads, extended_size, _read_array_make)
+        extended_count = self.__usb_device.read(usb_read_endpoint, extended_read, timeout=1000)
+        if extended_count < extended_size:
+            extended_read = memoryview(extended_read)[0:extended_count]
+        frames = self.__reply_buffers.frames
+        frame = frames.get(count + extended_count)
+        if frame is None:
+            frame = _reply_buffer_add(frames, count + extended_count, bytearray)
+        frame[0:count] = first_read
+        frame[count:] = extended_read
+        if timing is not None:
+            timing.extended_read_ns = timing.mark()
+        return memoryview(frame)
+
+    # the write and the reads of one message. timing, if given, collects how long each phase took.
+    def __message_transfer(self, data, expected_reply_size, usb_read_endpoint, usb_write_endpoint, timing=None):
+        reply = None
         if self.__interface_type == InterfaceType.USB:
-            try:
-                self.__usb_device.write(usb_write_endpoint, data, timeout=1000)
-                if expected_reply_size > 0:
-                    reply = self.__usb_device.read(usb_read_endpoint, expected_reply_size, timeout=1000)
-                    error_code = struct.unpack_from('<H', reply, 6)[0]
-                    if error_code == 0:
-                        if self.__ocean_optics_protocol == ProtocolType.OBP:
-                            bytes_remaining = struct.unpack_from('I', reply, 40)[0]
-                            if bytes_remaining > 20:
-                                reply += self.__usb_device.read(usb_read_endpoint, bytes_remaining - 20, timeout=1000)
-                    else:
+            # a usb error is raised to the caller, and recorded by the instrumentation by its name
+            self.__usb_device.write(usb_write_endpoint, data, timeout=1000)
+            if timing is not None:
+                timing.write_ns = timing.mark()
+            if expected_reply_size > 0:
+                # only OBP replies carry an error number, BINARY replies are just data
+                obp_frame = self.__ocean_optics_protocol == ProtocolType.OBP
+                reply = self.__usb_reply_read(expected_reply_size, usb_read_endpoint, obp_frame, timing)
+                if obp_frame:
+                    error_code = obp_codec.error_number_get(reply)
+                    if error_code != 0:
+                        if timing is not None:
+                            timing.error = error_code
                         raise RuntimeError('obp_error_code={0:d}'.format(error_code))
-            except core.USBError as myError:
-                print('USBError :' + myError.__str__())
         elif self.__interface_type == InterfaceType.TCP:
-            pass
+            self.__tcp_transport.write(data)
+            if timing is not None:
+                timing.write_ns = timing.mark()
+            if expected_reply_size > 0:
+                # the whole frame is read before the error is checked so that the connection stays in step
+                reply = self.__tcp_transport.obp_frame_read()
+                if timing is not None:
+                    timing.first_read_ns = timing.mark()
+                error_code = obp_codec.error_number_get(reply)
+                if error_code != 0:
+                    if timing is not None:
+                        timing.error = error_code
+                    raise RuntimeError('obp_error_code={0:d}'.format(error_code))
         elif self.__interface_type == InterfaceType.SERIAL:
             pass
         elif self.__interface_type == InterfaceType.SPI:
@@ -171,36 +361,234 @@ class OceanOpticsDevice:
             pass
         else:
             raise RuntimeError("Unknown device type in OceanOpticsDevice.write()")
-        return bytes(reply)
-
-    def find_usb_device(self, serial_number):
-        # return a usb_device
+        return reply
+
+    # the OBP message type of a request, or the command byte of a BINARY one
+    def message_type_get(self, data):
+        if self.__ocean_optics_protocol == ProtocolType.OBP:
+            return obp_codec.UINT32_STRUCT.unpack_from(bytes(data[0:12]), obp_codec.MESSAGE_TYPE_OFFSET)[0]
+        return data[0] if len(data) > 0 else None
+
+    # a hook such as device_instrumentation.DeviceStatistics that every message is reported to. None turns it off.
+    def instrumentation_set(self, instrumentation):
+        self.__instrumentation = instrumentation
+        self.__requests_in_flight = {}
+
+    def instrumentation_get(self):
+        return self.__instrumentation
+
+    # verify the checksum of an OBP reply now or, with a checksum verifier, on its worker thread. In that case a bad
+    #  checksum is raised by the request after the one whose reply was corrupt.
+    def __obp_checksum_verify(self, reply):
+        if self.__checksum_verifier is None:
+            obp_codec.checksum_verify(reply)
+        else:
+            self.__checksum_verifier.check()
+            if obp_codec.checksum_type_get(reply) == 0x01:
+                self.__checksum_verifier.submit(reply)
+
+    # e.g. obp_codec.ChecksumVerifier() for streaming over a link with checksums turned on. None verifies in line.
+    def checksum_verifier_set(self, checksum_verifier):
+        self.__checksum_verifier = checksum_verifier
+
+    def checksum_verifier_get(self):
+        return self.__checksum_verifier
+
+    # write an OBP request without waiting for its reply, so that several requests can be in flight at once.
+    #  Each reply is collected with obp_reply_read().
+    def obp_request_write(self, data):
+        if self.__instrumentation is None:
+            self.__obp_request_send(data)
+            return
+        # the write is reported with the reply, which has the same message type and regarding number
+        message_type = self.message_type_get(data)
+        timing = _MessageTiming()
         try:
-            all_devices = core.find(find_all = True, idVendor=0x2457)
-            found_device = False
-            for self.__usb_device in all_devices:
+            self.__obp_request_send(data)
+        except Exception as an_error:
+            self.__instrumentation.message_record(message_type, (timing.mark(), None, None), len(data), 0,
+                                                  type(an_error).__name__)
+            raise
+        key = (message_type, obp_codec.UINT32_STRUCT.unpack_from(bytes(data[0:16]), obp_codec.REGARDING_OFFSET)[0])
+        self.__requests_in_flight.setdefault(key, collections.deque()).append((timing.mark(), len(data)))
+
+    def __obp_request_send(self, data):
+        if self.__interface_type == InterfaceType.USB:
+            self.__usb_device.write(self.__endpoints_write[0], data, timeout=1000)
+        elif self.__interface_type == InterfaceType.TCP:
+            self.__tcp_transport.write(data)
+        else:
+            raise RuntimeError('obp_request_write() is not available for {0}.'.format(str(self.__interface_type)))
+
+    # the next OBP reply frame, whatever its error number
+    def obp_reply_read(self):
+        reply = bytes(self.__obp_reply_receive('obp_reply_read'))
+        self.__obp_checksum_verify(reply)
+        return reply
+
+    # the next OBP reply frame as a read only view of a buffer that is reused, as for device_message_view()
+    def obp_reply_view_read(self):
+        reply = self.__obp_reply_receive('obp_reply_view_read')
+        obp_codec.checksum_verify(reply)
+        return reply.toreadonly()
+
+    # a reply to a request written by obp_request_write(). A read that fails is not reported to the instrumentation,
+    #  it is not known which request it was the reply to.
+    def __obp_reply_receive(self, method):
+        if self.__instrumentation is None:
+            return self.__obp_reply_transfer(method)
+        timing = _MessageTiming()
+        reply = self.__obp_reply_transfer(method, timing)
+        message_type = obp_codec.UINT32_STRUCT.unpack_from(reply, obp_codec.MESSAGE_TYPE_OFFSET)[0]
+        key = (message_type, obp_codec.UINT32_STRUCT.unpack_from(reply, obp_codec.REGARDING_OFFSET)[0])
+        write_ns, bytes_out = None, 0
+        in_flight = self.__requests_in_flight.get(key)
+        if in_flight:
+            write_ns, bytes_out = in_flight.popleft()
+            if not in_flight:
+                del self.__requests_in_flight[key]
+        error_code = obp_codec.error_number_get(reply)
+        self.__instrumentation.message_record(message_type, (write_ns, timing.first_read_ns, timing.extended_read_ns),
+                                              bytes_out, len(reply), error_code if error_code != 0 else None)
+        return reply
+
+    def __obp_reply_transfer(self, method, timing=None):
+        if self.__interface_type == InterfaceType.USB:
+            return self.__usb_reply_read(obp_codec.MINIMUM_FRAME_SIZE, self.__endpoints_read[0], True, timing)
+        elif self.__interface_type == InterfaceType.TCP:
+            reply = self.__tcp_transport.obp_frame_read()
+            if timing is not None:
+                timing.first_read_ns = timing.mark()
+            return reply
+        raise RuntimeError('{0}() is not available for {1}.'.format(method, str(self.__interface_type)))
+
+    # a batch of OBP requests that are sent back to back. See ObpPipeline.
+    def pipeline(self):
+        if self.__ocean_optics_protocol != ProtocolType.OBP:
+            raise RuntimeError('pipeline() is only available for the OBP command format.')
+        from ocean_optics_device.obp_pipeline import ObpPipeline
+        return ObpPipeline(self)
+
+    # configure a pyusb device and identify it. Returns the serial number read from the device.
+    def usb_device_attach(self, a_usb_device):
+        try:
+            a_usb_device.set_configuration()
+        except _usb_errors():
+            raise _usb_core().USBError("Could not configure the usb device in OceanOpticsDevice.usb_device_attach()")
+        self.__usb_device_adopt(a_usb_device, None)
+        self.__serial_number = self.__introspection_methods.serial_number_get()
+        return self.__serial_number
+
+    # use a pyusb device that has already been configured and identified, e.g. by a probe
+    def __usb_device_adopt(self, a_usb_device, serial_number):
+        self.__introspection_cache.invalidate()
+        self.__usb_device = a_usb_device
+        # since this is USB the device name and ocean optics protocol are implied from the productID
+        self.__interface_type = InterfaceType.USB
+        self.__protocol_bind(device_identity.get_ocean_optics_device_protocol(self.__usb_device.idProduct))
+        self.__device_name = device_identity.get_ocean_optics_device_name(self.__usb_device.idProduct)
+        self.set_product_id_and_usb_endpoints(self.__usb_device.idProduct)
+        self.__serial_number = serial_number
+
+    # let go of a usb device that turned out not to be the one wanted
+    def __usb_device_detach(self, serial_number):
+        self.__usb_device = None
+        self.__introspection_cache.invalidate()
+        self.__serial_number = serial_number
+
+    def find_usb_device(self, serial_number, discovery_cache=None):
+        return self.usb_device_select(serial_number, find_all_usb_devices(), discovery_cache)
+
+    # attach the device in usb_devices that has serial_number. The discovery cache says where the device was found
+    #  last time, so usually only that device is asked for its serial number. Otherwise the remaining devices are
+    #  asked all at once and the cache is brought up to date. A known product id rules out the other devices. The
+    #  device that answers with serial_number is attached as the probe left it, without asking it again.
+    def usb_device_select(self, serial_number, usb_devices, discovery_cache=None):
+        from ocean_optics_device import usb_discovery
+        if discovery_cache is None:
+            discovery_cache = usb_discovery.DiscoveryCache()
+        candidates = [a_usb_device for a_usb_device in usb_devices
+                      if (self.__product_id is None) or (a_usb_device.idProduct == self.__product_id)]
+        for a_usb_device in candidates:
+            if discovery_cache.serial_number_get(a_usb_device) == serial_number:
+                candidates.remove(a_usb_device)
                 try:
-                    self.__usb_device.set_configuration()
-                except core.USBError:
-                    raise core.USBError("Could not configure the usb device in OceanOpticsDevice.find_usb_device()")
-                # since this is USB the device name and ocean optics protocol are implied from the productID
-                self.__ocean_optics_protocol = \
-                    device_identity.get_ocean_optics_device_protocol(self.__usb_device.idProduct)
-                self.__device_name = device_identity.get_ocean_optics_device_name(self.__usb_device.idProduct)
-                self.set_product_id_and_usb_endpoints(self.__usb_device.idProduct)
-                self.__serial_number = self.__introspection_methods.serial_number_get()
-                if serial_number == self.__serial_number:
-                    found_device = True
-                    break
-        except core.NoBackendError:
-            raise RuntimeError("Error: libusb is probably not installed on the host machine.\n{0}", sys.exc_info()[0])
+                    if self.usb_device_attach(a_usb_device) == serial_number:
+                        return True
+                except Exception:
+                    pass
+                self.__usb_device_detach(serial_number)
+                discovery_cache.forget(a_usb_device)
+                break
+
+        found_device = False
+        serial_numbers = usb_discovery.usb_serial_numbers_probe(candidates, _usb_serial_number_probe)
+        for a_usb_device, a_serial_number in zip(candidates, serial_numbers):
+            discovery_cache.store(a_usb_device, a_serial_number)
+            if (a_serial_number == serial_number) and not found_device:
+                self.__usb_device_adopt(a_usb_device, a_serial_number)
+                found_device = True
+        discovery_cache.save()
         return found_device
 
-    def release(self):
-        util.dispose_resources(self.__usb_device)
+    # record every usb transfer of the device to a capture file, see traffic_capture. A replay is attached like a
+    #  device, so the capture begins with the serial number query of an attach, and with nothing cached.
+    def traffic_capture_start(self, path):
+        if self.__interface_type != InterfaceType.USB:
+            raise RuntimeError('Traffic capture is only available for USB devices.')
+        self.traffic_capture_stop()
+        capture = traffic_capture.TrafficCapture(path, self.__usb_device.idVendor, self.__usb_device.idProduct)
+        self.__usb_device = traffic_capture.CapturingUsbDevice(self.__usb_device, capture)
+        self.__introspection_cache.invalidate()
+        self.__serial_number = self.__introspection_methods.serial_number_get()
+        return capture
+
+    def traffic_capture_stop(self):
+        if isinstance(self.__usb_device, traffic_capture.CapturingUsbDevice):
+            capture = self.__usb_device.capture_get()
+            self.__usb_device = self.__usb_device.usb_device_get()
+            capture.close()
 
+    def release(self):
+        self.traffic_capture_stop()
+        if self.__tcp_transport is not None:
+            self.__tcp_transport.close()
+            self.__tcp_transport = None
+        # only a real pyusb device holds libusb resources, a simulated one does not. A real one can only exist if
+        #  pyusb has been imported.
+        core = sys.modules.get('usb.core')
+        if (core is not None) and isinstance(self.__usb_device, core.Device):
+            from usb import util
+            util.dispose_resources(self.__usb_device)
+
+    # the device is at tcp_host:tcp_port. Connecting and reading its serial number confirms it is the right one.
     def find_network_device(self, serial_number):
-        print("find network device")
+        if self.__tcp_host is None:
+            raise ValueError('A tcp_host is needed to find network device, {0:s}.'.format(serial_number))
+        if self.__tcp_transport is not None:
+            self.__tcp_transport.close()
+        self.__introspection_cache.invalidate()
+        from ocean_optics_device.tcp_transport import TcpTransport
+        try:
+            self.__tcp_transport = TcpTransport(self.__tcp_host, self.__tcp_port)
+        except OSError:
+            return False
+        try:
+            self.__serial_number = self.__introspection_methods.serial_number_get()
+        except Exception:
+            self.__tcp_transport_drop(serial_number)
+            raise
+        if serial_number == self.__serial_number:
+            return True
+        # another device answered, don't keep its connection or its serial number
+        self.__tcp_transport_drop(serial_number)
+        return False
+
+    def __tcp_transport_drop(self, serial_number):
+        self.__tcp_transport.close()
+        self.__tcp_transport = None
+        self.__introspection_cache.invalidate()
+        self.__serial_number = serial_number
 
     def find_rs232_device(self, serial_number):
         print("find rs232 device")
@@ -0,0 +1,263 @@
+#!/usr/bin/python
+
+"""
+A simulated spectrometer that stands in for a pyusb device, so that the whole library can be run and load tested
+without hardware, e.g.
+
+    a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x2001, 'OFX00001'))
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import array
+import collections
+import struct
+import threading
+import time
+import numpy as np
+from ocean_optics_device.common import *
+from ocean_optics_device import spectrum_decode
+from OceanBinaryProtocol import obp_codec
+
+# how many different noise patterns are cycled through, so that noise costs nothing per spectrum
+_NOISE_PATTERNS = 16
+
+
+class SimulatedUsbDevice:
+    """Answers the OBP and BINARY (FX2) commands used by the library the way a device with the given product id
+    would. Spectra are synthetic: a few gaussian peaks on a dark baseline, scaled by the integration time, plus noise.
+    Acquiring a spectrum takes one integration time unless faithful_timing is False.
+    """
+
+    def __init__(self, product_id=0x2001, serial_number='OFX00001', pixel_count=None, integration_time_us=1000,
+                 faithful_timing=True, transfer_latency_s=0.0, hardware_revision=0x12, firmware_revision=0x1234,
+                 seed=0, bus=1, port_numbers=None, checksum_type=0x00,
+                 nonlinearity_coefficients=(0.95, 2.5e-6, -4.0e-11),
+                 wavelength_coefficients=(340.0, 0.38, -1.5e-5, 1.0e-10)):
+        self.idProduct = product_id
+        self.idVendor = 0x2457
+        self.bus = bus
+        self.port_numbers = port_numbers
+        self.__checksum_type = checksum_type
+        self.__protocol = device_identity.get_ocean_optics_device_protocol(product_id)
+        self.__serial_number = serial_number.encode('UTF-8')
+        pixel_format = device_identity.get_pixel_format(product_id)
+        if pixel_count is not None:
+            pixel_format = (pixel_count,) + tuple(pixel_format[1:])
+        self.__pixel_format = pixel_format
+        self.__integration_time_us = integration_time_us
+        self.__faithful_timing = faithful_timing
+        self.__transfer_latency_s = transfer_latency_s
+        self.__hardware_revision = hardware_revision
+        self.__firmware_revision = firmware_revision
+        self.__nonlinearity_coefficients = tuple(nonlinearity_coefficients)
+        self.__eeprom = {0: serial_number, 14: str(len(nonlinearity_coefficients) - 1)}
+        for index, coefficient in enumerate(nonlinearity_coefficients):
+            self.__eeprom[6 + index] = repr(coefficient)
+        self.__wavelength_coefficients = list(wavelength_coefficients)
+        for index, coefficient in enumerate(wavelength_coefficients[0:4]):
+            self.__eeprom[1 + index] = repr(coefficient)
+        self.__replies = bytearray()
+        self.__lock = threading.Lock()
+        self.__spectrum_count = 0
+        self.__requests = {}
+        # the spectrum buffer of an OBP device. Spectra enter it as they would have been acquired since it was last
+        #  looked at, or, without faithful timing, until it is full.
+        self.__buffer_size = 0
+        self.__buffer = collections.deque()
+        self.__buffer_time = time.monotonic()
+
+        pixel_count = pixel_format[0]
+        generator = np.random.default_rng(seed)
+        position = np.arange(pixel_count, dtype=np.float64)
+        self.__signal = np.zeros(pixel_count)
+        for center, width, height in ((0.2, 0.01, 1.0), (0.45, 0.02, 0.6), (0.7, 0.005, 0.8)):
+            self.__signal += height * np.exp(-0.5 * ((position - center * pixel_count) / (width * pixel_count)) ** 2)
+        self.__dark = 1500.0
+        self.__noise = generator.normal(0.0, 20.0, (_NOISE_PATTERNS, pixel_count))
+
+    def set_configuration(self):
+        pass
+
+    def serial_number_get(self):
+        return self.__serial_number.decode('UTF-8')
+
+    def integration_time_us_get(self):
+        return self.__integration_time_us
+
+    def wavelength_coefficients_get(self):
+        return tuple(self.__wavelength_coefficients)
+
+    def pixel_format_get(self):
+        return self.__pixel_format
+
+    def spectrum_count_get(self):
+        return self.__spectrum_count
+
+    # how many times each command (OBP message type or BINARY command byte) has been received
+    def request_counts_get(self):
+        return dict(self.__requests)
+
+    # the pixel values of the next spectrum
+    def spectrum_generate(self):
+        counts = self.__dark + self.__signal * (self.__integration_time_us * 5.0) + \
+            self.__noise[self.__spectrum_count % _NOISE_PATTERNS]
+        self.__spectrum_count += 1
+        return np.clip(counts, 0, 0xFFFF).astype('<u2')
+
+    def __acquire(self):
+        if self.__faithful_timing:
+            time.sleep(self.__integration_time_us / 1000000)
+        return self.spectrum_generate()
+
+    def __buffer_fill(self):
+        now = time.monotonic()
+        if self.__faithful_timing:
+            count = int((now - self.__buffer_time) * 1000000 / self.__integration_time_us)
+            self.__buffer_time += count * self.__integration_time_us / 1000000
+        else:
+            count = self.__buffer_size
+            self.__buffer_time = now
+        for index in range(min(count, self.__buffer_size - len(self.__buffer))):
+            metadata = np.zeros(1, dtype=spectrum_decode.BUFFERED_METADATA_DTYPE)
+            metadata['spectrum_count'] = self.__spectrum_count
+            metadata['tick_count_us'] = self.__spectrum_count * self.__integration_time_us
+            metadata['integration_time_us'] = self.__integration_time_us
+            self.__buffer.append(metadata.tobytes() + self.spectrum_generate().tobytes())
+
+    def write(self, endpoint, data, timeout=None):
+        if self.__transfer_latency_s > 0:
+            time.sleep(self.__transfer_latency_s)
+        data = bytes(data)
+        if self.__protocol == ProtocolType.OBP:
+            reply = self.__obp_reply(data)
+        else:
+            reply = self.__binary_reply(data)
+        if reply is not None:
+            with self.__lock:
+                self.__replies += reply
+        return len(data)
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        if self.__transfer_latency_s > 0:
+            time.sleep(self.__transfer_latency_s)
+        size = size_or_buffer if isinstance(size_or_buffer, int) else len(size_or_buffer)
+        with self.__lock:
+            if not self.__replies:
+                from usb import core
+                raise core.USBTimeoutError('Operation timed out', 110, 110)
+            reply = self.__replies[0:size]
+            del self.__replies[0:size]
+        if isinstance(size_or_buffer, int):
+            return array.array('B', reply)
+        memoryview(size_or_buffer).cast('B')[0:len(reply)] = reply
+        return len(reply)
+
+    def __count(self, command):
+        self.__requests[command] = self.__requests.get(command, 0) + 1
+
+    def __obp_reply(self, request):
+        message = obp_codec.HEADER_STRUCT.unpack_from(request)
+        message_type = message[4]
+        regarding = message[5]
+        immediate_data = message[9]
+        self.__count(message_type)
+        error_number = 0
+        immediate_reply = b''
+        payload = b''
+        if message_type in (0x00000000, 0x00000001):
+            # reset and factory reset are not answered
+            return None
+        elif message_type == 0x00000080:
+            immediate_reply = bytes([self.__hardware_revision])
+        elif message_type in (0x00000090, 0x00000091, 0x00000092):
+            immediate_reply = obp_codec.UINT16_STRUCT.pack(self.__firmware_revision)
+        elif message_type == 0x00000100:
+            immediate_reply = self.__serial_number
+        elif message_type == 0x00000101:
+            immediate_reply = bytes([len(self.__serial_number)])
+        elif message_type == 0x00101000:
+            payload = self.__acquire().tobytes()
+        elif message_type == 0x00100822:
+            self.__buffer_size = obp_codec.UINT32_STRUCT.unpack_from(immediate_data)[0]
+            while len(self.__buffer) > self.__buffer_size:
+                self.__buffer.popleft()
+        elif message_type == 0x00100830:
+            self.__buffer.clear()
+            self.__buffer_time = time.monotonic()
+        elif message_type == 0x00100900:
+            self.__buffer_fill()
+            immediate_reply = obp_codec.UINT32_STRUCT.pack(len(self.__buffer))
+        elif message_type == 0x00100928:
+            self.__buffer_fill()
+            count = min(obp_codec.UINT32_STRUCT.unpack_from(immediate_data)[0], len(self.__buffer))
+            payload = b''.join([self.__buffer.popleft() for index in range(count)])
+        elif message_type == 0x00181100:
+            immediate_reply = bytes([len(self.__nonlinearity_coefficients)])
+        elif (message_type == 0x00181101) and (immediate_data[0] < len(self.__nonlinearity_coefficients)):
+            immediate_reply = struct.pack('<f', self.__nonlinearity_coefficients[immediate_data[0]])
+        elif message_type == 0x00180100:
+            immediate_reply = bytes([len(self.__wavelength_coefficients)])
+        elif (message_type == 0x00180101) and (immediate_data[0] < len(self.__wavelength_coefficients)):
+            immediate_reply = struct.pack('<f', self.__wavelength_coefficients[immediate_data[0]])
+        elif (message_type == 0x00180111) and (immediate_data[0] < len(self.__wavelength_coefficients)):
+            self.__wavelength_coefficients[immediate_data[0]] = struct.unpack_from('<f', immediate_data, 1)[0]
+        elif message_type == 0x00110010:
+            self.__integration_time_us = obp_codec.UINT32_STRUCT.unpack_from(immediate_data)[0]
+        else:
+            error_number = 2    # unknown message type
+        reply = bytearray(obp_codec.pack_frame(message_type, immediate_reply, payload=payload, regarding=regarding,
+                                               flags=0x0001))
+        obp_codec.UINT16_STRUCT.pack_into(reply, obp_codec.ERROR_NUMBER_OFFSET, error_number)
+        if self.__checksum_type == 0x01:
+            reply[obp_codec.CHECKSUM_TYPE_OFFSET] = 0x01
+            reply[len(reply) - obp_codec.FOOTER_SIZE:len(reply) - 4] = obp_codec.checksum_compute(reply)
+        return reply
+
+    def __binary_reply(self, request):
+        command = request[0]
+        self.__count(command)
+        if command == 0x01:
+            self.__integration_time_us = 1000
+            return None
+        elif command == 0x02:
+            self.__integration_time_us = struct.unpack_from('<I', request, 1)[0]
+            return None
+        elif command == 0x05:
+            slot = request[1]
+            value = self.__eeprom.get(slot, '').encode('UTF-8')[0:15]
+            return bytes([0x05, slot]) + value.ljust(15, b'\x00')
+        elif command == 0x06:
+            slot = request[1]
+            self.__eeprom[slot] = bytes(request[2:17]).rstrip(b'\x00').decode('UTF-8')
+            if 1 <= slot <= 4:
+                self.__wavelength_coefficients[slot - 1] = float(self.__eeprom[slot])
+            return None
+        elif command == 0x09:
+            return self.__binary_spectrum_encode(self.__acquire())
+        elif command == 0x6A:
+            return bytes([0x6A, request[1]]) + obp_codec.UINT16_STRUCT.pack(self.__firmware_revision)
+        return None
+
+    def __binary_spectrum_encode(self, pixels):
+        pixel_count, pixel_packing, sync_byte, xor_mask = self.__pixel_format
+        pixels = pixels ^ np.uint16(xor_mask)
+        if pixel_packing == PixelPacking.LSB_MSB_64:
+            packets = np.empty((pixel_count // 64, 2, 64), dtype=np.uint8)
+            packets[:, 0, :] = (pixels & 0xFF).reshape(-1, 64)
+            packets[:, 1, :] = (pixels >> 8).reshape(-1, 64)
+            raw = packets.tobytes()
+        else:
+            raw = pixels.astype('<u2').tobytes()
+        if sync_byte is not None:
+            raw += bytes([sync_byte])
+        return raw
@@ -16,56 +16,366 @@ __status__ = 'Development'
 __pkg_name__ = 'zephyr'
 
 from ocean_optics_device.common import *
-from ocean_optics_device.oo_device import *
-from OceanBinaryProtocol import obp_message
+from ocean_optics_device import spectrum_decode
+from ocean_optics_device.spectrum_processing import SpectrumAccumulator, boxcar_smooth
+from ocean_optics_device.spectrum_correction import SpectrumCorrection
+from ocean_optics_device.spectrum_metadata import Spectrum
+from ocean_optics_device.spectrum_stream import SpectrumStream, Backpressure
+from OceanBinaryProtocol import obp_codec
 import struct
-import ctypes
+import time
+import numpy as np
 
 
 class SpectrumAcquisition:
+    """Spectra and integration time of a device. As for DeviceIntrospection the commands of the device's protocol
+    are bound once by protocol_bind(), so a spectrum request in a loop goes straight to its protocol's code.
+    """
+
     def __init__(self, a_device):
         self.__device = a_device
+        self.__commands = _UnboundAcquisition(a_device, self)
+        self.__pixel_format = None
+        self.__integration_time_us = None
+        self.__correction = None
+        self.__wavelengths = None
+        self.__wavelength_coefficients = None
 
-    # immediate spectrum, blocking until spectrum available
-    def spectrum_get(self, data_length=0):
-        spectrum = None
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00101000
-            reply = self.__device.device_message(message.serialize())
-            # when a spectrum is sent, it can be assumed that the immediate data is not used.
-            # with obp, the size of data to be returned is contained in the bytes remaining - 20 for checksum and
-            #  footer
-            spectrum = struct.unpack_from('{0:d}s'.format(struct.unpack_from('<I', reply, 40)[0] - 20), reply, 44)[0]
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            # for the FX2 protocol, the user must specify the number of bytes to be retrieved. It is device dependent
-            message = [0x09]
-            spectrum = self.__device.device_message(message, data_length)
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            message = ['S']
-            spectrum = self.__device.device_message(message, data_length)
-        return spectrum
+    def protocol_bind(self, ocean_optics_protocol):
+        self.__commands = _ACQUISITION_COMMANDS.get(ocean_optics_protocol, _UnboundAcquisition)(self.__device, self)
+        return self.__commands
+
+    # pixel count, packing and sync byte of the device's spectra, from the product id
+    def pixel_format_get(self):
+        if self.__pixel_format is None:
+            self.__pixel_format = device_identity.get_pixel_format(self.__device.product_id_get())
+        return self.__pixel_format
+
+    # immediate spectrum, blocking until spectrum available. With as_array the spectrum is decoded into a numpy
+    #  array of pixel values, otherwise the raw bytes are returned
+    def spectrum_get(self, data_length=0, as_array=False):
+        return self.__commands.spectrum_get(data_length, as_array)
+
+    # immediate spectrum decoded as a read only view of the device's reply buffer, so acquiring it allocates no
+    #  buffers. The view is only valid until the next message to the device from the same thread; copy it to keep it.
+    def spectrum_view_get(self, data_length=0):
+        return self.__commands.spectrum_view_get(data_length)
+
+    # spectra one after another, each a read only view as for spectrum_view_get(). An OBP device is sent the request
+    #  for the next spectrum before the reply to the current one is read, so it does not wait for the host in between.
+    #  The device must not be sent anything else until the iterator is closed.
+    def spectra_view_iterate(self, data_length=0):
+        return self.__commands.spectra_view_iterate(data_length)
+
+    # immediate spectrum as a Spectrum, with the host times of the request and the reply, the integration time and
+    #  the serial number. Its pixels are decoded when they are first used.
+    def spectrum_acquire(self, data_length=0):
+        request_ns = time.monotonic_ns()
+        reply, pixel_format = self.__commands.spectrum_reply_get(data_length)
+        return Spectrum(reply, pixel_format, request_ns, time.monotonic_ns(), None, self.__integration_time_us,
+                        self.__device.serial_number_get())
+
+    # how many spectra the device keeps in its buffer. OBP devices buffer the spectra they acquire, so that many
+    #  can be fetched in one transaction with buffered_spectra_get().
+    def buffer_size_set(self, spectrum_count):
+        self.__commands.buffer_size_set(spectrum_count)
+
+    def buffer_clear(self):
+        self.__commands.buffer_clear()
+
+    def buffered_spectrum_count_get(self):
+        return self.__commands.buffered_spectrum_count_get()
+
+    # up to maximum_count buffered spectra in one transaction, oldest first, as a 2-D numpy array of pixel values
+    #  with one spectrum per row and a structured array of the metadata of each. See decode_obp_buffered_spectra().
+    def buffered_spectra_get(self, maximum_count=64):
+        return self.__commands.buffered_spectra_get(maximum_count)
+
+    # the mean of scans_to_average spectra as a float64 numpy array, smoothed by a boxcar of boxcar pixels on
+    #  either side. Each scan is added to a preallocated sum as it arrives, so the spectra are never kept.
+    def spectrum_average(self, scans_to_average, boxcar=0, data_length=0):
+        if scans_to_average < 1:
+            raise ValueError('At least one scan must be averaged.')
+        spectrum = self.spectrum_view_get(data_length)
+        accumulator = SpectrumAccumulator(len(spectrum))
+        accumulator.add(spectrum)
+        for scan in range(scans_to_average - 1):
+            accumulator.add(self.spectrum_view_get(data_length))
+        return boxcar_smooth(accumulator.average_get(), boxcar)
+
+    # the wavelength of every pixel in nm, as a read only numpy array. The axis is computed once and the same array
+    #  is returned until the calibration of the device changes.
+    def wavelengths(self):
+        coefficients = self.__device.introspection_get().wavelength_coefficients_get()
+        if (self.__wavelengths is None) or (coefficients != self.__wavelength_coefficients):
+            pixels = np.arange(self.pixel_format_get()[0], dtype=np.float64)
+            wavelengths = np.polynomial.polynomial.polyval(pixels, coefficients)
+            wavelengths.flags.writeable = False
+            self.__wavelengths = wavelengths
+            self.__wavelength_coefficients = coefficients
+        return self.__wavelengths
+
+    # write a new wavelength calibration to the device, which replaces the wavelength axis
+    def wavelength_coefficients_set(self, wavelength_coefficients):
+        self.__device.introspection_get().wavelength_coefficients_set(wavelength_coefficients)
+        self.__wavelengths = None
+
+    # the dark and nonlinearity correction of the device. The coefficients are read the first time.
+    def correction_get(self):
+        if self.__correction is None:
+            self.__correction = SpectrumCorrection.from_device(self.__device)
+        return self.__correction
+
+    # acquire the dark spectrum for the current integration time, e.g. with the light source shuttered
+    def dark_acquire(self, scans_to_average=1, data_length=0):
+        if self.__integration_time_us is None:
+            raise RuntimeError('The integration time must be set before a dark spectrum is acquired.')
+        dark_spectrum = self.spectrum_average(scans_to_average, data_length=data_length)
+        self.correction_get().dark_set(self.__integration_time_us, dark_spectrum)
+        return dark_spectrum
+
+    # a spectrum corrected for nonlinearity and, if one was acquired for the current integration time, for dark
+    def spectrum_corrected_get(self, scans_to_average=1, boxcar=0, data_length=0):
+        correction = self.correction_get()
+        integration_time_us = self.__integration_time_us
+        if correction.dark_get(integration_time_us) is None:
+            integration_time_us = None
+        spectrum = self.spectrum_average(scans_to_average, data_length=data_length)
+        return boxcar_smooth(correction.correct(spectrum, integration_time_us), boxcar)
+
+    # continuous acquisition by a background reader into a ring of capacity spectra. See SpectrumStream. The device
+    #  must not be used for anything else until the stream is stopped.
+    def stream(self, capacity=16, backpressure=Backpressure.BLOCK, data_length=0, timeout=None, recorder=None):
+        return SpectrumStream(self, capacity, backpressure, data_length, timeout, recorder)
 
     def integration_time_ms_set(self, integration_time_ms=1000):
         self.integration_time_us_set(integration_time_ms * 1000)
 
     # set integration time in microseconds
     def integration_time_us_set(self, integration_time_us=1000):
-        if self.__device.ocean_optics_protocol_get() == ProtocolType.OBP:
-            message = obp_message.OceanBinaryProtocolMessage()
-            message.message_type = 0x00110010
-            message.immediate_data_length = 0x04
-            immediate_data = ctypes.create_string_buffer(16)
-            struct.pack_into('<I', immediate_data, 0, integration_time_us)
-            message.immediate_data_assign(bytes(immediate_data))
-            reply = self.__device.device_message(message.serialize())
-            error_code = struct.unpack_from('<H', reply, 6)[0]
-            if error_code != 0:
-                raise RuntimeError('obp_error_code={0:d}'.format(error_code))
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.BINARY:
-            # for the FX2 protocol, the user must specify the number of bytes to be retrieved. It is device dependent
-            reply = self.__device.device_message(struct.pack('<BI', 0x02, integration_time_us), 0)
-        elif self.__device.ocean_optics_protocol_get() == ProtocolType.LETTER:
-            my_data = 'i{0:d}'.format(integration_time_us)
-            message = struct.pack('{0:d}s'.format(len(my_data)), my_data)
-            reply = self.__device.device_message(message, 0)
+        self.__commands.integration_time_us_set(integration_time_us)
+        self.__integration_time_us = integration_time_us
+
+    # the integration time last set through this object, or None if it has not been set
+    def integration_time_us_get(self):
+        return self.__integration_time_us
+
+    # append a spectrum to a SpectrumRecorder, with the serial number and integration time of the device
+    def spectrum_record(self, recorder, spectrum, timestamp_ns=None):
+        integration_time_us = self.__integration_time_us if self.__integration_time_us is not None else 0
+        recorder.append(spectrum, timestamp_ns, self.__device.serial_number_get() or '', integration_time_us)
+
+
+def _decode_record(a_device, message_type, decode_start_ns):
+    instrumentation = a_device.instrumentation_get()
+    if instrumentation is not None:
+        instrumentation.decode_record(message_type, time.perf_counter_ns() - decode_start_ns)
+
+
+# the commands of each protocol. Until a protocol is bound, e.g. for an acquisition made apart from its device, the
+#  first command binds the protocol the device has by then.
+class _UnboundAcquisition:
+    def __init__(self, a_device, acquisition):
+        self.__device = a_device
+        self.__acquisition = acquisition
+
+    def __bound_commands(self):
+        ocean_optics_protocol = self.__device.ocean_optics_protocol_get()
+        if ocean_optics_protocol not in _ACQUISITION_COMMANDS:
+            raise RuntimeError('The command format of the device is not known yet.')
+        return self.__acquisition.protocol_bind(ocean_optics_protocol)
+
+    def spectrum_get(self, data_length, as_array):
+        return self.__bound_commands().spectrum_get(data_length, as_array)
+
+    def spectrum_reply_get(self, data_length):
+        return self.__bound_commands().spectrum_reply_get(data_length)
+
+    def spectrum_view_get(self, data_length):
+        return self.__bound_commands().spectrum_view_get(data_length)
+
+    def spectra_view_iterate(self, data_length):
+        return self.__bound_commands().spectra_view_iterate(data_length)
+
+    def integration_time_us_set(self, integration_time_us):
+        self.__bound_commands().integration_time_us_set(integration_time_us)
+
+    def buffer_size_set(self, spectrum_count):
+        self.__bound_commands().buffer_size_set(spectrum_count)
+
+    def buffer_clear(self):
+        self.__bound_commands().buffer_clear()
+
+    def buffered_spectrum_count_get(self):
+        return self.__bound_commands().buffered_spectrum_count_get()
+
+    def buffered_spectra_get(self, maximum_count):
+        return self.__bound_commands().buffered_spectra_get(maximum_count)
+
+
+class _ObpAcquisition:
+    def __init__(self, a_device, acquisition):
+        self.__device = a_device
+        self.__acquisition = acquisition
+        # the request never changes, so it is built once
+        self.__spectrum_request = obp_codec.request_frame(0x00101000)
+
+    def spectrum_get(self, data_length, as_array):
+        reply = self.__device.device_message(self.__spectrum_request)
+        # when a spectrum is sent, it can be assumed that the immediate data is not used.
+        # with obp, the size of data to be returned is contained in the bytes remaining - 20 for checksum and
+        #  footer
+        if as_array:
+            decode_start_ns = time.perf_counter_ns()
+            spectrum = spectrum_decode.decode_obp_spectrum(reply)
+            _decode_record(self.__device, 0x00101000, decode_start_ns)
+            return spectrum
+        return reply[obp_codec.PAYLOAD_OFFSET:
+                     obp_codec.HEADER_SIZE + obp_codec.bytes_remaining_get(reply) - obp_codec.FOOTER_SIZE]
+
+    # the whole reply and None for its pixel format, the pixels are the payload
+    def spectrum_reply_get(self, data_length):
+        return self.__device.device_message(self.__spectrum_request), None
+
+    def spectrum_view_get(self, data_length):
+        return self.__spectrum_decode(self.__device.device_message_view(self.__spectrum_request))
+
+    # one request is always in flight, so the device starts the next spectrum while this one is decoded
+    def spectra_view_iterate(self, data_length):
+        self.__device.obp_request_write(self.__spectrum_request)
+        try:
+            while True:
+                self.__device.obp_request_write(self.__spectrum_request)
+                reply = self.__device.obp_reply_view_read()
+                error_code = obp_codec.error_number_get(reply)
+                if error_code != 0:
+                    raise RuntimeError('obp_error_code={0:d}'.format(error_code))
+                yield self.__spectrum_decode(reply)
+        except (GeneratorExit, RuntimeError, ValueError):
+            # the reply to the request still in flight is read so that the device stays in step. After a transfer
+            #  error the state of the link is not known, so nothing more is read.
+            self.__device.obp_reply_read()
+            raise
+
+    def __spectrum_decode(self, reply):
+        decode_start_ns = time.perf_counter_ns()
+        spectrum = spectrum_decode.decode_obp_spectrum(reply)
+        _decode_record(self.__device, 0x00101000, decode_start_ns)
+        return spectrum
+
+    def integration_time_us_set(self, integration_time_us):
+        reply = self.__device.device_message(
+            obp_codec.request_frame(0x00110010, obp_codec.UINT32_STRUCT.pack(integration_time_us)))
+        error_code = obp_codec.error_number_get(reply)
+        if error_code != 0:
+            raise RuntimeError('obp_error_code={0:d}'.format(error_code))
+
+    def buffer_size_set(self, spectrum_count):
+        self.__device.device_message(obp_codec.request_frame(0x00100822, obp_codec.UINT32_STRUCT.pack(spectrum_count)))
+
+    def buffer_clear(self):
+        self.__device.device_message(obp_codec.request_frame(0x00100830))
+
+    def buffered_spectrum_count_get(self):
+        reply = self.__device.device_message(obp_codec.request_frame(0x00100900))
+        return obp_codec.UINT32_STRUCT.unpack_from(reply, obp_codec.IMMEDIATE_DATA_OFFSET)[0]
+
+    def buffered_spectra_get(self, maximum_count):
+        reply = self.__device.device_message(
+            obp_codec.request_frame(0x00100928, obp_codec.UINT32_STRUCT.pack(maximum_count)))
+        decode_start_ns = time.perf_counter_ns()
+        spectra = spectrum_decode.decode_obp_buffered_spectra(reply, self.__acquisition.pixel_format_get()[0])
+        _decode_record(self.__device, 0x00100928, decode_start_ns)
+        return spectra
+
+
+# a device without a spectrum buffer
+class _UnbufferedAcquisition:
+    command_format = None
+
+    # the device answers one request at a time, so each spectrum is requested once the last one has been read
+    def spectra_view_iterate(self, data_length):
+        while True:
+            yield self.spectrum_view_get(data_length)
+
+    def buffer_size_set(self, spectrum_count):
+        self.__unavailable('buffer_size_set')
+
+    def buffer_clear(self):
+        self.__unavailable('buffer_clear')
+
+    def buffered_spectrum_count_get(self):
+        self.__unavailable('buffered_spectrum_count_get')
+
+    def buffered_spectra_get(self, maximum_count):
+        self.__unavailable('buffered_spectra_get')
+
+    def __unavailable(self, method):
+        raise RuntimeError('{0}() is not available for the {1} command format.'.format(method, self.command_format))
+
+
+class _BinaryAcquisition(_UnbufferedAcquisition):
+    command_format = 'BINARY'
+
+    def __init__(self, a_device, acquisition):
+        self.__device = a_device
+        self.__acquisition = acquisition
+
+    def spectrum_get(self, data_length, as_array):
+        # for the FX2 protocol, the number of bytes to be retrieved is device dependent. Unless the user
+        #  specifies it, it comes from the pixel format of the device
+        pixel_format = self.__acquisition.pixel_format_get()
+        if data_length == 0:
+            data_length = spectrum_decode.spectrum_byte_count(pixel_format)
+        spectrum = self.__device.device_message([0x09], data_length)
+        if as_array:
+            decode_start_ns = time.perf_counter_ns()
+            spectrum = spectrum_decode.decode_spectrum(spectrum, pixel_format)
+            _decode_record(self.__device, 0x09, decode_start_ns)
+        return spectrum
+
+    def spectrum_reply_get(self, data_length):
+        pixel_format = self.__acquisition.pixel_format_get()
+        if data_length == 0:
+            data_length = spectrum_decode.spectrum_byte_count(pixel_format)
+        return self.__device.device_message([0x09], data_length), pixel_format
+
+    def spectrum_view_get(self, data_length):
+        pixel_format = self.__acquisition.pixel_format_get()
+        if data_length == 0:
+            data_length = spectrum_decode.spectrum_byte_count(pixel_format)
+        reply = self.__device.device_message_view([0x09], data_length)
+        decode_start_ns = time.perf_counter_ns()
+        spectrum = spectrum_decode.decode_spectrum(reply, pixel_format)
+        _decode_record(self.__device, 0x09, decode_start_ns)
+        return spectrum
+
+    def integration_time_us_set(self, integration_time_us):
+        self.__device.device_message(struct.pack('<BI', 0x02, integration_time_us), 0)
+
+
+class _LetterAcquisition(_UnbufferedAcquisition):
+    command_format = 'LETTER'
+
+    def __init__(self, a_device, acquisition):
+        self.__device = a_device
+
+    def spectrum_get(self, data_length, as_array):
+        message = ['S']
+        return self.__device.device_message(message, data_length)
+
+    def spectrum_reply_get(self, data_length):
+        raise RuntimeError('spectrum_acquire() is not available for the LETTER command format.')
+
+    def spectrum_view_get(self, data_length):
+        raise RuntimeError('spectrum_view_get() is not available for the LETTER command format.')
+
+    def integration_time_us_set(self, integration_time_us):
+        my_data = 'i{0:d}'.format(integration_time_us)
+        message = struct.pack('{0:d}s'.format(len(my_data)), my_data)
+        self.__device.device_message(message, 0)
+
+
+_ACQUISITION_COMMANDS = {ProtocolType.OBP: _ObpAcquisition,
+                         ProtocolType.BINARY: _BinaryAcquisition,
+                         ProtocolType.LETTER: _LetterAcquisition}
@@ -0,0 +1,106 @@
+#!/usr/bin/python
+
+"""
+Dark subtraction and nonlinearity correction of raw spectra
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import threading
+import numpy as np
+
+# nonlinearity coefficients by serial number. They are written into the device at calibration, so they are read
+#  from a device once per process however often it is opened.
+_nonlinearity_coefficients = {}
+_nonlinearity_coefficients_lock = threading.Lock()
+
+
+def nonlinearity_coefficients_get(a_device):
+    serial_number = a_device.serial_number_get()
+    with _nonlinearity_coefficients_lock:
+        coefficients = _nonlinearity_coefficients.get(serial_number)
+    if coefficients is None:
+        coefficients = a_device.introspection_get().nonlinearity_coefficients_get()
+        if (serial_number is not None) and (coefficients is not None):
+            with _nonlinearity_coefficients_lock:
+                _nonlinearity_coefficients[serial_number] = coefficients
+    return coefficients
+
+
+def nonlinearity_coefficients_cache_clear():
+    with _nonlinearity_coefficients_lock:
+        _nonlinearity_coefficients.clear()
+
+
+class SpectrumCorrection:
+    """Corrects raw counts in two steps: the dark spectrum for the integration time is subtracted, then the counts
+    are divided by the nonlinearity polynomial evaluated at the dark corrected counts,
+
+        corrected = (raw - dark) / (c0 + c1 * (raw - dark) + c2 * (raw - dark) ** 2 + ...)
+
+    The polynomial is evaluated by Horner's rule over whole arrays, so a 2-D stack of spectra, one per row, is
+    corrected in the same few passes as a single spectrum. Dark spectra are kept per integration time.
+    """
+
+    def __init__(self, nonlinearity_coefficients=None):
+        self.__coefficients = None
+        self.__darks = {}
+        self.nonlinearity_coefficients_set(nonlinearity_coefficients)
+
+    # a correction with the nonlinearity coefficients of a_device
+    @staticmethod
+    def from_device(a_device):
+        return SpectrumCorrection(nonlinearity_coefficients_get(a_device))
+
+    def nonlinearity_coefficients_set(self, nonlinearity_coefficients):
+        if (nonlinearity_coefficients is None) or (len(nonlinearity_coefficients) == 0):
+            self.__coefficients = None
+        else:
+            # highest order first for Horner's rule
+            self.__coefficients = np.array(nonlinearity_coefficients, dtype=np.float64)[::-1].copy()
+
+    def nonlinearity_coefficients_get(self):
+        return None if self.__coefficients is None else tuple(self.__coefficients[::-1])
+
+    def dark_set(self, integration_time_us, dark_spectrum):
+        dark_spectrum = np.array(dark_spectrum, dtype=np.float64)
+        dark_spectrum.flags.writeable = False
+        self.__darks[integration_time_us] = dark_spectrum
+
+    def dark_get(self, integration_time_us):
+        return self.__darks.get(integration_time_us)
+
+    def dark_clear(self):
+        self.__darks.clear()
+
+    def integration_times_get(self):
+        return sorted(self.__darks)
+
+    # corrected float64 counts of one spectrum or of a stack of spectra. With integration_time_us the dark for that
+    #  integration time is subtracted and must have been set, without it no dark is subtracted.
+    def correct(self, spectra, integration_time_us=None):
+        corrected = np.array(spectra, dtype=np.float64)
+        if integration_time_us is not None:
+            dark = self.__darks.get(integration_time_us)
+            if dark is None:
+                raise ValueError('No dark spectrum was set for {0:d} us.'.format(integration_time_us))
+            if dark.shape[-1] != corrected.shape[-1]:
+                raise ValueError('The dark spectrum has {0:d} pixels, not {1:d}.'.format(dark.shape[-1],
+                                                                                      corrected.shape[-1]))
+            np.subtract(corrected, dark, out=corrected)
+        if self.__coefficients is not None:
+            factor = np.full_like(corrected, self.__coefficients[0])
+            for coefficient in self.__coefficients[1:]:
+                np.multiply(factor, corrected, out=factor)
+                np.add(factor, coefficient, out=factor)
+            np.divide(corrected, factor, out=corrected)
+        return corrected
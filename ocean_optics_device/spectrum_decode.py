@@ -0,0 +1,82 @@
+#!/usr/bin/python
+
+"""
+Decoding of raw spectra into numpy arrays of pixel values
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import numpy as np
+from ocean_optics_device.common import PixelPacking
+from OceanBinaryProtocol import obp_codec
+
+PIXEL_DTYPE = np.dtype('<u2')
+
+
+def spectrum_byte_count(pixel_format):
+    # the number of bytes a BINARY (FX2) device sends for one spectrum, including the sync byte
+    pixel_count, pixel_packing, sync_byte, xor_mask = pixel_format
+    return pixel_count * 2 + (0 if sync_byte is None else 1)
+
+
+def decode_spectrum(raw, pixel_format):
+    """Decode the raw pixel bytes of one spectrum. Little endian pixels without an xor mask are returned as a read
+    only view of raw, so nothing is copied. Other packings need one vectorized pass.
+    """
+    pixel_count, pixel_packing, sync_byte, xor_mask = pixel_format
+    if sync_byte is not None:
+        if (len(raw) <= pixel_count * 2) or (raw[pixel_count * 2] != sync_byte):
+            raise ValueError('The spectrum did not end with the sync byte 0x{0:02X}. '
+                             'Communications is out of sync.'.format(sync_byte))
+    if pixel_packing == PixelPacking.LITTLE_ENDIAN_16:
+        pixels = np.frombuffer(raw, dtype=PIXEL_DTYPE, count=pixel_count)
+    elif pixel_packing == PixelPacking.LSB_MSB_64:
+        packets = np.frombuffer(raw, dtype=np.uint8, count=pixel_count * 2).reshape(-1, 2, 64)
+        pixels = (packets[:, 1, :].astype(PIXEL_DTYPE) << 8) | packets[:, 0, :]
+        pixels = pixels.reshape(pixel_count)
+    else:
+        raise ValueError('Unknown pixel packing, {0}.'.format(str(pixel_packing)))
+    if xor_mask != 0:
+        pixels = pixels ^ np.uint16(xor_mask)
+    return pixels
+
+
+def decode_obp_spectrum(reply):
+    # an OBP spectrum is the payload of the reply, little endian 16 bit pixels
+    payload_length = obp_codec.bytes_remaining_get(reply) - obp_codec.FOOTER_SIZE
+    return np.frombuffer(reply, dtype=PIXEL_DTYPE, count=payload_length // 2, offset=obp_codec.PAYLOAD_OFFSET)
+
+
+# the 64 bytes of metadata that an OBP device sends ahead of each buffered spectrum
+BUFFERED_METADATA_DTYPE = np.dtype([('spectrum_count', '<u4'), ('tick_count_us', '<u8'),
+                                    ('integration_time_us', '<u4'), ('reserved_0', 'V2'), ('trigger_mode', 'u1'),
+                                    ('reserved_1', 'V45')])
+
+
+# a buffered spectrum as it is sent, its metadata followed by its pixels
+def buffered_spectrum_dtype(pixel_count):
+    return np.dtype(BUFFERED_METADATA_DTYPE.descr + [('pixels', PIXEL_DTYPE, (pixel_count,))])
+
+
+def decode_obp_buffered_spectra(reply, pixel_count):
+    """Decode the buffered spectra in the payload of an OBP reply. The payload is read as an array of records in
+    one pass, so the pixels are returned as a read only 2-D view of the reply, one spectrum per row, with the
+    metadata of each spectrum as a structured array.
+    """
+    dtype = buffered_spectrum_dtype(pixel_count)
+    payload_length = obp_codec.bytes_remaining_get(reply) - obp_codec.FOOTER_SIZE
+    if payload_length % dtype.itemsize != 0:
+        raise ValueError('The buffered spectra are {0:d} bytes, not a whole number of {1:d} pixel spectra.'.format(
+            payload_length, pixel_count))
+    records = np.frombuffer(reply, dtype=dtype, count=payload_length // dtype.itemsize,
+                            offset=obp_codec.PAYLOAD_OFFSET)
+    return records['pixels'], records[['spectrum_count', 'tick_count_us', 'integration_time_us', 'trigger_mode']]
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+
+"""
+Spectra with the time and settings of their acquisition, e.g.
+
+    spectrum = acquisition.spectrum_acquire()
+    print(spectrum.reply_ns - spectrum.request_ns, spectrum.pixels.max())
+
+Host times are time.monotonic_ns(), so they order and space spectra correctly but are not wall clock times.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import numpy as np
+from ocean_optics_device import spectrum_decode
+
+SERIAL_NUMBER_SIZE = 16
+
+# the metadata of a batch of spectra, one record per spectrum. A tick count of -1 means the device did not send one.
+METADATA_DTYPE = np.dtype([('request_ns', '<i8'), ('reply_ns', '<i8'), ('tick_count_us', '<i8'),
+                           ('integration_time_us', '<u4'), ('serial_number', 'S{0:d}'.format(SERIAL_NUMBER_SIZE))])
+
+
+class Spectrum:
+    """One spectrum and its metadata: the host times at which it was requested and received, the device tick count
+    if the protocol sends one, the integration time and the serial number of the device.
+
+    raw is the reply as it was read. The pixels are decoded from it the first time they are used, as a read only
+    view of raw where the packing allows, so a spectrum whose pixels are never used costs only this object.
+    """
+
+    __slots__ = ('request_ns', 'reply_ns', 'tick_count_us', 'integration_time_us', 'serial_number', 'raw',
+                 'pixel_format', '__pixels')
+
+    # pixel_format is None for an OBP reply, whose payload is the pixels
+    def __init__(self, raw, pixel_format=None, request_ns=0, reply_ns=0, tick_count_us=None, integration_time_us=None,
+                 serial_number=None):
+        self.raw = raw
+        self.pixel_format = pixel_format
+        self.request_ns = request_ns
+        self.reply_ns = reply_ns
+        self.tick_count_us = tick_count_us
+        self.integration_time_us = integration_time_us
+        self.serial_number = serial_number
+        self.__pixels = None
+
+    @property
+    def pixels(self):
+        if self.__pixels is None:
+            if self.pixel_format is None:
+                self.__pixels = spectrum_decode.decode_obp_spectrum(self.raw)
+            else:
+                self.__pixels = spectrum_decode.decode_spectrum(self.raw, self.pixel_format)
+        return self.__pixels
+
+    def __len__(self):
+        return len(self.pixels)
+
+    def __repr__(self):
+        return 'Spectrum(serial_number={0!r}, request_ns={1:d}, reply_ns={2:d}, integration_time_us={3!r})'.format(
+            self.serial_number, self.request_ns, self.reply_ns, self.integration_time_us)
+
+
+# the metadata of spectra as a structured array of METADATA_DTYPE, e.g. to store or search the times of a stream
+def metadata_array(spectra):
+    metadata = np.zeros(len(spectra), dtype=METADATA_DTYPE)
+    for index, spectrum in enumerate(spectra):
+        metadata[index] = (spectrum.request_ns, spectrum.reply_ns,
+                           -1 if spectrum.tick_count_us is None else spectrum.tick_count_us,
+                           0 if spectrum.integration_time_us is None else spectrum.integration_time_us,
+                           (spectrum.serial_number or '').encode('UTF-8'))
+    return metadata
@@ -0,0 +1,65 @@
+#!/usr/bin/python
+
+"""
+Host side processing of spectra: scan averaging and boxcar smoothing
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import numpy as np
+
+
+def boxcar_smooth(spectrum, boxcar_width):
+    """Replace every pixel with the mean of itself and boxcar_width pixels on either side. Near the ends the window
+    is cut short rather than padded. The sums come from one cumulative sum, so the cost does not depend on the width.
+    """
+    spectrum = np.asarray(spectrum, dtype=np.float64)
+    if boxcar_width <= 0:
+        return spectrum.copy()
+    pixel_count = len(spectrum)
+    sums = np.empty(pixel_count + 1)
+    sums[0] = 0.0
+    np.cumsum(spectrum, out=sums[1:])
+    pixels = np.arange(pixel_count)
+    low = np.maximum(pixels - boxcar_width, 0)
+    high = np.minimum(pixels + boxcar_width + 1, pixel_count)
+    return (sums[high] - sums[low]) / (high - low)
+
+
+class SpectrumAccumulator:
+    """Sums spectra into a buffer that is allocated once. Integer pixels are summed as int64, so no precision is
+    lost however many scans are added, and each scan costs one vectorized add.
+    """
+
+    def __init__(self, pixel_count, dtype=np.int64):
+        self.__sum = np.zeros(pixel_count, dtype=dtype)
+        self.__scan_count = 0
+
+    def scan_count_get(self):
+        return self.__scan_count
+
+    def add(self, spectrum):
+        np.add(self.__sum, spectrum, out=self.__sum, casting='unsafe')
+        self.__scan_count += 1
+
+    def sum_get(self):
+        return self.__sum
+
+    # the mean of the scans added so far, as float64
+    def average_get(self):
+        if self.__scan_count == 0:
+            raise ValueError('No scans have been added.')
+        return self.__sum / self.__scan_count
+
+    def clear(self):
+        self.__sum.fill(0)
+        self.__scan_count = 0
@@ -0,0 +1,212 @@
+#!/usr/bin/python
+
+"""
+An append only file of spectra for long recordings. Every record has the same size, so record n is at a known
+offset and a recording can be memory mapped and read in any order without loading it. A sidecar index holds the
+timestamps alone, so a time range is found by a binary search that touches only a few pages.
+
+    with SpectrumRecorder('run.spectra', 2136) as recorder:
+        recorder.append(spectrum, serial_number='OFX00001', integration_time_us=10000)
+
+    recording = SpectrumRecording('run.spectra')
+    pixels = recording.time_range(start_ns, stop_ns)['pixels']
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import os
+import struct
+import time
+import numpy as np
+
+RECORDING_MAGIC = b'ZSPECREC'
+RECORDING_VERSION = 1
+HEADER_SIZE = 64
+SERIAL_NUMBER_SIZE = 16
+INDEX_SUFFIX = '.index'
+
+# magic, version, header size, pixel count, record size, pixel dtype
+HEADER_STRUCT = struct.Struct('<8sHHII8s')
+INDEX_DTYPE = np.dtype('<i8')
+
+
+def record_dtype(pixel_count, pixel_dtype='<u2'):
+    return np.dtype([('timestamp_ns', '<i8'), ('integration_time_us', '<u4'),
+                     ('serial_number', 'S{0:d}'.format(SERIAL_NUMBER_SIZE)),
+                     ('pixels', pixel_dtype, (pixel_count,))])
+
+
+def index_path_get(path):
+    return path + INDEX_SUFFIX
+
+
+def _header_pack(pixel_count, dtype):
+    header = HEADER_STRUCT.pack(RECORDING_MAGIC, RECORDING_VERSION, HEADER_SIZE, pixel_count, dtype.itemsize,
+                                dtype['pixels'].base.str.encode('ascii'))
+    return header.ljust(HEADER_SIZE, b'\x00')
+
+
+# the pixel count and record dtype from the header of a recording
+def _header_unpack(header):
+    if len(header) < HEADER_STRUCT.size:
+        raise ValueError('The recording header is incomplete.')
+    magic, version, header_size, pixel_count, record_size, pixel_dtype = HEADER_STRUCT.unpack_from(header)
+    if magic != RECORDING_MAGIC:
+        raise ValueError('The file is not a spectrum recording.')
+    if (version != RECORDING_VERSION) or (header_size != HEADER_SIZE):
+        raise ValueError('Spectrum recording version {0:d} is not supported.'.format(version))
+    dtype = record_dtype(pixel_count, pixel_dtype.rstrip(b'\x00').decode('ascii'))
+    if dtype.itemsize != record_size:
+        raise ValueError('The recording record size does not match its pixel count.')
+    return pixel_count, dtype
+
+
+class SpectrumRecorder:
+    """Appends spectra to a recording. Records are collected in a preallocated batch and written batch_size at a
+    time, so an append is a copy into memory. An existing recording with the same pixel count is appended to; a
+    partial record left by a crash is cut off first. Only one thread may append.
+
+    Timestamps must not decrease, since the index is searched by time. By default the time of the append is used.
+    """
+
+    def __init__(self, path, pixel_count, pixel_dtype='<u2', batch_size=256):
+        self.__path = path
+        self.__dtype = record_dtype(pixel_count, pixel_dtype)
+        self.__batch = np.zeros(batch_size, dtype=self.__dtype)
+        self.__batch_count = 0
+        self.__last_timestamp_ns = None
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as recording_file:
+                existing_pixel_count, existing_dtype = _header_unpack(recording_file.read(HEADER_SIZE))
+            if existing_dtype != self.__dtype:
+                raise ValueError('{0} records {1:d} pixels, not {2:d}.'.format(path, existing_pixel_count,
+                                                                              pixel_count))
+            self.__record_count = (os.path.getsize(path) - HEADER_SIZE) // self.__dtype.itemsize
+            self.__file = open(path, 'r+b')
+            self.__file.truncate(HEADER_SIZE + self.__record_count * self.__dtype.itemsize)
+            self.__file.seek(0, os.SEEK_END)
+            self.__index_file = open(index_path_get(path), 'ab')
+            if self.__record_count > 0:
+                self.__file.seek(HEADER_SIZE + (self.__record_count - 1) * self.__dtype.itemsize)
+                self.__last_timestamp_ns = int(np.frombuffer(self.__file.read(8), dtype=INDEX_DTYPE)[0])
+                self.__file.seek(0, os.SEEK_END)
+            # the index is rebuilt from the records if it does not match them
+            if os.path.getsize(index_path_get(path)) != self.__record_count * INDEX_DTYPE.itemsize:
+                self.__index_file.close()
+                self.__index_file = open(index_path_get(path), 'wb')
+                self.__index_file.write(SpectrumRecording(path).timestamps_get().tobytes())
+        else:
+            self.__record_count = 0
+            self.__file = open(path, 'wb')
+            self.__file.write(_header_pack(pixel_count, self.__dtype))
+            self.__index_file = open(index_path_get(path), 'wb')
+
+    def path_get(self):
+        return self.__path
+
+    # records appended, including those not yet written
+    def record_count_get(self):
+        return self.__record_count + self.__batch_count
+
+    def append(self, spectrum, timestamp_ns=None, serial_number='', integration_time_us=0):
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+            if (self.__last_timestamp_ns is not None) and (timestamp_ns < self.__last_timestamp_ns):
+                # the clock was set back
+                timestamp_ns = self.__last_timestamp_ns
+        elif (self.__last_timestamp_ns is not None) and (timestamp_ns < self.__last_timestamp_ns):
+            raise ValueError('Timestamps must not decrease.')
+        self.__last_timestamp_ns = timestamp_ns
+
+        record = self.__batch[self.__batch_count]
+        record['timestamp_ns'] = timestamp_ns
+        record['integration_time_us'] = integration_time_us
+        record['serial_number'] = serial_number.encode('UTF-8') if isinstance(serial_number, str) else serial_number
+        record['pixels'] = spectrum
+        self.__batch_count += 1
+        if self.__batch_count == len(self.__batch):
+            self.flush()
+
+    def flush(self):
+        if self.__batch_count > 0:
+            records = self.__batch[0:self.__batch_count]
+            self.__file.write(memoryview(records).cast('B'))
+            self.__index_file.write(records['timestamp_ns'].astype(INDEX_DTYPE).tobytes())
+            self.__record_count += self.__batch_count
+            self.__batch_count = 0
+        self.__file.flush()
+        self.__index_file.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.__file.close()
+            self.__index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class SpectrumRecording:
+    """A memory mapped recording. Records are returned as numpy structured arrays with the fields timestamp_ns,
+    integration_time_us, serial_number and pixels, which are views of the file, so only the pages that are used are
+    read. The records that were complete when the recording was opened are visible.
+    """
+
+    def __init__(self, path):
+        self.__path = path
+        with open(path, 'rb') as recording_file:
+            self.__pixel_count, self.__dtype = _header_unpack(recording_file.read(HEADER_SIZE))
+        record_count = (os.path.getsize(path) - HEADER_SIZE) // self.__dtype.itemsize
+        if record_count > 0:
+            self.__records = np.memmap(path, dtype=self.__dtype, mode='r', offset=HEADER_SIZE, shape=(record_count,))
+        else:
+            self.__records = np.zeros(0, dtype=self.__dtype)
+
+        # the sidecar index is only trusted if it covers every record, otherwise the timestamps are read in place
+        index_path = index_path_get(path)
+        if (record_count > 0) and os.path.exists(index_path) and \
+                (os.path.getsize(index_path) >= record_count * INDEX_DTYPE.itemsize):
+            self.__timestamps = np.memmap(index_path, dtype=INDEX_DTYPE, mode='r', shape=(record_count,))
+        else:
+            self.__timestamps = self.__records['timestamp_ns']
+
+    def path_get(self):
+        return self.__path
+
+    def pixel_count_get(self):
+        return self.__pixel_count
+
+    def __len__(self):
+        return len(self.__records)
+
+    def __getitem__(self, item):
+        return self.__records[item]
+
+    def records_get(self):
+        return self.__records
+
+    def timestamps_get(self):
+        return self.__timestamps
+
+    # the records with start_ns <= timestamp_ns < stop_ns, as a view
+    def time_range(self, start_ns=None, stop_ns=None):
+        start = 0 if start_ns is None else int(np.searchsorted(self.__timestamps, start_ns, side='left'))
+        stop = len(self.__records) if stop_ns is None else int(np.searchsorted(self.__timestamps, stop_ns,
+                                                                                   side='left'))
+        return self.__records[start:stop]
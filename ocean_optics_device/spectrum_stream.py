@@ -0,0 +1,195 @@
+#!/usr/bin/python
+
+"""
+Continuous spectrum acquisition. A background reader keeps the device busy while the caller processes the
+previous spectrum, and hands spectra over through a preallocated ring of buffers.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import collections
+import threading
+from enum import Enum
+import numpy as np
+
+
+# what the reader does when the ring is full because the caller is not keeping up
+class Backpressure(Enum):
+    BLOCK = 0           # wait for the caller, so the device goes idle
+    DROP_OLDEST = 1     # overwrite the oldest spectrum that has not been read
+    DROP_NEWEST = 2     # throw away the spectrum that was just acquired
+
+
+class SpectrumRing:
+    """A fixed number of spectrum buffers allocated up front. The spectrum returned by get() is a read only view of
+    its buffer and stays valid until the next call to get().
+    """
+
+    def __init__(self, capacity, pixel_count, dtype=np.uint16, backpressure=Backpressure.BLOCK):
+        if capacity < 1:
+            raise ValueError('The capacity should be at least 1.')
+        # one more buffer than the capacity, for the spectrum the caller is holding
+        self.__buffers = np.empty((capacity + 1, pixel_count), dtype=dtype)
+        self.__backpressure = backpressure
+        self.__condition = threading.Condition()
+        self.__ready = collections.deque()
+        self.__free = list(range(capacity + 1))
+        self.__held = None
+        self.__dropped_count = 0
+        self.__closed = False
+
+    def dropped_count_get(self):
+        return self.__dropped_count
+
+    def pixel_count_get(self):
+        return self.__buffers.shape[1]
+
+    # copy a spectrum into the ring. Returns False if the ring has been closed.
+    def put(self, spectrum):
+        with self.__condition:
+            if self.__closed:
+                return False
+            while not self.__free:
+                if self.__closed:
+                    return False
+                if self.__backpressure == Backpressure.DROP_NEWEST:
+                    self.__dropped_count += 1
+                    return True
+                elif self.__backpressure == Backpressure.DROP_OLDEST:
+                    self.__free.append(self.__ready.popleft())
+                    self.__dropped_count += 1
+                else:
+                    self.__condition.wait()
+            slot = self.__free.pop()
+
+        # the slot belongs to the writer until it is queued, so the copy is made without holding the lock
+        self.__buffers[slot, :] = spectrum
+
+        with self.__condition:
+            self.__ready.append(slot)
+            self.__condition.notify_all()
+        return True
+
+    # the oldest unread spectrum, or None once the ring is closed and empty
+    def get(self, timeout=None):
+        with self.__condition:
+            if self.__held is not None:
+                self.__free.append(self.__held)
+                self.__held = None
+                self.__condition.notify_all()
+            while not self.__ready:
+                if self.__closed:
+                    return None
+                if not self.__condition.wait(timeout):
+                    raise TimeoutError('No spectrum arrived within {0} seconds.'.format(timeout))
+            self.__held = self.__ready.popleft()
+        spectrum = self.__buffers[self.__held]
+        spectrum.flags.writeable = False
+        return spectrum
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+
+class SpectrumStream:
+    """Iterates over spectra acquired continuously by a background reader, e.g.
+
+        with acquisition.stream(capacity=32, backpressure=Backpressure.DROP_OLDEST) as spectra:
+            for spectrum in spectra:
+                ...
+
+    Each spectrum is a read only numpy view into the ring and is only valid until the next one is requested, so it
+    must be copied if it is to be kept. With a SpectrumRecorder, every spectrum acquired is also recorded by the
+    reader, including any the ring drops.
+
+    The reader keeps a spectrum request in flight while it handles the previous reply, see
+    SpectrumAcquisition.spectra_view_iterate(), and the spectrum still in flight when the stream stops is discarded
+    without being recorded. The device is not locked, so it must not be used for anything else,
+    e.g. integration_time_us_set(), until the stream has been stopped.
+    """
+
+    def __init__(self, acquisition, capacity=16, backpressure=Backpressure.BLOCK, data_length=0, timeout=None,
+                 recorder=None):
+        self.__acquisition = acquisition
+        self.__capacity = capacity
+        self.__backpressure = backpressure
+        self.__data_length = data_length
+        self.__timeout = timeout
+        self.__recorder = recorder
+        self.__ring = None
+        self.__thread = None
+        self.__stop = threading.Event()
+        self.__error = None
+
+    def start(self):
+        if self.__thread is None:
+            # the first spectrum is read here so the ring can be sized before the reader starts
+            first_spectrum = self.__acquisition.spectrum_get(self.__data_length, as_array=True)
+            if self.__recorder is not None:
+                self.__acquisition.spectrum_record(self.__recorder, first_spectrum)
+            self.__ring = SpectrumRing(self.__capacity, len(first_spectrum), first_spectrum.dtype, self.__backpressure)
+            self.__ring.put(first_spectrum)
+            self.__thread = threading.Thread(target=self.__read_spectra, name='SpectrumStream', daemon=True)
+            self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__ring is not None:
+            self.__ring.close()
+        if self.__thread is not None:
+            self.__thread.join()
+        if self.__recorder is not None:
+            self.__recorder.flush()
+
+    def dropped_count_get(self):
+        return 0 if self.__ring is None else self.__ring.dropped_count_get()
+
+    def __read_spectra(self):
+        spectra = self.__acquisition.spectra_view_iterate(self.__data_length)
+        try:
+            # each spectrum is a view of the reply buffer, the ring and the recorder copy it before the next is read
+            for spectrum in spectra:
+                if self.__recorder is not None:
+                    self.__acquisition.spectrum_record(self.__recorder, spectrum)
+                if self.__stop.is_set() or not self.__ring.put(spectrum):
+                    break
+        except Exception as an_error:
+            self.__error = an_error
+        finally:
+            try:
+                spectra.close()
+            except Exception as an_error:
+                if self.__error is None:
+                    self.__error = an_error
+            self.__ring.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def __iter__(self):
+        self.start()
+        return self
+
+    def __next__(self):
+        spectrum = self.__ring.get(self.__timeout)
+        if spectrum is None:
+            if self.__error is not None:
+                raise self.__error
+            raise StopIteration
+        return spectrum
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+"""
+OBP over a persistent TCP connection, as used by ethernet attached devices such as the Ocean FX
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import socket
+from OceanBinaryProtocol import obp_codec
+from OceanBinaryProtocol.obp_framer import ObpFramer
+
+# above the largest reply of a device, 64 buffered spectra of an Ocean FX are 277568 bytes, so that a corrupt
+#  bytes_remaining above it is skipped at once rather than waited for
+MAXIMUM_FRAME_SIZE = 0x80000
+
+
+class TcpTransport:
+    """One socket per device, kept open for the life of the device. Replies are received straight into the buffer
+    of an ObpFramer, which splits them into frames and skips anything that is not a valid frame, so a corrupt reply
+    does not desynchronize the connection. Requests may be written back to back before their replies are read.
+    A frame still incomplete when a read times out is taken to have a corrupt length and is skipped.
+    """
+
+    def __init__(self, host, port=57357, timeout=1.0, buffer_size=65536, maximum_frame_size=MAXIMUM_FRAME_SIZE,
+                 verify_checksum=False):
+        self.__host = host
+        self.__port = port
+        self.__socket = socket.create_connection((host, port), timeout=timeout)
+        self.__socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__receive_size = max(buffer_size, obp_codec.MINIMUM_FRAME_SIZE)
+        self.__framer = ObpFramer(2 * self.__receive_size, maximum_frame_size=maximum_frame_size,
+                                  verify_checksum=verify_checksum)
+
+    def address_get(self):
+        return self.__host, self.__port
+
+    def framer_get(self):
+        return self.__framer
+
+    def write(self, data):
+        self.__socket.sendall(data)
+
+    # the next reply frame as a view into the receive buffer. The view is only valid until the next read.
+    def obp_frame_read(self):
+        frame = self.__framer.frame_next()
+        while frame is None:
+            try:
+                received = self.__socket.recv_into(self.__framer.buffer_reserve(self.__receive_size))
+            except socket.timeout:
+                # the device has stopped sending, so a frame still waiting for bytes will never get them
+                if not self.__framer.frame_abandon():
+                    raise
+                frame = self.__framer.frame_next()
+                continue
+            if received == 0:
+                raise ConnectionError('The connection to {0}:{1:d} was closed by the device.'.format(self.__host,
+                                                                                                      self.__port))
+            self.__framer.buffer_commit(received)
+            frame = self.__framer.frame_next()
+        return frame
+
+    def close(self):
+        self.__socket.close()
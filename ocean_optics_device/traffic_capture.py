@@ -0,0 +1,214 @@
+#!/usr/bin/python
+
+"""
+Capture of the raw usb traffic of a device, and replay of a capture in place of the device, e.g.
+
+    a_device.traffic_capture_start('field.capture')
+    ...
+    a_device.traffic_capture_stop()
+
+    a_device = OceanOpticsDevice(usb_device=ReplayUsbDevice('field.capture'))
+
+A capture is a header followed by one record per transfer: a record header of timestamp, direction, endpoint and
+length, then the bytes transferred.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import array
+import struct
+import threading
+import time
+
+CAPTURE_MAGIC = b'ZCAPTURE'
+CAPTURE_VERSION = 1
+
+# magic, version, vendor id, product id
+CAPTURE_HEADER_STRUCT = struct.Struct('<8sHHH')
+# nanoseconds since the capture started, direction, endpoint, length of the data that follows
+RECORD_STRUCT = struct.Struct('<qBBI')
+
+DIRECTION_OUT = 0           # written to the device
+DIRECTION_IN = 1            # read from the device
+DIRECTION_ERROR = 2         # a read failed, the data is the name of the exception
+
+
+class TrafficCapture:
+    """Writes transfers to a capture file. Records are buffered by the file object, so a record costs a struct pack
+    and two writes into memory.
+    """
+
+    def __init__(self, path, vendor_id=0x2457, product_id=0x0000):
+        self.__path = path
+        self.__file = open(path, 'wb')
+        self.__file.write(CAPTURE_HEADER_STRUCT.pack(CAPTURE_MAGIC, CAPTURE_VERSION, vendor_id, product_id))
+        self.__start_ns = time.perf_counter_ns()
+        self.__lock = threading.Lock()
+        self.__record_count = 0
+
+    def path_get(self):
+        return self.__path
+
+    def record_count_get(self):
+        return self.__record_count
+
+    def record(self, direction, endpoint, data):
+        timestamp_ns = time.perf_counter_ns() - self.__start_ns
+        with self.__lock:
+            self.__file.write(RECORD_STRUCT.pack(timestamp_ns, direction, endpoint, len(data)))
+            self.__file.write(data)
+            self.__record_count += 1
+
+    def flush(self):
+        with self.__lock:
+            self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+# the vendor id, product id and records of a capture. Each record is (timestamp_ns, direction, endpoint, data).
+def capture_read(path):
+    with open(path, 'rb') as capture_file:
+        content = capture_file.read()
+    if len(content) < CAPTURE_HEADER_STRUCT.size:
+        raise ValueError('The capture header is incomplete.')
+    magic, version, vendor_id, product_id = CAPTURE_HEADER_STRUCT.unpack_from(content)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError('The file is not a traffic capture.')
+    if version != CAPTURE_VERSION:
+        raise ValueError('Traffic capture version {0:d} is not supported.'.format(version))
+    records = []
+    view = memoryview(content)
+    offset = CAPTURE_HEADER_STRUCT.size
+    while offset + RECORD_STRUCT.size <= len(content):
+        timestamp_ns, direction, endpoint, length = RECORD_STRUCT.unpack_from(content, offset)
+        offset += RECORD_STRUCT.size
+        if offset + length > len(content):
+            # the last record was cut short, e.g. the program was killed while capturing
+            break
+        records.append((timestamp_ns, direction, endpoint, view[offset:offset + length]))
+        offset += length
+    return vendor_id, product_id, records
+
+
+class CapturingUsbDevice:
+    """Passes the transfers of a pyusb device through, recording each one in a TrafficCapture"""
+
+    def __init__(self, a_usb_device, capture):
+        self.__usb_device = a_usb_device
+        self.__capture = capture
+        self.idVendor = a_usb_device.idVendor
+        self.idProduct = a_usb_device.idProduct
+
+    def usb_device_get(self):
+        return self.__usb_device
+
+    def capture_get(self):
+        return self.__capture
+
+    def set_configuration(self):
+        self.__usb_device.set_configuration()
+
+    def write(self, endpoint, data, timeout=None):
+        self.__capture.record(DIRECTION_OUT, endpoint, bytes(data))
+        return self.__usb_device.write(endpoint, data, timeout=timeout)
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        try:
+            reply = self.__usb_device.read(endpoint, size_or_buffer, timeout=timeout)
+        except Exception as an_error:
+            self.__capture.record(DIRECTION_ERROR, endpoint, type(an_error).__name__.encode('ascii'))
+            raise
+        if isinstance(size_or_buffer, int):
+            self.__capture.record(DIRECTION_IN, endpoint, bytes(reply))
+        else:
+            self.__capture.record(DIRECTION_IN, endpoint, bytes(memoryview(size_or_buffer).cast('B')[0:reply]))
+        return reply
+
+
+class ReplayUsbDevice:
+    """Stands in for a pyusb device by serving the reads of a capture in order. With speed 1.0 each read is held
+    back until as much time has passed since the first transfer as when it was captured, 2.0 replays twice as fast
+    and None as fast as possible.
+
+    With strict set, every write must match the captured write, so a replay that has drifted from the capture is
+    reported rather than answered with the wrong data. OBP pipelines number their requests differently every run,
+    so they are replayed with strict off.
+    """
+
+    def __init__(self, path, speed=None, strict=True):
+        self.idVendor, self.idProduct, self.__records = capture_read(path)
+        self.__speed = speed
+        self.__strict = strict
+        self.__lock = threading.Lock()
+        self.rewind()
+
+    # start again from the first record, e.g. to replay a capture repeatedly in a benchmark
+    def rewind(self):
+        with self.__lock:
+            self.__position = 0
+            self.__start_ns = None
+
+    def records_remaining_get(self):
+        return len(self.__records) - self.__position
+
+    def set_configuration(self):
+        pass
+
+    def __next_record(self, directions):
+        if self.__position >= len(self.__records):
+            raise EOFError('The capture has been replayed to the end.')
+        record = self.__records[self.__position]
+        if record[1] not in directions:
+            raise ValueError('The replay expected a transfer of direction {0:d} at record {1:d}. The library did not '
+                             'repeat the captured traffic.'.format(record[1], self.__position))
+        self.__position += 1
+        if self.__speed is not None:
+            if self.__start_ns is None:
+                self.__start_ns = time.perf_counter_ns() - int(record[0] / self.__speed)
+            delay_ns = self.__start_ns + int(record[0] / self.__speed) - time.perf_counter_ns()
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+        return record
+
+    def write(self, endpoint, data, timeout=None):
+        with self.__lock:
+            timestamp_ns, direction, captured_endpoint, captured_data = self.__next_record((DIRECTION_OUT,))
+        if self.__strict and ((captured_endpoint != endpoint) or (bytes(data) != captured_data)):
+            raise ValueError('The write to endpoint 0x{0:02X} does not match the capture.'.format(endpoint))
+        return len(data)
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        with self.__lock:
+            timestamp_ns, direction, captured_endpoint, captured_data = \
+                self.__next_record((DIRECTION_IN, DIRECTION_ERROR))
+        if direction == DIRECTION_ERROR:
+            from usb import core
+            if bytes(captured_data) == b'USBTimeoutError':
+                raise core.USBTimeoutError('Operation timed out (replayed)', 110, 110)
+            raise core.USBError('{0} (replayed)'.format(bytes(captured_data).decode('ascii')))
+        if isinstance(size_or_buffer, int):
+            # frombytes copies the view in one step, array.array('B', view) would go byte by byte
+            reply = array.array('B')
+            reply.frombytes(captured_data)
+            return reply
+        memoryview(size_or_buffer).cast('B')[0:len(captured_data)] = captured_data
+        return len(captured_data)
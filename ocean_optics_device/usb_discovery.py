@@ -0,0 +1,95 @@
+#!/usr/bin/python
+
+"""
+Remembers which serial number was found at which place on the usb bus, so that opening a device by serial number
+does not have to ask every device on the bus who it is.
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import json
+import os
+import tempfile
+from concurrent import futures
+
+
+def default_cache_path():
+    cache_directory = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_directory, 'zephyr', 'usb_discovery.json')
+
+
+# where a device is plugged in: bus, port path and product id. None if the backend does not report the topology.
+def usb_location_key(a_usb_device):
+    bus = getattr(a_usb_device, 'bus', None)
+    port_numbers = getattr(a_usb_device, 'port_numbers', None)
+    if (bus is None) or (port_numbers is None):
+        return None
+    return '{0:d}:{1:s}:{2:04X}'.format(bus, '.'.join(str(port) for port in port_numbers), a_usb_device.idProduct)
+
+
+class DiscoveryCache:
+    """Serial numbers keyed by usb location, kept in a JSON file between runs. An entry is only a hint: the device
+    found there is still asked for its serial number before it is used.
+    """
+
+    def __init__(self, path=None):
+        self.__path = path if path is not None else default_cache_path()
+        self.__serial_numbers = {}
+        self.__changed = False
+        try:
+            with open(self.__path) as cache_file:
+                self.__serial_numbers = json.load(cache_file)
+        except (OSError, ValueError):
+            # a missing or damaged cache only costs a full discovery
+            pass
+
+    def path_get(self):
+        return self.__path
+
+    def serial_number_get(self, a_usb_device):
+        return self.__serial_numbers.get(usb_location_key(a_usb_device))
+
+    def store(self, a_usb_device, serial_number):
+        key = usb_location_key(a_usb_device)
+        if (key is not None) and (self.__serial_numbers.get(key) != serial_number):
+            if serial_number is None:
+                self.__serial_numbers.pop(key, None)
+            else:
+                self.__serial_numbers[key] = serial_number
+            self.__changed = True
+
+    def forget(self, a_usb_device):
+        self.store(a_usb_device, None)
+
+    # write the cache if it changed. The file is replaced in one step so that a reader never sees half of it.
+    def save(self):
+        if self.__changed:
+            directory = os.path.dirname(self.__path)
+            try:
+                os.makedirs(directory, exist_ok=True)
+                file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(file_descriptor, 'w') as cache_file:
+                    json.dump(self.__serial_numbers, cache_file, indent=1, sort_keys=True)
+                os.replace(temporary_path, self.__path)
+                self.__changed = False
+            except OSError:
+                # not being able to write the cache only makes the next discovery slower
+                pass
+
+
+# ask every device for its serial number at the same time. identify(a_usb_device) returns the serial number and
+#  should return None for a device that cannot be identified.
+def usb_serial_numbers_probe(usb_devices, identify):
+    if not usb_devices:
+        return []
+    with futures.ThreadPoolExecutor(max_workers=len(usb_devices)) as executor:
+        return list(executor.map(identify, usb_devices))
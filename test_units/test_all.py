@@ -20,15 +20,36 @@ import ocean_optics_device
 import ocean_optics_device.common
 import test_units.test_common
 from ocean_optics_device.oo_device import *
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
 
 # must be here so unittest finds the tests
 from test_units.test_obp_message import *
+from test_units.test_obp_codec import *
+from test_units.test_obp_framer import *
 from test_units.test_obp_device_introspection import *
 from test_units.test_spectrum_acquisition import *
+from test_units.test_spectrum_decode import *
+from test_units.test_spectrum_processing import *
+from test_units.test_spectrum_metadata import *
+from test_units.test_spectrum_correction import *
+from test_units.test_wavelengths import *
+from test_units.test_spectrum_stream import *
+from test_units.test_spectrum_recording import *
+from test_units.test_async_device import *
+from test_units.test_device_pool import *
+from test_units.test_tcp_transport import *
+from test_units.test_obp_pipeline import *
+from test_units.test_simulated_device import *
+from test_units.test_benchmarks import *
+from test_units.test_introspection_cache import *
+from test_units.test_device_instrumentation import *
+from test_units.test_traffic_capture import *
+from test_units.test_usb_discovery import *
 
 
 if __name__ == '__main__':
     target_serial_number = ''
+    simulated_device_name = ''
     my_interface_type = None
 
     for index in range(len(sys.argv) - 1, 0, -1):
@@ -37,6 +58,11 @@ if __name__ == '__main__':
             print('Serial number on command line')
             sys.argv.remove(sys.argv[index + 1])
             sys.argv.remove(sys.argv[index])
+        elif sys.argv[index] == '--simulated':
+            simulated_device_name = sys.argv[index + 1]
+            print('Simulating a {0}'.format(simulated_device_name))
+            sys.argv.remove(sys.argv[index + 1])
+            sys.argv.remove(sys.argv[index])
         else:
             if sys.argv[index] == '--usb':
                 my_interface_type = InterfaceType.USB
@@ -62,7 +88,11 @@ if __name__ == '__main__':
                 # USB is the most commonly used interface to date
                 my_interface_type = InterfaceType.USB
 
-    if len(target_serial_number) > 0:
+    if len(simulated_device_name) > 0:
+        # the device tests are run against a simulated device of the named kind, e.g. --simulated OceanFX
+        test_units.test_common.target_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(
+            device_identity.get_product_id_from_unique_name(simulated_device_name), 'SIM000000000001'))
+    elif len(target_serial_number) > 0:
 
         try:
             # the device needs to be identified, so the serial number is read. That means the serial number
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+
+"""
+Unit test for the asyncio device interface
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import asyncio
+import threading
+import time
+import unittest
+from ocean_optics_device.async_device import AsyncOceanOpticsDevice
+
+
+# stands in for OceanOpticsDevice and its command classes. Every command blocks like a USB round trip.
+class SlowDevice:
+    def __init__(self, serial_number, delay):
+        self.serial_number = serial_number
+        self.delay = delay
+        self.threads = set()
+        self.released = False
+
+    def introspection_get(self):
+        return self
+
+    def spectrum_acquisition_get(self):
+        return self
+
+    def serial_number_get(self):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return self.serial_number
+
+    def spectrum_get(self, data_length=0, as_array=False):
+        time.sleep(self.delay)
+        return bytes(data_length)
+
+    def release(self):
+        self.released = True
+
+
+class AsyncDeviceTestCases(unittest.TestCase):
+
+    def test_concurrent_devices(self):
+        print("Test AsyncOceanOpticsDevice concurrency")
+        slow_devices = [SlowDevice('S{0:05d}'.format(index), 0.2) for index in range(4)]
+
+        async def read_all():
+            devices = [AsyncOceanOpticsDevice(a_device) for a_device in slow_devices]
+            start = time.monotonic()
+            serial_numbers = await asyncio.gather(*(a_device.serial_number_get() for a_device in devices))
+            elapsed = time.monotonic() - start
+            spectra = await asyncio.gather(*(a_device.spectrum_get(8) for a_device in devices))
+            for a_device in devices:
+                await a_device.close()
+            return serial_numbers, spectra, elapsed
+
+        serial_numbers, spectra, elapsed = asyncio.run(read_all())
+        self.assertEqual(['S00000', 'S00001', 'S00002', 'S00003'], serial_numbers)
+        self.assertEqual([bytes(8)] * 4, spectra)
+        # the devices were serviced in parallel, not one after the other
+        self.assertLess(elapsed, 0.6)
+        self.assertTrue(all(a_device.released for a_device in slow_devices))
+        # each device was serviced by its own thread
+        self.assertEqual(4, len(set.union(*(a_device.threads for a_device in slow_devices))))
+
+    def test_calls_are_ordered(self):
+        print("Test AsyncOceanOpticsDevice ordering")
+        slow_device = SlowDevice('S00001', 0.01)
+
+        async def read_several():
+            async with AsyncOceanOpticsDevice(slow_device) as a_device:
+                return await asyncio.gather(*(a_device.spectrum_get(length) for length in range(5)))
+
+        self.assertEqual([bytes(length) for length in range(5)], asyncio.run(read_several()))
@@ -0,0 +1,114 @@
+#!/usr/bin/python
+
+"""
+Unit test for the benchmark runner
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import json
+import os
+import tempfile
+import unittest
+from benchmarks import benchmark_runner
+from benchmarks import bench_codec
+
+
+class BenchmarkRunnerTestCases(unittest.TestCase):
+
+    def test_regressions(self):
+        print("Test benchmark_runner.regressions")
+        baseline = {'serialize': 1000.0, 'deserialize': 1000.0, 'new': 1.0}
+        results = {'serialize': 700.0, 'deserialize': 900.0, 'unknown': 5.0}
+        slower = benchmark_runner.regressions(results, baseline, 20.0)
+        self.assertEqual(['serialize'], list(slower))
+        self.assertAlmostEqual(-30.0, slower['serialize'])
+        # a drop within the spread of the timings is noise
+        self.assertEqual({}, benchmark_runner.regressions(results, baseline, 20.0, {'serialize': 5.0},
+                                                          {'serialize': 6.0}))
+        self.assertEqual((2.0, 100.0), benchmark_runner.summarize([1.0, 2.0, 3.0]))
+
+    def test_main(self):
+        print("Test benchmark_runner.main")
+        benchmarks = bench_codec.benchmarks()
+        self.assertIn('serialize_md5_65536', benchmarks)
+        self.assertIn('deserialize_no_checksum_0', benchmarks)
+        for function in benchmarks.values():
+            function()
+
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            output = os.path.join(directory, 'output.json')
+            arguments = ['--baseline', baseline, '--output', output, '--filter', 'request_frame', '--repeat', '1']
+            self.assertEqual(0, benchmark_runner.main(benchmarks, 'test', baseline, arguments + ['--update-baseline']))
+            with open(baseline) as baseline_file:
+                document = json.load(baseline_file)
+            self.assertEqual(['request_frame_cached'], list(document['results']))
+            self.assertEqual(['request_frame_cached'], list(document['spread_percent']))
+
+            # updating with a filter keeps the rest of the baseline
+            filtered = ['--baseline', baseline, '--output', output, '--filter', 'parse_serial_number_length',
+                        '--repeat', '1', '--update-baseline']
+            self.assertEqual(0, benchmark_runner.main(benchmarks, 'test', baseline, filtered))
+            with open(baseline) as baseline_file:
+                document = json.load(baseline_file)
+            self.assertEqual(['parse_serial_number_length', 'request_frame_cached'], sorted(document['results']))
+
+            # a baseline far faster than anything possible is a regression
+            document['results']['request_frame_cached'] = 1.0e15
+            with open(baseline, 'w') as baseline_file:
+                json.dump(document, baseline_file)
+            self.assertEqual(1, benchmark_runner.main(benchmarks, 'test', baseline, arguments))
+
+    def test_replay_benchmark(self):
+        print("Test bench_replay on a capture")
+        from benchmarks import bench_replay
+        from ocean_optics_device import traffic_capture
+        from ocean_optics_device.oo_device import OceanOpticsDevice
+        from ocean_optics_device.simulated_device import SimulatedUsbDevice
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'field.capture')
+            for product_id in (0x2001, 0x1002):
+                capture = traffic_capture.TrafficCapture(path, 0x2457, product_id)
+                a_device = OceanOpticsDevice(usb_device=traffic_capture.CapturingUsbDevice(
+                    SimulatedUsbDevice(product_id, 'SIM00001', faithful_timing=False), capture))
+                for scan in range(10):
+                    a_device.spectrum_acquisition_get().spectrum_get()
+                capture.close()
+                benchmarks = bench_replay.benchmarks(path)
+                # the serial number request and ten spectra
+                self.assertEqual(['replay_session_11_requests'], list(benchmarks))
+                for function in benchmarks.values():
+                    function()
+                    function()
+
+
+    def test_import_benchmark(self):
+        print("Test bench_import")
+        from benchmarks import bench_import
+        self.assertIn('import_obp_message', bench_import.benchmarks())
+        self.assertGreater(bench_import.imports_per_second('OceanBinaryProtocol.obp_message', repeat=1)[0], 0.0)
+        results, spreads = benchmark_runner.run({'import_obp_codec': 'OceanBinaryProtocol.obp_codec'}, repeat=2,
+                                                measure=bench_import.imports_per_second)
+        self.assertGreater(results['import_obp_codec'], 0.0)
+        self.assertGreaterEqual(spreads['import_obp_codec'], 0.0)
+
+    def test_imports_without_transports(self):
+        print("Test the protocol, decoding and the device load no transport at import")
+        from benchmarks import bench_import
+        for module in ('OceanBinaryProtocol.obp_message', 'ocean_optics_device.spectrum_decode',
+                       'ocean_optics_device.oo_device'):
+            loaded = bench_import.modules_loaded(module)
+            self.assertNotIn('usb', loaded)
+            self.assertNotIn('socket', loaded)
+            self.assertNotIn('ocean_optics_device.tcp_transport', loaded)
+        self.assertNotIn('concurrent.futures', bench_import.modules_loaded('OceanBinaryProtocol.obp_message'))
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+
+"""
+Unit test for device message instrumentation
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import json
+import struct
+import unittest
+from usb import core
+from ocean_optics_device.device_instrumentation import DeviceStatistics, LatencyHistogram
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+
+
+class DeviceInstrumentationTestCases(unittest.TestCase):
+
+    def test_histogram(self):
+        print('Test LatencyHistogram')
+        histogram = LatencyHistogram()
+        self.assertEqual(0, histogram.percentile_ns_get(0.5))
+        for latency_us in (1, 3, 3, 3, 100, 5000):
+            histogram.record(latency_us * 1000)
+        self.assertEqual(6, histogram.count_get())
+        self.assertEqual(5000000, histogram.maximum_ns_get())
+        self.assertAlmostEqual(5110000 / 6, histogram.mean_ns_get())
+        # 3 us falls in the bucket of latencies below 4 us
+        self.assertEqual(4000, histogram.percentile_ns_get(0.5))
+        self.assertEqual(5000000, histogram.percentile_ns_get(1.0))
+        self.assertEqual(6, sum(histogram.buckets_get()))
+        # far too long latencies land in the last bucket
+        histogram.record(10 ** 15)
+        self.assertEqual(1, histogram.buckets_get()[-1])
+
+    def test_obp_messages(self):
+        print('Test instrumentation of OBP messages')
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False))
+        statistics = DeviceStatistics()
+        a_device.instrumentation_set(statistics)
+        acquisition = a_device.spectrum_acquisition_get()
+        for scan in range(3):
+            acquisition.spectrum_get(as_array=True)
+        acquisition.integration_time_us_set(5000)
+        with self.assertRaisesRegex(RuntimeError, 'obp_error_code=2'):
+            a_device.device_message(b''.join([bytes(8), b'\xEF\xBE\xAD\xDE', bytes(52)]))
+
+        spectra = statistics.message_statistics_get(0x00101000)
+        self.assertEqual(3, spectra.count)
+        self.assertEqual(3 * 64, spectra.bytes_out)
+        self.assertEqual(3 * (64 + 2136 * 2), spectra.bytes_in)
+        for phase in ('write', 'first_read', 'extended_read', 'decode'):
+            self.assertEqual(3, spectra.latencies[phase].count_get(), phase)
+
+        # a reply without a payload needs no extended read
+        integration_time = statistics.message_statistics_get(0x00110010)
+        self.assertEqual(1, integration_time.latencies['first_read'].count_get())
+        self.assertEqual(0, integration_time.latencies['extended_read'].count_get())
+
+        self.assertEqual({2: 1}, statistics.message_statistics_get(0xDEADBEEF).errors)
+        snapshot = json.loads(json.dumps(statistics.snapshot()))
+        self.assertEqual(3, snapshot['0x00101000']['count'])
+        self.assertNotIn('extended_read', snapshot['0x00110010']['latency'])
+
+        statistics.reset()
+        self.assertEqual([], statistics.message_types_get())
+        a_device.instrumentation_set(None)
+        acquisition.spectrum_get()
+        self.assertEqual([], statistics.message_types_get())
+
+    def test_pipelined_messages(self):
+        print('Test instrumentation of pipelined OBP messages')
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False))
+        statistics = DeviceStatistics()
+        a_device.instrumentation_set(statistics)
+        with a_device.pipeline() as pipeline:
+            pipeline.serial_number_get()
+            pipeline.spectrum_get()
+            pipeline.submit(0xDEADBEEF)
+        spectra = statistics.message_statistics_get(0x00101000)
+        self.assertEqual(1, spectra.count)
+        self.assertEqual(64, spectra.bytes_out)
+        self.assertEqual(64 + 2136 * 2, spectra.bytes_in)
+        for phase in ('write', 'first_read', 'extended_read'):
+            self.assertEqual(1, spectra.latencies[phase].count_get(), phase)
+        self.assertEqual(1, statistics.message_statistics_get(0x00000100).count)
+        self.assertEqual({2: 1}, statistics.message_statistics_get(0xDEADBEEF).errors)
+
+        with a_device.spectrum_acquisition_get().stream(capacity=4, timeout=5) as spectra:
+            for spectrum, index in zip(spectra, range(10)):
+                pass
+        # the first spectrum of the stream, the spectra it read and the one in flight when it stopped
+        spectra = statistics.message_statistics_get(0x00101000)
+        self.assertGreaterEqual(spectra.count, 12)
+        self.assertEqual(spectra.count, spectra.latencies['write'].count_get())
+
+    def test_binary_messages(self):
+        print('Test instrumentation of BINARY messages')
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x101E, 'USB2+00001', faithful_timing=False))
+        statistics = DeviceStatistics()
+        a_device.instrumentation_set(statistics)
+        a_device.spectrum_acquisition_get().spectrum_get(as_array=True)
+        a_device.spectrum_acquisition_get().integration_time_us_set(5000)
+        self.assertEqual(2048 * 2 + 1, statistics.message_statistics_get(0x09).bytes_in)
+        self.assertEqual(1, statistics.message_statistics_get(0x09).latencies['decode'].count_get())
+        # nothing is read after setting the integration time
+        self.assertEqual(0, statistics.message_statistics_get(0x02).latencies['first_read'].count_get())
+
+        # a usb error is raised rather than answered with an empty reply, and counted by its name
+        with self.assertRaises(core.USBTimeoutError):
+            a_device.device_message(struct.pack('<BI', 0x02, 5000), 64)
+        self.assertEqual({'USBTimeoutError': 1}, statistics.message_statistics_get(0x02).errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+
+"""
+Unit test for the device pool
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import time
+import unittest
+from unittest import mock
+from ocean_optics_device import oo_device
+from ocean_optics_device.device_pool import DevicePool
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+
+
+# stands in for OceanOpticsDevice and SpectrumAcquisition. A spectrum takes one integration time to acquire.
+class TimedDevice:
+    def __init__(self, serial_number):
+        self.serial_number = serial_number
+        self.integration_time_us = 50000
+        self.released = False
+
+    def serial_number_get(self):
+        return self.serial_number
+
+    def spectrum_acquisition_get(self):
+        return self
+
+    def spectrum_get(self, data_length=0, as_array=False):
+        if self.serial_number == 'BROKEN':
+            raise RuntimeError('obp_error_code=7')
+        time.sleep(self.integration_time_us / 1000000)
+        return self.serial_number
+
+    def integration_time_us_set(self, integration_time_us=1000):
+        self.integration_time_us = integration_time_us
+
+    def integration_time_ms_set(self, integration_time_ms=1000):
+        self.integration_time_us_set(integration_time_ms * 1000)
+
+    def release(self):
+        self.released = True
+
+
+# a usb device that another program has open
+class BusyUsbDevice:
+    idVendor = 0x2457
+    idProduct = 0x2001
+
+    def set_configuration(self):
+        raise RuntimeError('The device is busy.')
+
+
+class DevicePoolTestCases(unittest.TestCase):
+
+    def test_acquire_all(self):
+        print("Test DevicePool.acquire_all")
+        devices = [TimedDevice('S{0:05d}'.format(index)) for index in range(6)]
+        with DevicePool(devices) as pool:
+            self.assertEqual(6, len(pool))
+            pool.integration_time_ms_set_all(100)
+            self.assertTrue(all(a_device.integration_time_us == 100000 for a_device in devices))
+
+            start = time.monotonic()
+            spectra = pool.acquire_all()
+            elapsed = time.monotonic() - start
+            self.assertEqual(pool.serial_numbers_get(), spectra)
+            # six 100 ms acquisitions ran at the same time
+            self.assertLess(elapsed, 0.35)
+        self.assertTrue(all(a_device.released for a_device in devices))
+
+    def test_acquire_all_error(self):
+        print("Test DevicePool.acquire_all error")
+        with DevicePool([TimedDevice('S00001'), TimedDevice('BROKEN')]) as pool:
+            with self.assertRaisesRegex(RuntimeError, 'obp_error_code=7'):
+                pool.acquire_all()
+
+    def test_open_usb(self):
+        print("Test DevicePool.open_usb")
+        usb_devices = [SimulatedUsbDevice(0x2001, 'OFX{0:05d}'.format(index), faithful_timing=False)
+                       for index in range(3)]
+        with mock.patch.object(oo_device, 'find_all_usb_devices', return_value=usb_devices):
+            with DevicePool.open_usb() as pool:
+                self.assertEqual(['OFX00000', 'OFX00001', 'OFX00002'], pool.serial_numbers_get())
+
+            # the devices that did open are released when one of them fails
+            with mock.patch.object(oo_device.OceanOpticsDevice, 'release', autospec=True) as release:
+                usb_devices.append(BusyUsbDevice())
+                with self.assertRaisesRegex(RuntimeError, 'The device is busy.'):
+                    DevicePool.open_usb()
+                self.assertEqual(3, release.call_count)
@@ -0,0 +1,63 @@
+#!/usr/bin/python
+
+"""
+Unit test for the per device introspection cache
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import unittest
+from ocean_optics_device.device_introspection import DeviceIntrospection, IntrospectionCache
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+
+
+class IntrospectionCacheTestCases(unittest.TestCase):
+
+    def test_cache(self):
+        print("Test IntrospectionCache")
+        cache = IntrospectionCache()
+        reads = []
+        self.assertEqual('1.0', cache.get('revision', lambda: reads.append(1) or '1.0'))
+        self.assertEqual('1.0', cache.get('revision', lambda: reads.append(1) or '2.0'))
+        self.assertIsNone(cache.get('nothing', lambda: None))
+        self.assertEqual(1, cache.hit_count_get())
+        self.assertEqual(2, cache.miss_count_get())
+        cache.invalidate()
+        self.assertEqual('2.0', cache.get('revision', lambda: '2.0'))
+
+    def test_device_cache(self):
+        print("Test introspection caching on a device")
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False)
+        a_device = OceanOpticsDevice(usb_device=simulated_device)
+        introspection = a_device.introspection_get()
+        for repeat in range(5):
+            self.assertEqual('OFX00001', introspection.serial_number_get())
+            self.assertEqual('1.2.3.4', introspection.firmware_revision_get())
+            self.assertEqual('16.2', introspection.hardware_revision_get())
+        # a DeviceIntrospection made separately shares the device's cache
+        self.assertEqual('1.2.3.4', DeviceIntrospection(a_device).firmware_revision_get())
+
+        counts = simulated_device.request_counts_get()
+        self.assertEqual(1, counts[0x00000100])
+        self.assertEqual(1, counts[0x00000090])
+        self.assertEqual(1, counts[0x00000080])
+        self.assertEqual(14, a_device.introspection_cache_get().hit_count_get())
+
+        # a reset may change what the device reports, so everything is read again
+        introspection.reset()
+        introspection.firmware_revision_get()
+        self.assertEqual(2, simulated_device.request_counts_get()[0x00000090])
+
+        # so does attaching a device again
+        a_device.usb_device_attach(simulated_device)
+        self.assertEqual(2, simulated_device.request_counts_get()[0x00000100])
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+
+"""
+Unit test for the obp codec
+"""
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import unittest
+from OceanBinaryProtocol import obp_codec
+from OceanBinaryProtocol import obp_message
+
+
+# ABoo sets this module to be run second
+class ABooCodecTestCases(unittest.TestCase):
+
+    def test_struct_sizes(self):
+        print('Test header and trailer sizes')
+        self.assertEqual(44, obp_codec.HEADER_STRUCT.size)
+        self.assertEqual(20, obp_codec.TRAILER_STRUCT.size)
+        self.assertEqual(64, len(obp_codec.EMPTY_FRAME))
+
+    def test_request_frame(self):
+        print('Test request_frame()')
+        obp_codec.request_frame_cache_clear()
+
+        message = obp_message.OceanBinaryProtocolMessage()
+        message.message_type = 0x00101000
+        frame = obp_codec.request_frame(0x00101000)
+        self.assertIsInstance(frame, bytes)
+        self.assertEqual(message.serialize(), frame)
+        self.assertIs(frame, obp_codec.request_frame(0x00101000), 'The request frame was not cached.')
+
+        message = obp_message.OceanBinaryProtocolMessage()
+        message.message_type = 0x00110010
+        message.immediate_data_length = 4
+        message.immediate_data_assign(b'\x40\x42\x0f\x00' + bytes(12))
+        message.checksum_type = 0x01
+        self.assertEqual(message.serialize(),
+                         obp_codec.request_frame(0x00110010, obp_codec.UINT32_STRUCT.pack(1000000), 0x01))
+
+        with self.assertRaisesRegex(ValueError, 'Immediate data is at most 16 bytes long.'):
+            obp_codec.request_frame(0x00110010, bytes(17))
+
+    def test_request_frame_cache_limit(self):
+        print('Test request_frame() cache limit')
+        obp_codec.request_frame_cache_clear()
+        for integration_time in range(obp_codec.REQUEST_FRAME_CACHE_LIMIT + 10):
+            obp_codec.request_frame(0x00110010, obp_codec.UINT32_STRUCT.pack(integration_time))
+        frame = obp_codec.request_frame(0x00110010, obp_codec.UINT32_STRUCT.pack(1))
+        self.assertIs(frame, obp_codec.request_frame(0x00110010, obp_codec.UINT32_STRUCT.pack(1)))
+        self.assertEqual(obp_codec.REQUEST_FRAME_CACHE_LIMIT, len(obp_codec._request_frames))
+
+    def test_field_getters(self):
+        print('Test error_number_get() and bytes_remaining_get()')
+        message = obp_message.OceanBinaryProtocolMessage()
+        message.error_number = 12
+        message.payload_assign(bytes(100))
+        frame = message.serialize()
+        self.assertEqual(12, obp_codec.error_number_get(frame))
+        self.assertEqual(120, obp_codec.bytes_remaining_get(frame))
+
+    def test_checksum(self):
+        print('Test checksum_compute() and checksum_verify()')
+        frame = obp_codec.pack_frame(0x00101000, payload=bytes(range(256)) * 16, checksum_type=0x01)
+        message = obp_message.OceanBinaryProtocolMessage()
+        message.deserialize(frame)
+        self.assertEqual(frame, message.serialize())
+        self.assertIs(frame, obp_codec.checksum_verify(frame))
+        self.assertEqual(bytes(frame[-20:-4]), obp_codec.checksum_compute(bytearray(frame)))
+
+        corrupt = bytearray(frame)
+        corrupt[100] ^= 0xFF
+        with self.assertRaisesRegex(ValueError, 'The checksum was incorrect.'):
+            obp_codec.checksum_verify(corrupt)
+        with self.assertRaisesRegex(ValueError, 'The checksum was incorrect.'):
+            obp_message.OceanBinaryProtocolMessage().deserialize(corrupt)
+        obp_message.OceanBinaryProtocolMessage().deserialize(corrupt, verify_checksum=False)
+
+        # without a checksum type the checksum bytes are not looked at
+        obp_codec.checksum_verify(obp_codec.pack_frame(0x00101000, payload=bytes(8)))
+
+    def test_checksum_verifier(self):
+        print('Test ChecksumVerifier')
+        frame = obp_codec.pack_frame(0x00101000, payload=bytes(4096), checksum_type=0x01)
+        corrupt = bytearray(frame)
+        corrupt[50] ^= 0x01
+        verifier = obp_codec.ChecksumVerifier()
+        try:
+            self.assertIs(frame, verifier.submit(frame).result())
+            verifier.check()
+            a_future = verifier.submit(bytes(corrupt))
+            with self.assertRaisesRegex(ValueError, 'The checksum was incorrect.'):
+                a_future.result()
+            with self.assertRaisesRegex(ValueError, 'The checksum was incorrect.'):
+                verifier.drain()
+            # the failure is only raised once
+            verifier.drain()
+        finally:
+            verifier.shutdown()
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+
+"""
+Unit test for the incremental OBP framer
+"""
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-02'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import random
+import unittest
+from OceanBinaryProtocol import obp_codec
+from OceanBinaryProtocol.obp_framer import ObpFramer
+
+
+class ObpFramerTestCases(unittest.TestCase):
+
+    @staticmethod
+    def stream_build(count, checksum_type=0x00):
+        return [obp_codec.pack_frame(0x00101000, payload=bytes([index]) * (index * 37), regarding=index,
+                                     checksum_type=checksum_type) for index in range(count)]
+
+    @staticmethod
+    def feed_in_chunks(framer, data, chunk_sizes):
+        frames = []
+        start = 0
+        while start < len(data):
+            size = next(chunk_sizes)
+            framer.feed(data[start:start + size])
+            # a frame is only valid until the next feed, so it is copied
+            frames.extend(bytes(frame) for frame in framer.frames())
+            start += size
+        return frames
+
+    def test_chunks(self):
+        print('Test ObpFramer with chunks of any size')
+        frames = self.stream_build(40)
+        data = b''.join(frames)
+        for chunk_sizes in (iter(lambda: 1, None), iter(lambda: 7, None), iter(lambda: 100000, None)):
+            framer = ObpFramer(buffer_size=64)
+            self.assertEqual(frames, self.feed_in_chunks(framer, data, chunk_sizes))
+            self.assertEqual(40, framer.frame_count_get())
+            self.assertEqual(0, framer.discarded_byte_count_get())
+            self.assertEqual(0, framer.pending_byte_count_get())
+
+        generator = random.Random(1)
+        framer = ObpFramer(buffer_size=256)
+        self.assertEqual(frames, self.feed_in_chunks(framer, data, iter(lambda: generator.randint(1, 3000), None)))
+
+    def test_frame_view(self):
+        print('Test ObpFramer frames are views')
+        framer = ObpFramer()
+        frame = obp_codec.pack_frame(0x00000100, b'OFX00001')
+        framer.feed(frame + frame[0:10])
+        views = list(framer.frames())
+        self.assertEqual(1, len(views))
+        self.assertIsInstance(views[0], memoryview)
+        self.assertEqual(frame, views[0].tobytes())
+        self.assertEqual(10, framer.pending_byte_count_get())
+        self.assertIsNone(framer.frame_next())
+
+    def test_resynchronize(self):
+        print('Test ObpFramer resynchronization')
+        frames = self.stream_build(6)
+        too_large = bytearray(frames[1])
+        obp_codec.UINT32_STRUCT.pack_into(too_large, obp_codec.BYTES_REMAINING_OFFSET, 0x7FFFFFFF)
+        bad_footer = bytearray(frames[3])
+        bad_footer[-1] = 0x00
+        data = b'\xC0\xC1garbage\xC1' + frames[0] + bytes(too_large) + b'\xC1\xC0\xC1' + frames[2] + \
+            bytes(bad_footer) + frames[4][0:30] + frames[5]
+
+        # the bytes_remaining of the truncated frame 4 is read from frame 5. A maximum frame size that it exceeds
+        #  lets the framer move on at once rather than wait for that many bytes.
+        framer = ObpFramer(maximum_frame_size=4096)
+        received = self.feed_in_chunks(framer, data, iter(lambda: 13, None))
+        self.assertEqual([frames[0], frames[2], frames[5]], received)
+        self.assertEqual(len(data) - len(frames[0]) - len(frames[2]) - len(frames[5]),
+                         framer.discarded_byte_count_get())
+        self.assertGreater(framer.resynchronization_count_get(), 0)
+
+    def test_frame_abandon(self):
+        print('Test ObpFramer.frame_abandon() after a corrupt length')
+        frames = self.stream_build(4)
+        corrupt = bytearray(frames[0])
+        obp_codec.UINT32_STRUCT.pack_into(corrupt, obp_codec.BYTES_REMAINING_OFFSET, 200000)
+        framer = ObpFramer()
+        framer.feed(bytes(corrupt) + b''.join(frames[1:]))
+        self.assertIsNone(framer.frame_next())
+        self.assertTrue(framer.frame_abandon())
+        self.assertEqual(frames[1:], [bytes(frame) for frame in framer.frames()])
+        self.assertEqual(len(corrupt), framer.discarded_byte_count_get())
+        self.assertFalse(framer.frame_abandon())
+
+    def test_verify_checksum(self):
+        print('Test ObpFramer checksum verification')
+        frames = self.stream_build(3, checksum_type=0x01)
+        corrupt = bytearray(frames[1])
+        corrupt[obp_codec.PAYLOAD_OFFSET] ^= 0xFF
+        data = frames[0] + bytes(corrupt) + frames[2]
+        self.assertEqual(3, len(self.feed_in_chunks(ObpFramer(), data, iter(lambda: 500, None))))
+        framer = ObpFramer(verify_checksum=True)
+        self.assertEqual([frames[0], frames[2]], self.feed_in_chunks(framer, data, iter(lambda: 500, None)))
+        self.assertEqual(len(corrupt), framer.discarded_byte_count_get())
+
+    def test_buffer_reserve(self):
+        print('Test ObpFramer buffer_reserve() and buffer_commit()')
+        frame = obp_codec.pack_frame(0x00101000, payload=bytes(100000))
+        framer = ObpFramer(buffer_size=64)
+        held = None
+        start = 0
+        while start < len(frame):
+            view = framer.buffer_reserve(4096)
+            self.assertGreaterEqual(len(view), 4096)
+            count = min(len(view), len(frame) - start)
+            view[0:count] = frame[start:start + count]
+            framer.buffer_commit(count)
+            start += count
+            held = framer.frame_next() or held
+        self.assertEqual(frame, bytes(held))
+
+
+if __name__ == '__main__':
+    unittest.main()
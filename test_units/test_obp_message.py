@@ -415,3 +415,50 @@ class AAooMessageTestCases(unittest.TestCase):
                                 0xE6, 0xBD, 0xBC, 0x8C, 0xAA, 0x54, 0x5B, 0x3D,
                                 0x65, 0x5A, 0xc5, 0xc4, 0xcc, 0xc2]
             message.deserialize(bytes(expected_message))
+
+    def test_views(self):
+        print("Test payload_view() and immediate_data_view()")
+
+        message = obp_message.OceanBinaryProtocolMessage()
+        message.payload_assign(b'This is a test')
+        message.immediate_data_set(3, 0x7F)
+
+        payload = message.payload_view()
+        self.assertIsInstance(payload, memoryview)
+        self.assertEqual(b'This is a test', payload.tobytes())
+        self.assertEqual(0x7F, message.immediate_data_view()[3])
+
+        # the views share memory with the frame
+        message.payload_set(0, ord('t'))
+        self.assertEqual(b'this is a test', payload.tobytes())
+
+        with self.assertRaises(AttributeError):
+            message.not_a_field = 1
+
+    def test_deserialize_in_place(self):
+        print("Test deserialize() without copying")
+
+        source = obp_message.OceanBinaryProtocolMessage()
+        source.message_type = 0x00101000
+        source.regarding = 0x12345678
+        source.payload_assign(bytes(range(200)))
+        received = bytearray(source.serialize())
+
+        message = obp_message.OceanBinaryProtocolMessage()
+        message.deserialize(received)
+        self.assertEqual(0x00101000, message.message_type)
+        self.assertEqual(0x12345678, message.regarding)
+        self.assertEqual(220, message.bytes_remaining)
+
+        # the payload is a view into the received buffer
+        received[44] = 0xFF
+        self.assertEqual(0xFF, message.payload_view()[0])
+
+        # a read only frame is copied the first time a field is written
+        message.deserialize(bytes(received))
+        message.flags = 0x0001
+        self.assertEqual(0x0001, message.flags)
+        self.assertEqual(0x12345678, message.regarding)
+
+        with self.assertRaisesRegex(ValueError, 'Communications is out of sync.'):
+            message.deserialize(bytes(received[:100]))
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+
+"""
+Unit test for pipelined OBP commands
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import itertools
+import unittest
+from unittest import mock
+from ocean_optics_device import obp_pipeline
+from ocean_optics_device.obp_pipeline import ObpPipeline
+from OceanBinaryProtocol import obp_codec
+
+
+# stands in for OceanOpticsDevice. Requests are answered in reverse order once they have all been written.
+class ReversingDevice:
+    def __init__(self):
+        self.requests = []
+        self.replies = []
+        self.writes_before_first_read = None
+
+    def obp_request_write(self, data):
+        self.requests.append(data)
+
+    def obp_reply_read(self):
+        if self.writes_before_first_read is None:
+            self.writes_before_first_read = len(self.requests)
+            for request in reversed(self.requests):
+                message_type = obp_codec.UINT32_STRUCT.unpack_from(request, obp_codec.MESSAGE_TYPE_OFFSET)[0]
+                regarding = obp_codec.UINT32_STRUCT.unpack_from(request, obp_codec.REGARDING_OFFSET)[0]
+                if message_type == 0x00000100:
+                    reply = obp_codec.pack_frame(message_type, b'STS01234', regarding=regarding)
+                elif message_type == 0x00000090:
+                    reply = obp_codec.pack_frame(message_type, b'\x34\x12', regarding=regarding)
+                else:
+                    reply = bytearray(obp_codec.pack_frame(message_type, regarding=regarding))
+                    obp_codec.UINT16_STRUCT.pack_into(reply, obp_codec.ERROR_NUMBER_OFFSET, 2)
+                self.replies.append(bytes(reply))
+        return self.replies.pop(0)
+
+
+class ObpPipelineTestCases(unittest.TestCase):
+
+    def test_pipeline(self):
+        print("Test ObpPipeline")
+        a_device = ReversingDevice()
+        with ObpPipeline(a_device) as pipeline:
+            serial_number = pipeline.serial_number_get()
+            firmware_revision = pipeline.firmware_revision_get()
+            unknown = pipeline.submit(0x00ABCDEF)
+            self.assertFalse(serial_number.done())
+
+        self.assertEqual(3, a_device.writes_before_first_read)
+        self.assertEqual('STS01234', serial_number.result())
+        self.assertEqual('1.2.3.4', firmware_revision.result())
+        with self.assertRaisesRegex(RuntimeError, 'obp_error_code=2'):
+            unknown.result()
+
+        regarding_numbers = {obp_codec.UINT32_STRUCT.unpack_from(request, obp_codec.REGARDING_OFFSET)[0]
+                             for request in a_device.requests}
+        self.assertEqual(3, len(regarding_numbers))
+        self.assertNotIn(0, regarding_numbers)
+
+    def test_unmatched_reply(self):
+        print("Test ObpPipeline with an unmatched reply")
+        a_device = ReversingDevice()
+        a_device.writes_before_first_read = 0
+        a_device.replies.append(obp_codec.pack_frame(0x00000100, regarding=0))
+        pipeline = ObpPipeline(a_device)
+        serial_number = pipeline.serial_number_get()
+        with self.assertRaisesRegex(RuntimeError, 'matched no request'):
+            pipeline.flush()
+        with self.assertRaisesRegex(RuntimeError, 'matched no request'):
+            serial_number.result()
+
+    def test_cancel(self):
+        print("Test ObpPipeline cancels its requests when the with block raises")
+        a_device = ReversingDevice()
+        with self.assertRaisesRegex(KeyError, 'oops'):
+            with ObpPipeline(a_device) as pipeline:
+                serial_number = pipeline.serial_number_get()
+                raise KeyError('oops')
+        self.assertTrue(serial_number.cancelled())
+        self.assertEqual([], a_device.requests)
+
+    def test_regarding_wrap(self):
+        print("Test regarding numbers wrap past 0xFFFFFFFF to 1")
+        with mock.patch.object(obp_pipeline, '_regarding_counter', itertools.count(0xFFFFFFFE)):
+            regarding_numbers = [obp_pipeline._regarding_next() for index in range(4)]
+        self.assertEqual([0xFFFFFFFE, 0xFFFFFFFF, 1, 2], regarding_numbers)
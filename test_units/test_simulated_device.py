@@ -0,0 +1,218 @@
+#!/usr/bin/python
+
+"""
+Unit test for the simulated device, driving the whole library without hardware
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import time
+import unittest
+import numpy as np
+from ocean_optics_device.common import ProtocolType
+from ocean_optics_device.device_pool import DevicePool
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+from OceanBinaryProtocol import obp_codec
+
+
+# passes transfers through to a usb device, noting w for each write and r for each read
+class TransferOrderUsbDevice:
+    def __init__(self, a_usb_device):
+        self.usb_device = a_usb_device
+        self.idVendor = a_usb_device.idVendor
+        self.idProduct = a_usb_device.idProduct
+        self.order = []
+
+    def set_configuration(self):
+        self.usb_device.set_configuration()
+
+    def write(self, endpoint, data, timeout=None):
+        self.order.append('w')
+        return self.usb_device.write(endpoint, data, timeout=timeout)
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        self.order.append('r')
+        return self.usb_device.read(endpoint, size_or_buffer, timeout=timeout)
+
+
+class SimulatedDeviceTestCases(unittest.TestCase):
+
+    def test_obp_device(self):
+        print("Test simulated OBP device")
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', pixel_count=512)
+        a_device = OceanOpticsDevice(usb_device=simulated_device)
+        self.assertEqual(ProtocolType.OBP, a_device.ocean_optics_protocol_get())
+        self.assertEqual('OFX00001', a_device.serial_number_get())
+        self.assertEqual('1.2.3.4', a_device.introspection_get().firmware_revision_get())
+
+        acquisition = a_device.spectrum_acquisition_get()
+        acquisition.integration_time_us_set(20000)
+        self.assertEqual(20000, simulated_device.integration_time_us_get())
+        start = time.monotonic()
+        spectrum = acquisition.spectrum_get(as_array=True)
+        # acquiring takes one integration time
+        self.assertGreaterEqual(time.monotonic() - start, 0.02)
+        self.assertEqual((512,), spectrum.shape)
+        self.assertEqual(1024, len(acquisition.spectrum_get()))
+
+        with self.assertRaisesRegex(RuntimeError, 'obp_error_code=2'):
+            a_device.device_message(b''.join([bytes(8), b'\xEF\xBE\xAD\xDE', bytes(52)]))
+
+    def test_obp_checksums(self):
+        print("Test simulated OBP device with checksums")
+        from OceanBinaryProtocol.obp_codec import ChecksumVerifier
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False,
+                                                                   checksum_type=0x01))
+        acquisition = a_device.spectrum_acquisition_get()
+        self.assertEqual((2136,), acquisition.spectrum_get(as_array=True).shape)
+
+        verifier = ChecksumVerifier()
+        a_device.checksum_verifier_set(verifier)
+        try:
+            with acquisition.stream(capacity=4) as spectra:
+                for index, spectrum in zip(range(20), spectra):
+                    self.assertEqual(2136, len(spectrum))
+            verifier.drain()
+        finally:
+            a_device.checksum_verifier_set(None)
+            verifier.shutdown()
+
+    def test_binary_device(self):
+        print("Test simulated BINARY device")
+        simulated_device = SimulatedUsbDevice(0x1002, 'USB2E1234', faithful_timing=False)
+        a_device = OceanOpticsDevice(usb_device=simulated_device)
+        self.assertEqual(ProtocolType.BINARY, a_device.ocean_optics_protocol_get())
+        self.assertEqual('USB2E1234', a_device.serial_number_get())
+
+        acquisition = a_device.spectrum_acquisition_get()
+        acquisition.integration_time_us_set(4000)
+        spectrum = acquisition.spectrum_get(as_array=True)
+        self.assertEqual((2048,), spectrum.shape)
+        # the peaks survive the LSB/MSB packing
+        self.assertGreater(int(spectrum.max()), 15000)
+        self.assertEqual(4097, len(acquisition.spectrum_get()))
+
+    def test_protocol_dispatch(self):
+        print("Test protocol commands bound at connect")
+        from unittest import mock
+        from ocean_optics_device.spectrum_acquisition import SpectrumAcquisition
+        for product_id, serial_number in ((0x2001, 'OFX00001'), (0x1002, 'USB2E1234')):
+            a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(product_id, serial_number,
+                                                                       faithful_timing=False))
+            # an acquisition made apart from the device binds the device's protocol on its first command
+            acquisition = SpectrumAcquisition(a_device)
+            acquisition.integration_time_us_set(4000)
+            # once bound, the protocol is not asked for again
+            with mock.patch.object(OceanOpticsDevice, 'ocean_optics_protocol_get',
+                                   side_effect=AssertionError('the protocol was tested')):
+                for scan in range(3):
+                    acquisition.spectrum_get(as_array=True)
+                    a_device.spectrum_acquisition_get().spectrum_get(as_array=True)
+                a_device.introspection_get().reset()
+                self.assertEqual(serial_number, a_device.introspection_get().serial_number_get())
+
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x1002, 'USB2E1234', faithful_timing=False))
+        with self.assertRaisesRegex(RuntimeError, 'not available for the BINARY'):
+            a_device.introspection_get().factory_reset()
+
+    def test_buffered_spectra(self):
+        print("Test simulated OBP buffered spectra")
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False)
+        a_device = OceanOpticsDevice(usb_device=simulated_device)
+        acquisition = a_device.spectrum_acquisition_get()
+        acquisition.integration_time_us_set(1000)
+        acquisition.buffer_size_set(100)
+        self.assertEqual(100, acquisition.buffered_spectrum_count_get())
+        pixels, metadata = acquisition.buffered_spectra_get(60)
+        self.assertEqual((60, 2136), pixels.shape)
+        self.assertTrue(np.all(np.diff(metadata['spectrum_count'].astype(np.int64)) == 1))
+        self.assertTrue(np.all(metadata['integration_time_us'] == 1000))
+        # the 40 left in the buffer come first, oldest first
+        last_spectrum_count = int(metadata['spectrum_count'][-1])
+        pixels, metadata = acquisition.buffered_spectra_get(60)
+        self.assertEqual(60, len(pixels))
+        self.assertEqual(last_spectrum_count + 1, metadata['spectrum_count'][0])
+        # 120 spectra in two transactions
+        self.assertEqual(2, simulated_device.request_counts_get()[0x00100928])
+
+        acquisition.buffer_clear()
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x1002, 'USB2E1234', faithful_timing=False))
+        with self.assertRaisesRegex(RuntimeError, 'not available for the BINARY'):
+            a_device.spectrum_acquisition_get().buffered_spectra_get()
+
+    def test_reply_buffers(self):
+        print("Test replies are read into reused buffers")
+        from OceanBinaryProtocol import obp_codec
+        # little endian pixels are decoded in place, so no buffer is allocated per spectrum
+        for product_id in (0x2001, 0x101E):
+            a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(product_id, 'SIM00001', faithful_timing=False))
+            acquisition = a_device.spectrum_acquisition_get()
+            first = acquisition.spectrum_view_get()
+            first_copy = first.copy()
+            second = acquisition.spectrum_view_get()
+            # the second spectrum was read into the buffer of the first
+            self.assertTrue(np.shares_memory(first, second))
+            self.assertFalse(np.array_equal(first_copy, second))
+            with self.assertRaises(ValueError):
+                second[0] = 1
+            # device_message() still returns a reply of its own
+            self.assertFalse(np.shares_memory(acquisition.spectrum_get(as_array=True), second))
+
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False))
+        request = obp_codec.request_frame(0x00000100)
+        view = a_device.device_message_view(request)
+        self.assertIsInstance(view, memoryview)
+        self.assertTrue(view.readonly)
+        self.assertEqual(a_device.device_message(request), bytes(view))
+        with self.assertRaisesRegex(RuntimeError, 'obp_error_code=2'):
+            a_device.device_message_view(b''.join([bytes(8), b'\xEF\xBE\xAD\xDE', bytes(52)]))
+
+    def test_pipeline_and_stream(self):
+        print("Test simulated device pipeline and stream")
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x4000, 'S01234', faithful_timing=False))
+        with a_device.pipeline() as pipeline:
+            serial_number = pipeline.serial_number_get()
+            spectrum = pipeline.spectrum_get()
+        self.assertEqual('S01234', serial_number.result())
+        self.assertEqual((1024,), spectrum.result().shape)
+
+        with a_device.spectrum_acquisition_get().stream(capacity=4, timeout=5) as spectra:
+            received = [spectrum.copy() for spectrum, index in zip(spectra, range(20))]
+        self.assertEqual(20, len(received))
+
+    def test_stream_in_flight(self):
+        print("Test simulated device stream keeps a request in flight")
+        usb_device = TransferOrderUsbDevice(SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False))
+        a_device = OceanOpticsDevice(usb_device=usb_device)
+        acquisition = a_device.spectrum_acquisition_get()
+        with acquisition.stream(capacity=4, timeout=5) as spectra:
+            received = [spectrum.copy() for spectrum, index in zip(spectra, range(20))]
+        self.assertEqual(20, len(received))
+        self.assertIn('ww', ''.join(usb_device.order))
+        # the reply to the last request was read when the stream stopped, so the next reply is the right one
+        reply = a_device.device_message(obp_codec.request_frame(0x00000100))
+        self.assertEqual(0x00000100, obp_codec.UINT32_STRUCT.unpack_from(reply, obp_codec.MESSAGE_TYPE_OFFSET)[0])
+        self.assertEqual((2136,), acquisition.spectrum_get(as_array=True).shape)
+
+    def test_pool(self):
+        print("Test simulated device pool")
+        devices = [OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x2001, 'OFX{0:05d}'.format(index),
+                                                                    integration_time_us=50000))
+                   for index in range(8)]
+        with DevicePool(devices) as pool:
+            start = time.monotonic()
+            spectra = pool.acquire_all(as_array=True)
+            elapsed = time.monotonic() - start
+        self.assertEqual(8, len(spectra))
+        self.assertTrue(all(isinstance(spectrum, np.ndarray) for spectrum in spectra))
+        self.assertLess(elapsed, 0.3)
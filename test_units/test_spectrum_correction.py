@@ -0,0 +1,101 @@
+#!/usr/bin/python
+
+"""
+Unit test for dark subtraction and nonlinearity correction
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import unittest
+import numpy as np
+from ocean_optics_device import spectrum_correction
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+from ocean_optics_device.spectrum_correction import SpectrumCorrection
+
+COEFFICIENTS = (0.9, 3.0e-6, -2.0e-11, 1.0e-16)
+
+
+class SpectrumCorrectionTestCases(unittest.TestCase):
+
+    def setUp(self):
+        spectrum_correction.nonlinearity_coefficients_cache_clear()
+
+    def test_correct(self):
+        print('Test SpectrumCorrection.correct')
+        raw = np.random.default_rng(5).integers(1000, 60000, (6, 512)).astype(np.uint16)
+        dark = np.full(512, 900.5)
+        correction = SpectrumCorrection(COEFFICIENTS)
+        correction.dark_set(10000, dark)
+        self.assertEqual(COEFFICIENTS, correction.nonlinearity_coefficients_get())
+
+        counts = raw - dark
+        expected = counts / np.polynomial.polynomial.polyval(counts, COEFFICIENTS)
+        np.testing.assert_allclose(expected, correction.correct(raw, 10000))
+        # a single spectrum gives the same result as its row of the stack
+        np.testing.assert_allclose(expected[2], correction.correct(raw[2], 10000))
+        self.assertEqual(np.float64, correction.correct(raw[2]).dtype)
+
+        np.testing.assert_allclose(raw / np.polynomial.polynomial.polyval(raw.astype(np.float64), COEFFICIENTS),
+                                   correction.correct(raw))
+        # without coefficients or a dark nothing changes
+        np.testing.assert_array_equal(raw, SpectrumCorrection().correct(raw))
+
+        with self.assertRaisesRegex(ValueError, 'No dark spectrum was set for 20000 us.'):
+            correction.correct(raw, 20000)
+        correction.dark_set(20000, np.zeros(100))
+        with self.assertRaisesRegex(ValueError, 'The dark spectrum has 100 pixels, not 512.'):
+            correction.correct(raw, 20000)
+        self.assertEqual([10000, 20000], correction.integration_times_get())
+        correction.dark_clear()
+        self.assertIsNone(correction.dark_get(10000))
+
+    def test_obp_coefficients(self):
+        print('Test reading nonlinearity coefficients over OBP')
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False,
+                                              nonlinearity_coefficients=COEFFICIENTS)
+        a_device = OceanOpticsDevice(usb_device=simulated_device)
+        np.testing.assert_allclose(COEFFICIENTS, a_device.introspection_get().nonlinearity_coefficients_get(),
+                                   rtol=1e-6)
+        self.assertEqual(4, simulated_device.request_counts_get()[0x00181101])
+
+        # the coefficients are cached per serial number, a device opened again is not asked
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False,
+                                              nonlinearity_coefficients=COEFFICIENTS)
+        SpectrumCorrection.from_device(OceanOpticsDevice(usb_device=simulated_device))
+        SpectrumCorrection.from_device(OceanOpticsDevice(usb_device=simulated_device))
+        self.assertEqual(1, simulated_device.request_counts_get()[0x00181100])
+
+    def test_binary_coefficients(self):
+        print('Test reading nonlinearity coefficients from a BINARY EEPROM')
+        a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(0x101E, 'USB2+00001', faithful_timing=False,
+                                                                   nonlinearity_coefficients=COEFFICIENTS))
+        self.assertEqual(COEFFICIENTS, a_device.introspection_get().nonlinearity_coefficients_get())
+
+    def test_acquisition(self):
+        print('Test corrected spectra from SpectrumAcquisition')
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False)
+        acquisition = OceanOpticsDevice(usb_device=simulated_device).spectrum_acquisition_get()
+        with self.assertRaises(RuntimeError):
+            acquisition.dark_acquire()
+        acquisition.integration_time_us_set(1000)
+        dark = acquisition.dark_acquire(scans_to_average=10)
+        self.assertEqual((2136,), dark.shape)
+        corrected = acquisition.spectrum_corrected_get(scans_to_average=5, boxcar=2)
+        self.assertEqual((2136,), corrected.shape)
+        # the simulated dark level is removed
+        self.assertLess(abs(np.median(corrected)), 100)
+        self.assertIs(acquisition.correction_get(), acquisition.correction_get())
+
+
+if __name__ == '__main__':
+    unittest.main()
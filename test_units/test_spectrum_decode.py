@@ -0,0 +1,90 @@
+#!/usr/bin/python
+
+"""
+Unit test for spectrum decoding
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-11"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import unittest
+import numpy as np
+from ocean_optics_device.common import device_identity, PixelPacking
+from ocean_optics_device import spectrum_decode
+from OceanBinaryProtocol import obp_codec
+
+
+class SpectrumDecodeTestCases(unittest.TestCase):
+
+    def test_pixel_format(self):
+        print("Test get_pixel_format")
+        self.assertEqual((2048, PixelPacking.LITTLE_ENDIAN_16, 0x69, 0x0000), device_identity.get_pixel_format(0x101E))
+        self.assertEqual(4097, spectrum_decode.spectrum_byte_count(device_identity.get_pixel_format(0x101E)))
+        self.assertEqual(2048, spectrum_decode.spectrum_byte_count(device_identity.get_pixel_format(0x4000)))
+        self.assertIsNone(device_identity.get_pixel_format(0x9999))
+
+    def test_decode_little_endian(self):
+        print("Test decode_spectrum little endian")
+        expected = np.arange(2048, dtype=np.uint16) * 7
+        raw = expected.astype('<u2').tobytes() + b'\x69'
+        pixels = spectrum_decode.decode_spectrum(raw, device_identity.get_pixel_format(0x101E))
+        np.testing.assert_array_equal(expected, pixels)
+        # no copy was made
+        self.assertFalse(pixels.flags.owndata)
+
+        with self.assertRaisesRegex(ValueError, 'sync byte'):
+            spectrum_decode.decode_spectrum(raw[:-1] + b'\x00', device_identity.get_pixel_format(0x101E))
+
+    def test_decode_lsb_msb_64(self):
+        print("Test decode_spectrum LSB/MSB packets")
+        expected = (np.arange(2048, dtype=np.uint16) * 31) & 0x0FFF
+        packets = bytearray()
+        for start in range(0, 2048, 64):
+            packets += (expected[start:start + 64] & 0xFF).astype(np.uint8).tobytes()
+            packets += (expected[start:start + 64] >> 8).astype(np.uint8).tobytes()
+        packets.append(0x69)
+        pixels = spectrum_decode.decode_spectrum(bytes(packets), device_identity.get_pixel_format(0x1002))
+        np.testing.assert_array_equal(expected, pixels)
+
+    def test_decode_xor_mask(self):
+        print("Test decode_spectrum xor mask")
+        raw = np.full(3840, 0x2005, dtype='<u2').tobytes() + b'\x69'
+        pixels = spectrum_decode.decode_spectrum(raw, device_identity.get_pixel_format(0x1011))
+        self.assertTrue(np.all(pixels == 5))
+
+    def test_decode_obp_spectrum(self):
+        print("Test decode_obp_spectrum")
+        expected = np.arange(1024, dtype='<u2')
+        reply = obp_codec.pack_frame(0x00101000, payload=expected.tobytes())
+        pixels = spectrum_decode.decode_obp_spectrum(reply)
+        np.testing.assert_array_equal(expected, pixels)
+        self.assertFalse(pixels.flags.owndata)
+
+    def test_decode_obp_buffered_spectra(self):
+        print("Test decode_obp_buffered_spectra")
+        records = np.zeros(5, dtype=spectrum_decode.buffered_spectrum_dtype(1024))
+        records['spectrum_count'] = np.arange(5) + 10
+        records['tick_count_us'] = np.arange(5) * 20000
+        records['integration_time_us'] = 20000
+        records['pixels'] = np.arange(5 * 1024, dtype='<u2').reshape(5, 1024)
+        reply = obp_codec.pack_frame(0x00100928, payload=records.tobytes())
+        pixels, metadata = spectrum_decode.decode_obp_buffered_spectra(reply, 1024)
+        self.assertEqual((5, 1024), pixels.shape)
+        np.testing.assert_array_equal(records['pixels'], pixels)
+        np.testing.assert_array_equal([10, 11, 12, 13, 14], metadata['spectrum_count'])
+        self.assertEqual(80000, metadata['tick_count_us'][4])
+        # the spectra are a view of the reply
+        self.assertFalse(pixels.flags.owndata)
+
+        pixels, metadata = spectrum_decode.decode_obp_buffered_spectra(obp_codec.pack_frame(0x00100928), 1024)
+        self.assertEqual((0, 1024), pixels.shape)
+        with self.assertRaisesRegex(ValueError, 'whole number'):
+            spectrum_decode.decode_obp_buffered_spectra(reply, 1000)
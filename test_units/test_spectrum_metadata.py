@@ -0,0 +1,63 @@
+#!/usr/bin/python
+
+"""
+Unit test for spectra with metadata
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-11"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import unittest
+import numpy as np
+from ocean_optics_device.common import device_identity
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+from ocean_optics_device.spectrum_metadata import Spectrum, metadata_array
+from OceanBinaryProtocol import obp_codec
+
+
+class SpectrumMetadataTestCases(unittest.TestCase):
+
+    def test_lazy_pixels(self):
+        print("Test Spectrum decodes its pixels on first use")
+        expected = np.arange(1024, dtype='<u2')
+        spectrum = Spectrum(obp_codec.pack_frame(0x00101000, payload=expected.tobytes()), request_ns=5, reply_ns=9)
+        np.testing.assert_array_equal(expected, spectrum.pixels)
+        self.assertIs(spectrum.pixels, spectrum.pixels)
+        self.assertEqual(1024, len(spectrum))
+        with self.assertRaises(AttributeError):
+            spectrum.extra = 1
+
+        raw = (expected.astype('<u2').tobytes() * 2) + b'\x69'
+        spectrum = Spectrum(raw, device_identity.get_pixel_format(0x101E))
+        np.testing.assert_array_equal(np.tile(expected, 2), spectrum.pixels)
+
+    def test_spectrum_acquire(self):
+        print("Test spectrum_acquire")
+        for product_id, serial_number, pixel_count in ((0x2001, 'OFX00001', 2136), (0x1002, 'USB2E1234', 2048)):
+            a_device = OceanOpticsDevice(usb_device=SimulatedUsbDevice(product_id, serial_number,
+                                                                       faithful_timing=False))
+            acquisition = a_device.spectrum_acquisition_get()
+            acquisition.integration_time_us_set(3000)
+            spectra = [acquisition.spectrum_acquire() for scan in range(5)]
+            for spectrum in spectra:
+                self.assertEqual(serial_number, spectrum.serial_number)
+                self.assertEqual(3000, spectrum.integration_time_us)
+                self.assertIsNone(spectrum.tick_count_us)
+                self.assertLessEqual(spectrum.request_ns, spectrum.reply_ns)
+                self.assertEqual((pixel_count,), spectrum.pixels.shape)
+
+            metadata = metadata_array(spectra)
+            self.assertEqual(5, len(metadata))
+            self.assertTrue(np.all(np.diff(metadata['request_ns']) >= 0))
+            self.assertTrue(np.all(metadata['tick_count_us'] == -1))
+            self.assertEqual(serial_number.encode('UTF-8'), metadata['serial_number'][0])
+
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+"""
+Unit test for scan averaging and boxcar smoothing
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import unittest
+import numpy as np
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+from ocean_optics_device.spectrum_processing import SpectrumAccumulator, boxcar_smooth
+
+
+class SpectrumProcessingTestCases(unittest.TestCase):
+
+    def test_boxcar_smooth(self):
+        print('Test boxcar_smooth')
+        spectrum = np.random.default_rng(3).integers(0, 65535, 300).astype(np.uint16)
+        for boxcar_width in (1, 2, 7):
+            expected = [spectrum[max(0, pixel - boxcar_width):pixel + boxcar_width + 1].mean()
+                        for pixel in range(len(spectrum))]
+            np.testing.assert_allclose(expected, boxcar_smooth(spectrum, boxcar_width))
+        smoothed = boxcar_smooth(spectrum, 0)
+        np.testing.assert_array_equal(spectrum, smoothed)
+        self.assertEqual(np.float64, smoothed.dtype)
+        # a window wider than the spectrum is the mean everywhere
+        np.testing.assert_allclose(np.full(300, spectrum.mean()), boxcar_smooth(spectrum, 1000))
+
+    def test_accumulator(self):
+        print('Test SpectrumAccumulator')
+        accumulator = SpectrumAccumulator(4)
+        with self.assertRaises(ValueError):
+            accumulator.average_get()
+        for scan in range(1000):
+            accumulator.add(np.full(4, 0xFFFF, dtype=np.uint16))
+        accumulator.add(np.array([0, 1, 2, 3], dtype=np.uint16))
+        self.assertEqual(1001, accumulator.scan_count_get())
+        # the sum is far past what 16 or 32 bits could hold
+        self.assertEqual(1000 * 0xFFFF + 3, accumulator.sum_get()[3])
+        np.testing.assert_allclose((1000 * 0xFFFF + np.arange(4)) / 1001, accumulator.average_get())
+        accumulator.clear()
+        self.assertEqual(0, accumulator.scan_count_get())
+        self.assertEqual(0, accumulator.sum_get().sum())
+
+    def test_spectrum_average(self):
+        print('Test SpectrumAcquisition.spectrum_average')
+        for product_id in (0x2001, 0x1002):
+            simulated_device = SimulatedUsbDevice(product_id, 'SIM00001', faithful_timing=False)
+            acquisition = OceanOpticsDevice(usb_device=simulated_device).spectrum_acquisition_get()
+            # a second simulated device produces the same spectra
+            twin = SimulatedUsbDevice(product_id, 'SIM00001', faithful_timing=False)
+            expected = boxcar_smooth(np.mean([twin.spectrum_generate() for scan in range(50)], axis=0), 3)
+            average = acquisition.spectrum_average(50, boxcar=3)
+            self.assertEqual(50, simulated_device.spectrum_count_get())
+            self.assertEqual(np.float64, average.dtype)
+            np.testing.assert_allclose(expected, average)
+            with self.assertRaises(ValueError):
+                acquisition.spectrum_average(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+
+"""
+Unit test for spectrum recordings
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+from ocean_optics_device.spectrum_recording import SpectrumRecorder, SpectrumRecording, index_path_get
+
+
+class SpectrumRecordingTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'run.spectra')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @staticmethod
+    def spectrum_make(index, pixel_count=100):
+        return (np.arange(pixel_count, dtype=np.uint16) + index) & 0xFFFF
+
+    def record(self, count, first=0, batch_size=16):
+        with SpectrumRecorder(self.path, 100, batch_size=batch_size) as recorder:
+            for index in range(first, first + count):
+                recorder.append(self.spectrum_make(index), timestamp_ns=1000 * index, serial_number='OFX00001',
+                                integration_time_us=index)
+            self.assertEqual(first + count, recorder.record_count_get())
+
+    def test_round_trip(self):
+        print('Test SpectrumRecorder and SpectrumRecording')
+        self.record(100)
+        recording = SpectrumRecording(self.path)
+        self.assertEqual(100, len(recording))
+        self.assertEqual(100, recording.pixel_count_get())
+        self.assertIsInstance(recording.records_get(), np.memmap)
+        np.testing.assert_array_equal(self.spectrum_make(37), recording[37]['pixels'])
+        self.assertEqual(b'OFX00001', recording[37]['serial_number'])
+        self.assertEqual(37, recording[37]['integration_time_us'])
+        np.testing.assert_array_equal(np.arange(100) * 1000, recording.timestamps_get())
+
+        records = recording.time_range(10000, 20000)
+        self.assertEqual(10, len(records))
+        self.assertEqual(10000, records['timestamp_ns'][0])
+        np.testing.assert_array_equal(self.spectrum_make(19), records['pixels'][-1])
+        self.assertEqual(100, len(recording.time_range()))
+        self.assertEqual(0, len(recording.time_range(10 ** 9)))
+
+    def test_append_to_existing(self):
+        print('Test appending to a recording after a crash')
+        self.record(20)
+        # a partial record and a short index, as a crash might leave them
+        with open(self.path, 'ab') as recording_file:
+            recording_file.write(b'\x01' * 30)
+        with open(index_path_get(self.path), 'r+b') as index_file:
+            index_file.truncate(8 * 5)
+        self.assertEqual(20, len(SpectrumRecording(self.path).time_range(0, 10 ** 9)))
+
+        self.record(20, first=20)
+        recording = SpectrumRecording(self.path)
+        self.assertEqual(40, len(recording))
+        np.testing.assert_array_equal(self.spectrum_make(25), recording[25]['pixels'])
+        np.testing.assert_array_equal(np.arange(40) * 1000, np.asarray(recording.timestamps_get()))
+
+        with self.assertRaisesRegex(ValueError, 'records 100 pixels, not 50'):
+            SpectrumRecorder(self.path, 50)
+        with SpectrumRecorder(self.path, 100) as recorder:
+            with self.assertRaisesRegex(ValueError, 'Timestamps must not decrease.'):
+                recorder.append(self.spectrum_make(0), timestamp_ns=0)
+
+    def test_not_a_recording(self):
+        print('Test opening a file that is not a recording')
+        with open(self.path, 'wb') as recording_file:
+            recording_file.write(bytes(64))
+        with self.assertRaisesRegex(ValueError, 'not a spectrum recording'):
+            SpectrumRecording(self.path)
+
+    def test_empty_recording(self):
+        print('Test an empty recording')
+        SpectrumRecorder(self.path, 100).close()
+        recording = SpectrumRecording(self.path)
+        self.assertEqual(0, len(recording))
+        self.assertEqual(0, len(recording.time_range(0, 100)))
+
+    def test_stream_recording(self):
+        print('Test recording a spectrum stream')
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False)
+        acquisition = OceanOpticsDevice(usb_device=simulated_device).spectrum_acquisition_get()
+        acquisition.integration_time_us_set(2000)
+        with SpectrumRecorder(self.path, 2136) as recorder:
+            received = []
+            with acquisition.stream(capacity=4, recorder=recorder) as spectra:
+                for index, spectrum in zip(range(30), spectra):
+                    received.append(spectrum.copy())
+            # the spectrum still in flight when the stream stopped is discarded
+            recorded_count = simulated_device.spectrum_count_get() - 1
+            recording = SpectrumRecording(self.path)
+            self.assertEqual(recorded_count, len(recording))
+            np.testing.assert_array_equal(received, recording[0:30]['pixels'])
+            self.assertTrue(np.all(recording[:]['integration_time_us'] == 2000))
+            self.assertTrue(np.all(np.diff(recording.timestamps_get()) >= 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
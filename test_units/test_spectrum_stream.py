@@ -0,0 +1,92 @@
+#!/usr/bin/python
+
+"""
+Unit test for continuous spectrum acquisition
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-11"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import unittest
+import numpy as np
+from ocean_optics_device.spectrum_stream import SpectrumRing, SpectrumStream, Backpressure
+
+
+# stands in for SpectrumAcquisition, each spectrum is filled with its sequence number
+class CountingAcquisition:
+    def __init__(self, pixel_count=16, limit=None):
+        self.pixel_count = pixel_count
+        self.limit = limit
+        self.count = 0
+
+    def spectrum_get(self, data_length=0, as_array=False):
+        if (self.limit is not None) and (self.count >= self.limit):
+            raise RuntimeError('The device went away.')
+        spectrum = np.full(self.pixel_count, self.count, dtype=np.uint16)
+        self.count += 1
+        return spectrum
+
+    def spectrum_view_get(self, data_length=0):
+        return self.spectrum_get(data_length, as_array=True)
+
+    def spectra_view_iterate(self, data_length=0):
+        while True:
+            yield self.spectrum_view_get(data_length)
+
+
+class SpectrumStreamTestCases(unittest.TestCase):
+
+    def test_ring_drop_oldest(self):
+        print("Test SpectrumRing drop oldest")
+        ring = SpectrumRing(2, 4, backpressure=Backpressure.DROP_OLDEST)
+        for value in range(5):
+            self.assertTrue(ring.put(np.full(4, value)))
+        self.assertEqual(2, ring.dropped_count_get())
+        self.assertEqual([2, 3, 4], [int(ring.get()[0]) for index in range(3)])
+
+    def test_ring_drop_newest(self):
+        print("Test SpectrumRing drop newest")
+        ring = SpectrumRing(2, 4, backpressure=Backpressure.DROP_NEWEST)
+        for value in range(5):
+            ring.put(np.full(4, value))
+        self.assertEqual(2, ring.dropped_count_get())
+        self.assertEqual([0, 1, 2], [int(ring.get()[0]) for index in range(3)])
+
+    def test_ring_views(self):
+        print("Test SpectrumRing views")
+        ring = SpectrumRing(1, 4)
+        ring.put(np.arange(4))
+        spectrum = ring.get()
+        with self.assertRaises(ValueError):
+            spectrum[0] = 1
+        with self.assertRaisesRegex(TimeoutError, 'No spectrum arrived'):
+            ring.get(timeout=0.01)
+        ring.close()
+        self.assertIsNone(ring.get())
+        self.assertFalse(ring.put(np.arange(4)))
+
+    def test_stream_block(self):
+        print("Test SpectrumStream blocking")
+        acquisition = CountingAcquisition()
+        with SpectrumStream(acquisition, capacity=4, timeout=5) as spectra:
+            received = [int(spectrum[0]) for spectrum, index in zip(spectra, range(50))]
+        self.assertEqual(list(range(50)), received)
+        self.assertEqual(0, spectra.dropped_count_get())
+
+    def test_stream_error(self):
+        print("Test SpectrumStream reader error")
+        acquisition = CountingAcquisition(limit=10)
+        received = []
+        with self.assertRaisesRegex(RuntimeError, 'The device went away.'):
+            with SpectrumStream(acquisition, capacity=32, timeout=5) as spectra:
+                for spectrum in spectra:
+                    received.append(int(spectrum[0]))
+        self.assertEqual(list(range(10)), received)
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+
+"""
+Unit test for OBP over TCP, against a stand-in device on the loopback interface
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import socket
+import threading
+import unittest
+import numpy as np
+from ocean_optics_device.common import InterfaceType
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.tcp_transport import TcpTransport
+from OceanBinaryProtocol import obp_codec
+
+SERIAL_NUMBER = b'OFX00042'
+SPECTRUM = np.arange(2136, dtype='<u2')
+
+
+# answers serial number, spectrum and integration time requests, one connection at a time
+class LoopbackDevice:
+    def __init__(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.requests = []
+        self.fail_serial_number = False
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def receive_exactly(connection, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = connection.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError()
+            data += chunk
+        return bytes(data)
+
+    def reply(self, message_type):
+        if self.fail_serial_number and (message_type == 0x00000100):
+            reply = bytearray(obp_codec.pack_frame(message_type))
+            obp_codec.UINT16_STRUCT.pack_into(reply, obp_codec.ERROR_NUMBER_OFFSET, 5)
+            return bytes(reply)
+        if message_type == 0x00000101:
+            # a frame whose bytes_remaining is corrupt, followed by the real reply
+            corrupt = bytearray(obp_codec.pack_frame(message_type, b'corrupt'))
+            obp_codec.UINT32_STRUCT.pack_into(corrupt, obp_codec.BYTES_REMAINING_OFFSET, 200000)
+            return bytes(corrupt) + obp_codec.pack_frame(message_type, SERIAL_NUMBER)
+        elif message_type == 0x00000100:
+            return obp_codec.pack_frame(message_type, SERIAL_NUMBER)
+        elif message_type == 0x00101000:
+            return obp_codec.pack_frame(message_type, payload=SPECTRUM.tobytes())
+        return obp_codec.pack_frame(message_type)
+
+    def serve(self):
+        while True:
+            try:
+                connection, address = self.listener.accept()
+            except OSError:
+                return
+            with connection:
+                try:
+                    while True:
+                        header = self.receive_exactly(connection, obp_codec.HEADER_SIZE)
+                        self.receive_exactly(connection, obp_codec.bytes_remaining_get(header))
+                        message_type = obp_codec.UINT32_STRUCT.unpack_from(header, obp_codec.MESSAGE_TYPE_OFFSET)[0]
+                        self.requests.append(message_type)
+                        # send the reply in small pieces to exercise the framing
+                        reply = self.reply(message_type)
+                        for start in range(0, len(reply), 1000):
+                            connection.sendall(reply[start:start + 1000])
+                except ConnectionError:
+                    pass
+
+    def close(self):
+        self.listener.close()
+
+
+class TcpTransportTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.loopback_device = LoopbackDevice()
+
+    def tearDown(self):
+        self.loopback_device.close()
+
+    def test_obp_frame_read(self):
+        print("Test TcpTransport.obp_frame_read")
+        transport = TcpTransport('127.0.0.1', self.loopback_device.port, buffer_size=64)
+        # two requests in flight at once
+        transport.write(obp_codec.request_frame(0x00101000))
+        transport.write(obp_codec.request_frame(0x00110010, obp_codec.UINT32_STRUCT.pack(1000)))
+        frame = transport.obp_frame_read()
+        self.assertEqual(obp_codec.MINIMUM_FRAME_SIZE + SPECTRUM.nbytes, len(frame))
+        frame = transport.obp_frame_read()
+        self.assertEqual(obp_codec.MINIMUM_FRAME_SIZE, len(frame))
+        self.assertEqual(0x00110010, obp_codec.UINT32_STRUCT.unpack_from(frame, obp_codec.MESSAGE_TYPE_OFFSET)[0])
+        transport.close()
+
+    def test_corrupt_length(self):
+        print("Test TcpTransport resynchronizes after a corrupt bytes_remaining")
+        transport = TcpTransport('127.0.0.1', self.loopback_device.port, timeout=0.2)
+        transport.write(obp_codec.request_frame(0x00000101))
+        frame = transport.obp_frame_read()
+        self.assertEqual(SERIAL_NUMBER, bytes(frame[obp_codec.IMMEDIATE_DATA_OFFSET:
+                                                    obp_codec.IMMEDIATE_DATA_OFFSET + len(SERIAL_NUMBER)]))
+        # the connection is still in step
+        transport.write(obp_codec.request_frame(0x00110010, obp_codec.UINT32_STRUCT.pack(1000)))
+        frame = transport.obp_frame_read()
+        self.assertEqual(0x00110010, obp_codec.UINT32_STRUCT.unpack_from(frame, obp_codec.MESSAGE_TYPE_OFFSET)[0])
+        self.assertEqual(1, transport.framer_get().resynchronization_count_get())
+        transport.close()
+
+    def test_tcp_device(self):
+        print("Test OceanOpticsDevice over TCP")
+        a_device = OceanOpticsDevice('OFX00042', interface_type=InterfaceType.TCP, tcp_host='127.0.0.1',
+                                     tcp_port=self.loopback_device.port)
+        self.assertEqual('OFX00042', a_device.serial_number_get())
+        spectrum = a_device.spectrum_acquisition_get().spectrum_get(as_array=True)
+        np.testing.assert_array_equal(SPECTRUM, spectrum)
+        a_device.spectrum_acquisition_get().integration_time_ms_set(10)
+        self.assertEqual([0x00000100, 0x00101000, 0x00110010], self.loopback_device.requests)
+        a_device.release()
+
+    def test_wrong_device(self):
+        print("Test OceanOpticsDevice over TCP with the wrong serial number")
+        with self.assertRaisesRegex(RuntimeError, 'Network device, OFX99999, was not found.'):
+            OceanOpticsDevice('OFX99999', interface_type=InterfaceType.TCP, tcp_host='127.0.0.1',
+                              tcp_port=self.loopback_device.port)
+
+    def test_wrong_device_closed(self):
+        print("Test find_network_device closes the connection to the wrong device")
+        a_device = OceanOpticsDevice('OFX00042', interface_type=InterfaceType.TCP, tcp_host='127.0.0.1',
+                                     tcp_port=self.loopback_device.port)
+        self.assertFalse(a_device.find_network_device('OFX99999'))
+        self.assertIsNone(a_device._OceanOpticsDevice__tcp_transport)
+        self.assertEqual('OFX99999', a_device.serial_number_get())
+        self.assertTrue(a_device.find_network_device('OFX00042'))
+        self.assertEqual('OFX00042', a_device.serial_number_get())
+        a_device.release()
+
+    def test_serial_number_error(self):
+        print("Test find_network_device closes the connection when the serial number cannot be read")
+        a_device = OceanOpticsDevice('OFX00042', interface_type=InterfaceType.TCP, tcp_host='127.0.0.1',
+                                     tcp_port=self.loopback_device.port)
+        self.loopback_device.fail_serial_number = True
+        with self.assertRaisesRegex(RuntimeError, 'obp_error_code=5'):
+            a_device.find_network_device('OFX00042')
+        self.assertIsNone(a_device._OceanOpticsDevice__tcp_transport)
+        self.assertEqual('OFX00042', a_device.serial_number_get())
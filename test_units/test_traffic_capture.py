@@ -0,0 +1,155 @@
+#!/usr/bin/python
+
+"""
+Unit test for traffic capture and replay
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+from usb import core
+from ocean_optics_device import traffic_capture
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+from ocean_optics_device.traffic_capture import ReplayUsbDevice, capture_read
+
+
+class TrafficCaptureTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'field.capture')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # attach, set the integration time and read five spectra, capturing the traffic if a capture is given
+    @staticmethod
+    def session(a_usb_device):
+        a_device = OceanOpticsDevice(usb_device=a_usb_device)
+        acquisition = a_device.spectrum_acquisition_get()
+        acquisition.integration_time_us_set(3000)
+        return a_device, [acquisition.spectrum_get(as_array=True).copy() for scan in range(5)]
+
+    def capture_session(self, product_id, serial_number):
+        capture = traffic_capture.TrafficCapture(self.path, 0x2457, product_id)
+        a_device, spectra = self.session(traffic_capture.CapturingUsbDevice(
+            SimulatedUsbDevice(product_id, serial_number, faithful_timing=False), capture))
+        capture.close()
+        return spectra
+
+    def test_obp_capture_and_replay(self):
+        print('Test capture and replay of an OBP device')
+        spectra = self.capture_session(0x2001, 'OFX00001')
+        vendor_id, product_id, records = capture_read(self.path)
+        self.assertEqual((0x2457, 0x2001), (vendor_id, product_id))
+        # serial number, integration time and five spectra requests
+        directions = [record[1] for record in records]
+        self.assertEqual(7, directions.count(traffic_capture.DIRECTION_OUT))
+        timestamps = [record[0] for record in records]
+        self.assertEqual(sorted(timestamps), timestamps)
+
+        replay = ReplayUsbDevice(self.path)
+        a_device, replayed = self.session(replay)
+        self.assertEqual('OFX00001', a_device.serial_number_get())
+        np.testing.assert_array_equal(spectra, replayed)
+        self.assertEqual(0, replay.records_remaining_get())
+        with self.assertRaises(EOFError):
+            replay.read(0x81, 64)
+        replay.rewind()
+        np.testing.assert_array_equal(spectra, self.session(replay)[1])
+
+    def test_binary_capture_and_replay(self):
+        print('Test capture and replay of a BINARY device')
+        spectra = self.capture_session(0x1002, 'USB20001')
+        np.testing.assert_array_equal(spectra, self.session(ReplayUsbDevice(self.path))[1])
+
+        # a library that asks for something else is caught
+        a_device = OceanOpticsDevice(usb_device=ReplayUsbDevice(self.path))
+        with self.assertRaisesRegex(ValueError, 'does not match the capture'):
+            a_device.spectrum_acquisition_get().integration_time_us_set(4000)
+
+    def test_capture_start_stop(self):
+        print('Test OceanOpticsDevice.traffic_capture_start')
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False)
+        a_device = OceanOpticsDevice(usb_device=simulated_device)
+        a_device.introspection_get().firmware_revision_get()
+        capture = a_device.traffic_capture_start(self.path)
+        spectrum = a_device.spectrum_acquisition_get().spectrum_get(as_array=True)
+        firmware_revision = a_device.introspection_get().firmware_revision_get()
+        a_device.release()
+        # the serial number query, the spectrum and the firmware revision, which was cached before the capture
+        self.assertEqual(7, capture.record_count_get())
+        self.assertEqual(7, len(capture_read(self.path)[2]))
+        # after the capture stopped the device is used directly again
+        a_device.spectrum_acquisition_get().spectrum_get()
+        self.assertEqual(7, len(capture_read(self.path)[2]))
+
+        # the capture replays from the attach of a new device
+        replay_device = ReplayUsbDevice(self.path)
+        a_device = OceanOpticsDevice(usb_device=replay_device)
+        self.assertEqual('OFX00001', a_device.serial_number_get())
+        np.testing.assert_array_equal(spectrum, a_device.spectrum_acquisition_get().spectrum_get(as_array=True))
+        self.assertEqual(firmware_revision, a_device.introspection_get().firmware_revision_get())
+        self.assertEqual(0, replay_device.records_remaining_get())
+
+    def test_replay_timing(self):
+        print('Test replay at the captured speed')
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', integration_time_us=20000)
+        capture = traffic_capture.TrafficCapture(self.path, 0x2457, 0x2001)
+        a_device = OceanOpticsDevice(usb_device=traffic_capture.CapturingUsbDevice(simulated_device, capture))
+        for scan in range(3):
+            a_device.spectrum_acquisition_get().spectrum_get()
+        capture.close()
+        captured_ns = capture_read(self.path)[2][-1][0] - capture_read(self.path)[2][0][0]
+
+        for speed in (1.0, None):
+            start = time.monotonic()
+            a_device = OceanOpticsDevice(usb_device=ReplayUsbDevice(self.path, speed=speed))
+            for scan in range(3):
+                a_device.spectrum_acquisition_get().spectrum_get()
+            elapsed_ns = (time.monotonic() - start) * 1e9
+            if speed is None:
+                self.assertLess(elapsed_ns, captured_ns / 2)
+            else:
+                self.assertGreaterEqual(elapsed_ns, captured_ns * 0.9)
+
+    def test_replay_errors(self):
+        print('Test replay of a failed read')
+        simulated_device = SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False)
+        capture = traffic_capture.TrafficCapture(self.path, 0x2457, 0x2001)
+        capturing_device = traffic_capture.CapturingUsbDevice(simulated_device, capture)
+        with self.assertRaises(core.USBTimeoutError):
+            capturing_device.read(0x81, 64)
+        capture.close()
+        with self.assertRaises(core.USBTimeoutError):
+            ReplayUsbDevice(self.path).read(0x81, 64)
+
+    def test_truncated_capture(self):
+        print('Test a capture that was cut short')
+        self.capture_session(0x2001, 'OFX00001')
+        record_count = len(capture_read(self.path)[2])
+        with open(self.path, 'r+b') as capture_file:
+            capture_file.truncate(os.path.getsize(self.path) - 10)
+        self.assertEqual(record_count - 1, len(capture_read(self.path)[2]))
+        with open(self.path, 'wb') as capture_file:
+            capture_file.write(bytes(20))
+        with self.assertRaisesRegex(ValueError, 'not a traffic capture'):
+            capture_read(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
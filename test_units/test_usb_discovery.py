@@ -0,0 +1,111 @@
+#!/usr/bin/python
+
+"""
+Unit test for usb discovery and the discovery cache
+"""
+
+__author__ = "Kirk Clendinning"
+__date__ = "2018-04-02"
+__copyright__ = "Copyright 2018, Ocean Optics"
+__credits__ = ["Kirk Clendinning"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Kirk Clendinning"
+__email__ = "kirk.clendinning@oceanoptics.com"
+__status__ = "Development"
+__pkg_name__ = "zephyr"
+
+import os
+import tempfile
+import unittest
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+from ocean_optics_device.usb_discovery import DiscoveryCache, usb_location_key
+
+
+class UsbDiscoveryTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.directory.name, 'zephyr', 'usb_discovery.json')
+        self.usb_devices = self.bus_populate()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # eight devices, OFX00000 in port 1 to OFX00007 in port 8
+    @staticmethod
+    def bus_populate():
+        return [SimulatedUsbDevice(0x2001, 'OFX{0:05d}'.format(index), faithful_timing=False,
+                                   port_numbers=(index + 1,)) for index in range(8)]
+
+    @staticmethod
+    def serial_number_queries(usb_devices):
+        return sum(a_usb_device.request_counts_get().get(0x00000100, 0) for a_usb_device in usb_devices)
+
+    def test_location_key(self):
+        print("Test usb_location_key")
+        self.assertEqual('1:3:2001', usb_location_key(SimulatedUsbDevice(0x2001, port_numbers=(3,))))
+        self.assertEqual('2:1.4:4000', usb_location_key(SimulatedUsbDevice(0x4000, bus=2, port_numbers=(1, 4))))
+        self.assertIsNone(usb_location_key(SimulatedUsbDevice(0x2001)))
+
+    def test_cache_persists(self):
+        print("Test DiscoveryCache save and load")
+        cache = DiscoveryCache(self.cache_path)
+        cache.store(self.usb_devices[2], 'OFX00002')
+        cache.save()
+        self.assertEqual('OFX00002', DiscoveryCache(self.cache_path).serial_number_get(self.usb_devices[2]))
+        cache.forget(self.usb_devices[2])
+        cache.save()
+        self.assertIsNone(DiscoveryCache(self.cache_path).serial_number_get(self.usb_devices[2]))
+
+    def test_damaged_cache(self):
+        print("Test a damaged discovery cache")
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, 'w') as cache_file:
+            cache_file.write('{not json')
+        self.assertIsNone(DiscoveryCache(self.cache_path).serial_number_get(self.usb_devices[0]))
+
+    def test_select(self):
+        print("Test usb_device_select with the discovery cache")
+        a_device = OceanOpticsDevice()
+        self.assertTrue(a_device.usb_device_select('OFX00005', self.usb_devices, DiscoveryCache(self.cache_path)))
+        self.assertEqual('OFX00005', a_device.serial_number_get())
+        # every device is asked once, the one found is not asked again
+        self.assertEqual(len(self.usb_devices), self.serial_number_queries(self.usb_devices))
+        self.assertEqual('1.2.3.4', a_device.introspection_get().firmware_revision_get())
+
+        # the topology has not changed, so only the remembered device is asked
+        usb_devices = self.bus_populate()
+        a_device = OceanOpticsDevice()
+        self.assertTrue(a_device.usb_device_select('OFX00003', usb_devices, DiscoveryCache(self.cache_path)))
+        self.assertEqual('OFX00003', a_device.serial_number_get())
+        self.assertEqual(1, self.serial_number_queries(usb_devices))
+
+        self.assertFalse(OceanOpticsDevice().usb_device_select('OFX99999', usb_devices,
+                                                               DiscoveryCache(self.cache_path)))
+
+    def test_select_moved_device(self):
+        print("Test usb_device_select after devices were moved")
+        a_device = OceanOpticsDevice()
+        a_device.usb_device_select('OFX00001', self.usb_devices, DiscoveryCache(self.cache_path))
+        # swap the devices in ports 2 and 3
+        moved = self.bus_populate()
+        moved[1], moved[2] = (SimulatedUsbDevice(0x2001, 'OFX00002', faithful_timing=False, port_numbers=(2,)),
+                              SimulatedUsbDevice(0x2001, 'OFX00001', faithful_timing=False, port_numbers=(3,)))
+        a_device = OceanOpticsDevice()
+        self.assertTrue(a_device.usb_device_select('OFX00001', moved, DiscoveryCache(self.cache_path)))
+        self.assertEqual('OFX00001', a_device.serial_number_get())
+        self.assertEqual('OFX00001', DiscoveryCache(self.cache_path).serial_number_get(moved[2]))
+
+        # the device remembered in port 5 has been replaced and the one wanted is gone
+        replaced = self.bus_populate()
+        replaced[4] = SimulatedUsbDevice(0x2001, 'OFX00042', faithful_timing=False, port_numbers=(5,))
+        a_device = OceanOpticsDevice()
+        self.assertFalse(a_device.usb_device_select('OFX00004', replaced, DiscoveryCache(self.cache_path)))
+        self.assertIsNone(a_device._OceanOpticsDevice__usb_device)
+        self.assertEqual('OFX00004', a_device.serial_number_get())
+
+
+if __name__ == '__main__':
+    unittest.main()
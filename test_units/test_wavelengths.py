@@ -0,0 +1,65 @@
+#!/usr/bin/python
+
+"""
+Unit test for the wavelength axis
+"""
+
+__author__ = 'Kirk Clendinning'
+__date__ = '2018-04-11'
+__copyright__ = 'Copyright 2018, Ocean Optics'
+__credits__ = ['Kirk Clendinning']
+__license__ = 'GPL'
+__version__ = '1.0.0'
+__maintainer__ = 'Kirk Clendinning'
+__email__ = 'kirk.clendinning@oceanoptics.com'
+__status__ = 'Development'
+__pkg_name__ = 'zephyr'
+
+import unittest
+import numpy as np
+from ocean_optics_device.oo_device import OceanOpticsDevice
+from ocean_optics_device.simulated_device import SimulatedUsbDevice
+
+COEFFICIENTS = (345.5, 0.372, -1.2e-5, 2.0e-10)
+
+
+class WavelengthTestCases(unittest.TestCase):
+
+    def check_wavelengths(self, product_id, serial_number, request_count):
+        simulated_device = SimulatedUsbDevice(product_id, serial_number, faithful_timing=False,
+                                              wavelength_coefficients=COEFFICIENTS)
+        a_device = OceanOpticsDevice(usb_device=simulated_device)
+        acquisition = a_device.spectrum_acquisition_get()
+        wavelengths = acquisition.wavelengths()
+        pixels = np.arange(acquisition.pixel_format_get()[0])
+        np.testing.assert_allclose(np.polynomial.polynomial.polyval(pixels, COEFFICIENTS), wavelengths, rtol=1e-6)
+        self.assertFalse(wavelengths.flags.writeable)
+        # the calibration is read once and the axis computed once
+        self.assertIs(wavelengths, acquisition.wavelengths())
+        self.assertEqual(request_count, sum(simulated_device.request_counts_get().values()))
+
+        acquisition.wavelength_coefficients_set((400.0, 0.25, 0.0, 0.0))
+        self.assertEqual((400.0, 0.25, 0.0, 0.0), simulated_device.wavelength_coefficients_get())
+        rewritten = acquisition.wavelengths()
+        self.assertIsNot(wavelengths, rewritten)
+        self.assertAlmostEqual(400.0 + 0.25 * 100, rewritten[100], places=3)
+        return a_device
+
+    def test_obp_wavelengths(self):
+        print('Test wavelengths() over OBP')
+        # serial number, coefficient count and four coefficients
+        a_device = self.check_wavelengths(0x2001, 'OFX00001', 6)
+        # a reset may have changed the calibration, so it is read again
+        acquisition = a_device.spectrum_acquisition_get()
+        wavelengths = acquisition.wavelengths()
+        a_device.introspection_get().reset()
+        np.testing.assert_array_equal(wavelengths, acquisition.wavelengths())
+
+    def test_binary_wavelengths(self):
+        print('Test wavelengths() from a BINARY EEPROM')
+        # serial number and four EEPROM slots
+        self.check_wavelengths(0x101E, 'USB2+00001', 5)
+
+
+if __name__ == '__main__':
+    unittest.main()